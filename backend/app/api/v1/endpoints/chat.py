@@ -1,17 +1,85 @@
-from fastapi import APIRouter, HTTPException, Request, status
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
 
-from app.core.limiter import limiter
+from fastapi import APIRouter, Header, HTTPException, Query, Request, Response, WebSocket, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import ValidationError
+from starlette.types import Receive, Scope, Send
+
+from app.core.limiter import (
+    acquire_llm_slot,
+    chat_rate_limit,
+    enforce_chat_rate_limit,
+    llm_slot,
+    release_llm_slot,
+)
 from app.core.config import get_settings
+from app.core.llm_scheduler import LLMDeadlineError
+from app.core.metrics import WEBSOCKET_CONNECTIONS
 from app.schemas.chat import ChatMessageRequest, ChatMessageResponse
 from app.services import session_service
+from app.services.finalization_service import finalizer
+from app.services.live_session import LiveSession
+from app.services.trupy_chat import BUSY_MESSAGE, TrupyOpenAI
+from app.utils.logger import bind_session, setup_logger
 
 settings = get_settings()
+logger = setup_logger(name="chat_socket")
 router = APIRouter()
 
+# Application close codes for /ws, mirroring the HTTP statuses of the REST endpoints.
+WS_CLOSE_NOT_FOUND = 4404
+WS_CLOSE_TIMEOUT = 4408
+WS_CLOSE_CONFLICT = 4409
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+_BUSY_DETAIL = "Another message for this session is still being processed. Please retry."
+
 
 @router.post("/message", response_model=ChatMessageResponse)
-@limiter.limit(settings.RATE_LIMIT_CHAT)
-async def send_message(request: Request, body: ChatMessageRequest):
+async def send_message(
+    request: Request,
+    body: ChatMessageRequest,
+    idempotency_key: Optional[str] = Header(None),
+):
+    bind_session(body.session_id)
+    if idempotency_key:
+        cached = await session_service.get_cached_reply(body.session_id, idempotency_key)
+        if cached:
+            return ChatMessageResponse(**cached)
+
+    await enforce_chat_rate_limit(request, body.session_id)
+    try:
+        async with session_service.session_lock(body.session_id), llm_slot():
+            response = await _handle_message(body, idempotency_key)
+    except (session_service.SessionBusyError, session_service.SessionConflictError):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=_BUSY_DETAIL)
+    except LLMDeadlineError:
+        # Shed before reaching the model: not cached, so a retry with the same key gets a real answer.
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=BUSY_MESSAGE,
+            headers={"Retry-After": "2"},
+        )
+
+    if idempotency_key:
+        await session_service.cache_reply(body.session_id, idempotency_key, response.model_dump())
+    return response
+
+
+async def _handle_message(body: ChatMessageRequest, idempotency_key: Optional[str]) -> ChatMessageResponse:
+    # A duplicate that waited on the lock gets the reply produced by the first request.
+    if idempotency_key:
+        cached = await session_service.get_cached_reply(body.session_id, idempotency_key)
+        if cached:
+            return ChatMessageResponse(**cached)
+
     bot = await session_service.get_session(body.session_id)
     if not bot:
         raise HTTPException(
@@ -25,7 +93,7 @@ async def send_message(request: Request, body: ChatMessageRequest):
             detail="Session is already concluded. Please end the session.",
         )
 
-    result = bot.get_response(body.message)
+    result = await bot.get_response(body.message)
 
     if isinstance(result, dict):
         if result.get("type") == "crisis":
@@ -52,12 +120,378 @@ async def send_message(request: Request, body: ChatMessageRequest):
     )
 
 
+@router.post("/message/stream")
+async def stream_message(
+    request: Request,
+    body: ChatMessageRequest,
+    idempotency_key: Optional[str] = Header(None),
+):
+    bind_session(body.session_id)
+    if idempotency_key:
+        cached = await session_service.get_cached_reply(body.session_id, idempotency_key)
+        if cached:
+            return StreamingResponse(iter([_sse("done", cached)]), media_type="text/event-stream")
+
+    await enforce_chat_rate_limit(request, body.session_id)
+    try:
+        token = await session_service.acquire_session_lock(body.session_id)
+    except session_service.SessionBusyError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=_BUSY_DETAIL)
+
+    slot = None
+    try:
+        if idempotency_key:
+            cached = await session_service.get_cached_reply(body.session_id, idempotency_key)
+            if cached:
+                await session_service.release_session_lock(body.session_id, token)
+                return StreamingResponse(iter([_sse("done", cached)]), media_type="text/event-stream")
+
+        bot = await session_service.get_session(body.session_id)
+        if not bot:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Session not found or already ended.",
+            )
+
+        if bot.is_concluded:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Session is already concluded. Please end the session.",
+            )
+
+        slot = await acquire_llm_slot()
+    except Exception:
+        await session_service.release_session_lock(body.session_id, token)
+        raise
+
+    async def release() -> None:
+        try:
+            await release_llm_slot(slot)
+        finally:
+            await session_service.release_session_lock(body.session_id, token)
+
+    return _ReleasingStreamingResponse(
+        _stream_events(body, bot, idempotency_key),
+        release,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+class _ReleasingStreamingResponse(StreamingResponse):
+    """Runs `release` when the response is over, even if the client left before the body was iterated.
+
+    A generator's own `finally` is not enough: the response start is sent before the generator's first
+    step, so a disconnect there means it never starts and its `finally` never runs.
+    """
+
+    def __init__(self, content: AsyncIterator[str], release: Callable[[], Awaitable[None]], **kwargs: Any):
+        super().__init__(content, **kwargs)
+        self._release = release
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self._release()
+
+
+async def _stream_events(body: ChatMessageRequest, bot: TrupyOpenAI, idempotency_key: Optional[str]) -> AsyncIterator[str]:
+    # The session lock and LLM slot are held for the whole stream; the response releases them.
+    async for event in bot.stream_response(body.message):
+        if event["type"] == "delta":
+            yield _sse("delta", {"content": event["content"]})
+        elif event["type"] == "crisis":
+            await session_service.remove_session(body.session_id)
+            response = ChatMessageResponse(
+                session_id=body.session_id,
+                reply=event["message"],
+                is_final=True,
+                crisis_detected=True,
+            ).model_dump()
+            if idempotency_key:
+                await session_service.cache_reply(body.session_id, idempotency_key, response)
+            yield _sse("crisis", response)
+        elif event["type"] == "error":
+            yield _sse("error", {"session_id": body.session_id, "reply": event["message"]})
+        elif event["type"] == "done":
+            try:
+                await session_service.save_session(body.session_id, bot)
+            except session_service.SessionConflictError:
+                yield _sse("error", {"session_id": body.session_id, "reply": _BUSY_DETAIL})
+                return
+            response = ChatMessageResponse(
+                session_id=body.session_id,
+                reply=event["message"],
+            ).model_dump()
+            if idempotency_key:
+                await session_service.cache_reply(body.session_id, idempotency_key, response)
+            yield _sse("done", response)
+
+
+def _etag_versions(if_none_match: Optional[str]) -> tuple[int, ...]:
+    versions = []
+    for tag in (if_none_match or "").split(","):
+        tag = tag.strip().removeprefix("W/").strip('"')
+        if tag.isdigit():
+            versions.append(int(tag))
+    return tuple(versions)
+
+
 @router.get("/{session_id}/history")
-async def get_chat_history(session_id: str):
-    bot = await session_service.get_session(session_id)
-    if not bot:
+async def get_chat_history(
+    session_id: str,
+    since: int = Query(0, ge=0),
+    if_none_match: Optional[str] = Header(None),
+):
+    # The ETag is the session version, bumped by every save: a client that still holds it gets a
+    # 304 without the transcript being read, and `since` (its message count) returns only the rest.
+    bind_session(session_id)
+    result = await session_service.read_history(session_id, since, _etag_versions(if_none_match))
+    if result is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Session not found or already ended.",
         )
-    return {"session_id": session_id, "history": bot.get_history()}
+    headers = {"ETag": f'"{result["version"]}"', "Cache-Control": "no-cache"}
+    if result["history"] is None:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return JSONResponse(
+        {
+            "session_id": session_id,
+            "version": result["version"],
+            "message_count": result["message_count"],
+            "since": since,
+            "history": result["history"],
+        },
+        headers=headers,
+    )
+
+
+class _Outbox:
+    """Serializes sends on one socket and coalesces reply deltas while the client reads slowly.
+
+    The LLM stream never waits on the socket: deltas that arrive while a send is blocked are
+    merged into the next frame, so a slow reader gets fewer, larger frames.
+    """
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self._lock = asyncio.Lock()
+        self._deltas: List[str] = []
+        self._drain: Optional[asyncio.Task] = None
+
+    async def send(self, frame: Dict[str, Any]) -> None:
+        async with self._lock:
+            await self.websocket.send_text(json.dumps(frame))
+
+    def delta(self, content: str) -> None:
+        if self._drain is not None and self._drain.done():
+            # Re-raises a failed send (client gone), which abandons the turn.
+            self._drain.result()
+        self._deltas.append(content)
+        if self._drain is None or self._drain.done():
+            self._drain = asyncio.create_task(self._send_deltas())
+
+    async def _send_deltas(self) -> None:
+        while self._deltas:
+            content = "".join(self._deltas)
+            self._deltas.clear()
+            await self.send({"type": "delta", "content": content})
+
+    async def flush(self) -> None:
+        if self._drain is not None:
+            await self._drain
+
+    def cancel(self) -> None:
+        if self._drain is not None:
+            self._drain.cancel()
+
+
+async def _socket_error(outbox: _Outbox, live: LiveSession, reply_to: Dict[str, str], reply: str, **extra: Any) -> None:
+    await outbox.send({"type": "error", **reply_to, "session_id": live.session_id, "reply": reply, **extra})
+
+
+async def _socket_turn(websocket: WebSocket, outbox: _Outbox, live: LiveSession, frame: Dict[str, Any]) -> bool:
+    """Handle one message frame. Returns False once the session is over."""
+    message_id = frame.get("id")
+    reply_to = {"id": message_id} if message_id else {}
+    try:
+        body = ChatMessageRequest(session_id=live.session_id, message=frame.get("message"))
+    except ValidationError:
+        await _socket_error(outbox, live, reply_to, "Message must be a non-empty string.")
+        return True
+
+    # A message resent after a reconnect gets the reply that was produced the first time.
+    if message_id:
+        cached = await session_service.get_cached_reply(live.session_id, message_id)
+        if cached:
+            await outbox.send({"type": "done", **reply_to, **cached})
+            return True
+
+    retry_after = await chat_rate_limit(websocket, live.session_id)
+    if retry_after:
+        await _socket_error(
+            outbox, live, reply_to, "Rate limit exceeded. Please slow down.", retry_after=max(1, round(retry_after))
+        )
+        return True
+    response = None
+    slot = None
+    try:
+        async with live.turn() as bot:
+            if bot is None:
+                await _socket_error(outbox, live, reply_to, "Session not found or already ended.")
+                return False
+            if bot.is_concluded:
+                await _socket_error(outbox, live, reply_to, "Session is already concluded. Please end the session.")
+                return True
+            try:
+                slot = await acquire_llm_slot()
+            except HTTPException as e:
+                await _socket_error(outbox, live, reply_to, e.detail, retry_after=2)
+                return True
+
+            async for event in bot.stream_response(body.message):
+                if event["type"] == "delta":
+                    outbox.delta(event["content"])
+                elif event["type"] == "crisis":
+                    response = ChatMessageResponse(
+                        session_id=live.session_id,
+                        reply=event["message"],
+                        is_final=True,
+                        crisis_detected=True,
+                    ).model_dump()
+                elif event["type"] == "error":
+                    await outbox.flush()
+                    await _socket_error(outbox, live, reply_to, event["message"])
+                elif event["type"] == "done":
+                    live.dirty = True
+                    response = ChatMessageResponse(session_id=live.session_id, reply=event["message"]).model_dump()
+            await outbox.flush()
+    except session_service.SessionBusyError:
+        await _socket_error(outbox, live, reply_to, _BUSY_DETAIL)
+        return True
+    finally:
+        outbox.cancel()
+        if slot is not None:
+            await release_llm_slot(slot)
+
+    if response is None:
+        return True
+    if response["crisis_detected"]:
+        await live.remove()
+        if message_id:
+            await session_service.cache_reply(live.session_id, message_id, response)
+        await outbox.send({"type": "crisis", **reply_to, **response})
+        return False
+
+    await outbox.send({"type": "done", **reply_to, **response})
+    # Written back after the reply is on its way, not before it.
+    if not settings.WS_CHECKPOINT_INTERVAL:
+        await live.write_back()
+    if message_id:
+        await session_service.cache_reply(live.session_id, message_id, response)
+    return True
+
+
+async def _socket_receive(websocket: WebSocket, outbox: _Outbox, live: LiveSession, seen: List[float]) -> None:
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+        seen[0] = time.monotonic()
+        try:
+            frame = json.loads(message.get("text") or message.get("bytes") or "")
+            kind = frame.get("type")
+        except (ValueError, AttributeError):
+            await _socket_error(outbox, live, {}, "Frames must be JSON objects.")
+            continue
+
+        if kind == "message":
+            if not await _socket_turn(websocket, outbox, live, frame):
+                await websocket.close()
+                return
+            seen[0] = time.monotonic()
+        elif kind == "end":
+            try:
+                async with live.turn() as bot:
+                    if bot is None:
+                        await websocket.close(code=WS_CLOSE_NOT_FOUND, reason="Session not found or already ended.")
+                        return
+                    job = await finalizer.submit(live.session_id, bot)
+                    live.dirty = False
+            except session_service.SessionBusyError:
+                await _socket_error(outbox, live, {}, _BUSY_DETAIL)
+                continue
+            await outbox.send({"type": "ended", "session_id": live.session_id, **job})
+            await websocket.close()
+            return
+        elif kind == "ping":
+            await outbox.send({"type": "pong"})
+        elif kind != "pong":
+            await _socket_error(outbox, live, {}, f"Unknown frame type: {kind}")
+
+
+async def _socket_heartbeat(websocket: WebSocket, outbox: _Outbox, live: LiveSession, seen: List[float]) -> None:
+    interval = settings.WS_HEARTBEAT_INTERVAL
+    while True:
+        await asyncio.sleep(interval)
+        if not await live.renew():
+            logger.warning("Session lock lost by live connection: %s", live.session_id)
+            await websocket.close(code=WS_CLOSE_CONFLICT, reason="Session taken over by another connection.")
+            return
+        # A turn in progress counts as activity: the client is waiting on us, not the other way round.
+        if not live.lock.locked() and time.monotonic() - seen[0] > 2 * interval:
+            await websocket.close(code=WS_CLOSE_TIMEOUT, reason="Heartbeat timeout.")
+            return
+        if settings.WS_CHECKPOINT_INTERVAL and live.write_due():
+            await live.write_back()
+        await outbox.send({"type": "ping"})
+
+
+@router.websocket("/ws/{session_id}")
+async def chat_socket(websocket: WebSocket, session_id: str):
+    """Chat over one long-lived connection that keeps the session in memory between turns.
+
+    Client frames: {"type": "message", "message": ..., "id": optional idempotency key},
+    {"type": "end"}, {"type": "ping"} and {"type": "pong"}. Server frames: ready, delta,
+    done, crisis, error, ended, ping and pong.
+    """
+    bind_session(session_id)
+    await websocket.accept()
+    live = await LiveSession.open(session_id)
+    if live is None:
+        await websocket.close(code=WS_CLOSE_NOT_FOUND, reason="Session not found or already ended.")
+        return
+
+    WEBSOCKET_CONNECTIONS.inc()
+    outbox = _Outbox(websocket)
+    seen = [time.monotonic()]
+    tasks = [
+        asyncio.create_task(_socket_receive(websocket, outbox, live, seen)),
+        asyncio.create_task(_socket_heartbeat(websocket, outbox, live, seen)),
+    ]
+    try:
+        await outbox.send({
+            "type": "ready",
+            "session_id": session_id,
+            "version": live.bot.version,
+            "history_length": len(live.bot.get_history()),
+            "is_concluded": live.bot.is_concluded,
+        })
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            except session_service.SessionConflictError:
+                logger.warning("Live session was written elsewhere: %s", session_id)
+            except Exception as e:
+                # Sends on a socket the client already dropped end up here.
+                logger.info("Live connection ended: %s | %s", session_id, type(e).__name__)
+        await live.close()
+        WEBSOCKET_CONNECTIONS.dec()
@@ -0,0 +1,16 @@
+from fastapi import APIRouter
+
+from app.services import response_cache
+
+router = APIRouter()
+
+
+@router.get("/cache")
+async def cache_stats():
+    stats = await response_cache.get_stats()
+    return {
+        "exact_hit": stats.get("exact_hit", 0),
+        "exact_miss": stats.get("exact_miss", 0),
+        "greeting_hit": stats.get("greeting_hit", 0),
+        "greeting_miss": stats.get("greeting_miss", 0),
+    }
@@ -1,18 +1,25 @@
-from datetime import datetime
+import base64
+from datetime import date, datetime
+from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, tuple_
 
-from app.core.database import get_db
+from app.core.database import AsyncSessionLocal, get_db
 from app.models.session import SessionRecord
 from app.schemas.session import (
+    ActiveSessionsOut,
     SessionEndResponse,
     SessionRecordOut,
     SessionStartRequest,
     SessionStartResponse,
+    SessionStatsOut,
 )
-from app.services import session_service
+from app.services import archive_service, session_service, stats_service
+from app.services.finalization_service import finalizer, is_settled
+from app.utils.logger import bind_session
 
 router = APIRouter()
 
@@ -37,44 +44,137 @@ async def start_session(body: SessionStartRequest):
     )
 
 
-@router.post("/{session_id}/end", response_model=SessionEndResponse)
-async def end_session(session_id: str, db: AsyncSession = Depends(get_db)):
-    bot = await session_service.get_session(session_id)
-    if not bot:
+@router.get("/active", response_model=ActiveSessionsOut)
+async def active_sessions():
+    breakdown = await session_service.active_session_breakdown()
+    return ActiveSessionsOut(
+        active=breakdown["anonymous"] + breakdown["identified"],
+        **breakdown,
+    )
+
+
+@router.post("/{session_id}/end", response_model=SessionEndResponse, status_code=status.HTTP_202_ACCEPTED)
+async def end_session(session_id: str):
+    bind_session(session_id)
+    job = await finalizer.get_job(session_id)
+    if not is_settled(job):
+        try:
+            async with session_service.session_lock(session_id):
+                bot = await session_service.get_session(session_id)
+                if not bot:
+                    raise HTTPException(
+                        status_code=status.HTTP_404_NOT_FOUND,
+                        detail="Session not found or already ended.",
+                    )
+                job = await finalizer.submit(session_id, bot)
+        except (session_service.SessionBusyError, session_service.SessionConflictError):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A message for this session is still being processed. Please retry.",
+            )
+
+    return SessionEndResponse(session_id=session_id, **job)
+
+
+@router.get("/{session_id}/summary", response_model=SessionEndResponse)
+async def get_session_summary(session_id: str):
+    job = await finalizer.get_job(session_id)
+    if job is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Session not found or already ended.",
+            detail="No end request found for this session.",
         )
+    return SessionEndResponse(session_id=session_id, **job)
 
-    summary = bot.generate_summary()
 
-    user_data: dict = {}
-    if bot.user_profile:
-        user_data = {**bot.user_profile}
-    user_data["summary"] = summary
+def _encode_cursor(record: SessionRecord) -> str:
+    raw = f"{record.created_at.isoformat()}|{record.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
 
-    record = SessionRecord(
-        session_id=session_id,
-        user_data=user_data,
-        ended_at=datetime.utcnow(),
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        created_at, record_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(record_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor.",
+        )
+
+
+@router.get("/history", response_model=list[SessionRecordOut])
+async def list_sessions(
+    response: Response,
+    skip: int = 0,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    query = select(SessionRecord).order_by(SessionRecord.created_at.desc(), SessionRecord.id.desc())
+    if cursor:
+        created_at, record_id = _decode_cursor(cursor)
+        query = query.where(
+            tuple_(SessionRecord.created_at, SessionRecord.id) < tuple_(created_at, record_id)
+        )
+    elif skip:
+        query = query.offset(skip)
+
+    result = await db.execute(query.limit(limit))
+    records = result.scalars().all()
+    # Keyset cursor for the next page; pass it back as ?cursor= instead of ?skip=.
+    if len(records) == limit:
+        response.headers["X-Next-Cursor"] = _encode_cursor(records[-1])
+    return records
+
+
+@router.get("/export")
+async def export_sessions(
+    format: str = Query("ndjson", pattern="^(ndjson|csv|parquet)$"),
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    ended_from: Optional[datetime] = None,
+    ended_to: Optional[datetime] = None,
+):
+    try:
+        archive_format = archive_service.get_format(format)
+    except ImportError as e:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=str(e))
+    query = archive_service.export_query(
+        created_from=archive_service.parse_datetime(created_from),
+        created_to=archive_service.parse_datetime(created_to),
+        ended_from=archive_service.parse_datetime(ended_from),
+        ended_to=archive_service.parse_datetime(ended_to),
     )
-    db.add(record)
-    await db.flush()
 
-    await session_service.remove_session(session_id)
+    async def _body():
+        # The DB session lives as long as the response stream, not the request handler.
+        async with AsyncSessionLocal() as db:
+            async for chunk in archive_service.export_records(db, archive_format, query):
+                yield chunk
 
-    return SessionEndResponse(
-        session_id=session_id,
-        summary=summary,
-        user_data=user_data,
+    return StreamingResponse(
+        _body(),
+        media_type=archive_format.media_type,
+        headers={"Content-Disposition": f'attachment; filename="sessions.{archive_format.name}"'},
     )
 
 
-@router.get("/history", response_model=list[SessionRecordOut])
-async def list_sessions(
-    skip: int = 0, limit: int = 50, db: AsyncSession = Depends(get_db)
+@router.get("/stats", response_model=SessionStatsOut)
+async def session_stats(
+    group_by: str = Query("none", pattern="^(none|major|quarter|anonymous)$"),
+    bucket: str = Query("day", pattern="^(day|week|month|total)$"),
+    ended_from: Optional[date] = None,
+    ended_to: Optional[date] = None,
+    db: AsyncSession = Depends(get_db),
 ):
-    result = await db.execute(
-        select(SessionRecord).offset(skip).limit(limit).order_by(SessionRecord.created_at.desc())
+    # Served from the rollups, so the cost follows the number of buckets, not of sessions.
+    rows = await stats_service.get_stats(db, group_by, bucket, ended_from, ended_to)
+    return SessionStatsOut(
+        group_by=group_by,
+        bucket=bucket,
+        ended_from=ended_from,
+        ended_to=ended_to,
+        total=sum(row["sessions"] for row in rows),
+        rows=rows,
     )
-    return result.scalars().all()
@@ -1,8 +1,9 @@
 from fastapi import APIRouter
 
-from app.api.v1.endpoints import chat, sessions
+from app.api.v1.endpoints import chat, metrics, sessions
 
 api_router = APIRouter()
 
 api_router.include_router(sessions.router, prefix="/sessions", tags=["sessions"])
 api_router.include_router(chat.router, prefix="/chat", tags=["chat"])
+api_router.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
@@ -0,0 +1,60 @@
+import json
+from typing import Any
+
+
+class JsonCodec:
+    name = "json"
+
+    def encode(self, obj: Any) -> bytes:
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
+
+    def decode(self, raw: bytes) -> Any:
+        return json.loads(raw)
+
+
+class OrjsonCodec:
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+
+        self._orjson = orjson
+
+    def encode(self, obj: Any) -> bytes:
+        return self._orjson.dumps(obj)
+
+    def decode(self, raw: bytes) -> Any:
+        return self._orjson.loads(raw)
+
+
+class MsgpackCodec:
+    name = "msgpack"
+
+    def __init__(self):
+        import msgpack
+
+        self._msgpack = msgpack
+
+    def encode(self, obj: Any) -> bytes:
+        return self._msgpack.packb(obj, use_bin_type=True)
+
+    def decode(self, raw: bytes) -> Any:
+        return self._msgpack.unpackb(raw, raw=False)
+
+
+_CODECS = {
+    "json": JsonCodec,
+    "orjson": OrjsonCodec,
+    "msgpack": MsgpackCodec,
+}
+
+
+def get_codec(name: str):
+    try:
+        codec_cls = _CODECS[name]
+    except KeyError:
+        raise ValueError(f"Unknown session codec '{name}'. Expected one of: {', '.join(_CODECS)}")
+    try:
+        return codec_cls()
+    except ImportError as e:
+        raise ImportError(f"Session codec '{name}' requires the optional '{name}' package.") from e
@@ -1,8 +1,16 @@
+from pydantic import BaseModel
 from pydantic_settings import BaseSettings
 from functools import lru_cache
 from pathlib import Path
 
 
+class LLMProviderConfig(BaseModel):
+    name: str
+    base_url: str | None = None
+    api_key: str = ""
+    model: str
+
+
 class Settings(BaseSettings):
     APP_NAME: str = "Trupy AI"
     APP_VERSION: str = "1.0.0"
@@ -12,15 +20,115 @@ class Settings(BaseSettings):
     BASE_URL: str | None = "your-base-url"
     MODEL: str = "your-model"
 
+    LLM_TIMEOUT: float = 60.0
+    LLM_MAX_CONNECTIONS: int = 100
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    LLM_KEEPALIVE_EXPIRY: float = 30.0
+
+    # Ordered OpenAI-compatible endpoints, e.g. LLM_PROVIDERS='[{"name": "primary", "base_url": "...",
+    # "api_key": "...", "model": "..."}, ...]'. Empty means a single provider from BASE_URL/LLM_API_KEY/MODEL.
+    LLM_PROVIDERS: list[LLMProviderConfig] = []
+    LLM_CIRCUIT_FAILURE_THRESHOLD: int = 5
+    LLM_CIRCUIT_RESET_TIMEOUT: float = 30.0
+    LLM_LATENCY_WINDOW: int = 200
+    LLM_HEDGE_ENABLED: bool = False
+    LLM_HEDGE_DEFAULT_DELAY: float = 2.0
+    # In-process scheduler: chat turns first, then greetings, then background summaries. The
+    # concurrency limit adapts (AIMD) between MIN and MAX: it grows while calls answer within
+    # LLM_LATENCY_TARGET and shrinks on 429s, timeouts and slow answers.
+    LLM_CONCURRENCY_INITIAL: int = 16
+    LLM_CONCURRENCY_MIN: int = 2
+    LLM_CONCURRENCY_MAX: int = 64
+    LLM_LATENCY_TARGET: float = 5.0
+    # Seconds each class may take end to end; calls that would miss it get a fallback instead of queuing.
+    LLM_DEADLINE_INTERACTIVE: float = 20.0
+    LLM_DEADLINE_GREETING: float = 10.0
+    LLM_DEADLINE_BACKGROUND: float = 600.0
+
+    # Exact-match reply cache, used only for stateless prompts (the greeting), never for chat turns.
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_TTL: int = 86400
+    GREETING_POOL_ENABLED: bool = True
+    GREETING_POOL_SIZE: int = 8
+    GREETING_POOL_REFRESH_INTERVAL: int = 3600
+
+    CONTEXT_TOKEN_BUDGET: int = 3000
+    SUMMARY_REFRESH_TURNS: int = 6
+
+    CRISIS_LANGUAGES: list[str] = ["en", "es"]
+    CRISIS_KEYWORDS_FILE: Path | None = None
+    # Second-stage risk classifier (needs numpy): scores every user message that passes the keyword
+    # check on RISK_WORKERS processes, in batches of up to RISK_BATCH_SIZE that form while the workers
+    # are busy (RISK_BATCH_WAIT > 0 also holds each batch open that many seconds). A message not
+    # scored within RISK_TIMEOUT passes unflagged. The threshold defaults to the one stored with the
+    # model by train_risk_model.py.
+    RISK_CLASSIFIER_ENABLED: bool = False
+    RISK_MODEL_PATH: Path = Path(__file__).resolve().parent.parent / "data" / "risk_model.npz"
+    RISK_THRESHOLD: float | None = None
+    RISK_BATCH_SIZE: int = 32
+    RISK_BATCH_WAIT: float = 0.0
+    RISK_WORKERS: int = 1
+    RISK_TIMEOUT: float = 0.5
+
+    FINALIZE_CONCURRENCY: int = 16
+    FINALIZE_BATCH_SIZE: int = 100
+    FINALIZE_FLUSH_INTERVAL: float = 0.5
+    FINALIZE_JOB_TTL: int = 3600
+    # A job still pending after this long is assumed lost (e.g. the worker died) and is submitted again.
+    FINALIZE_JOB_STALE_AFTER: float = 900.0
+    # Sessions that time out are finalized too. Their state and messages outlive SESSION_TTL by
+    # SESSION_EXPIRY_GRACE so the summary can still be generated; the index of expiry times is
+    # polled every EXPIRY_POLL_INTERVAL, and a claimed session is retried after EXPIRY_CLAIM_TIMEOUT.
+    SESSION_EXPIRY_GRACE: int = 3600
+    EXPIRY_POLL_INTERVAL: float = 5.0
+    EXPIRY_BATCH_SIZE: int = 100
+    EXPIRY_CLAIM_TIMEOUT: int = 600
+
     DATABASE_URL: str = "sqlite+aiosqlite:///./trupy.db"
+    SQLITE_PROFILE: str = "tuned"
 
     REDIS_URL: str = "redis://localhost:6379/0"
+    REDIS_MAX_CONNECTIONS: int = 100
+    REDIS_POOL_TIMEOUT: float = 10.0
     
     SESSION_TTL: int = 900
+    SESSION_CODEC: str = "json"
+    SESSION_LOCK_TTL: float = 120.0
+    SESSION_LOCK_WAIT: float = 30.0
+    # In-process cache of hydrated sessions, validated against Redis by version on every read.
+    SESSION_CACHE_ENABLED: bool = True
+    SESSION_CACHE_MAX_ENTRIES: int = 1000
+    SESSION_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    # WebSocket chat: the connection owns its session and writes it back behind the replies.
+    WS_HEARTBEAT_INTERVAL: float = 15.0
+    # 0 writes back after every turn; otherwise at most this often (and on disconnect),
+    # so a worker crash can lose the turns since the last checkpoint.
+    WS_CHECKPOINT_INTERVAL: float = 0.0
 
     RATE_LIMIT_CHAT: str = "30/minute"
+    RATE_LIMIT_CHAT_PER_IP: str = "600/minute"
+    # Addresses or CIDRs of reverse proxies whose X-Forwarded-For is believed; from anyone else it is ignored.
+    TRUSTED_PROXIES: list[str] = []
+    LLM_MAX_IN_FLIGHT: int = 64
+    LLM_SLOT_STALE_AFTER: float = 180.0
 
     LOGS_DIR: Path = Path("app/logs")
+    LOG_LEVEL: str = "INFO"
+    # Per-logger overrides, e.g. LOG_LEVELS='{"session_service": "WARNING"}'
+    LOG_LEVELS: dict[str, str] = {}
+    LOG_FORMAT: str = "text"  # "text" | "json"
+    LOG_FILE_ENABLED: bool = True
+    LOG_ROTATION: str = "size"  # "size" | "time"
+    LOG_MAX_BYTES: int = 10 * 1024 * 1024
+    LOG_ROTATE_WHEN: str = "midnight"
+    LOG_BACKUP_COUNT: int = 5
+
+    # Singleton background jobs (session sweep, greeting pool refresh) run in the worker holding this lease.
+    LEADER_LEASE_TTL: float = 15.0
+
+    METRICS_ENABLED: bool = True
+    SERVER_TIMING_ENABLED: bool = True
+    EVENT_LOOP_LAG_INTERVAL: float = 0.5
 
     CORS_ORIGINS: list[str] = ["*"]
 
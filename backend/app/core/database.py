@@ -1,15 +1,38 @@
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
 from app.core.config import get_settings
 
 settings = get_settings()
 
+SQLITE_PROFILES: dict[str, dict[str, str | int]] = {
+    "default": {},
+    "tuned": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,
+        "cache_size": -65536,  # negative = KiB, i.e. 64 MiB
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+    },
+}
+
 engine = create_async_engine(
     settings.DATABASE_URL,
     echo=False,
     future=True,
 )
 
+if engine.dialect.name == "sqlite":
+    _pragmas = SQLITE_PROFILES[settings.SQLITE_PROFILE]
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in _pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
 AsyncSessionLocal = async_sessionmaker(
     engine,
     class_=AsyncSession,
@@ -21,9 +44,17 @@ class Base(DeclarativeBase):
     pass
 
 
+def _create_indexes(sync_conn) -> None:
+    # create_all skips tables that already exist, so indexes added later are created here.
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+
 async def init_db() -> None:
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_create_indexes)
 
 
 async def get_db() -> AsyncSession:
@@ -0,0 +1,69 @@
+import asyncio
+import os
+import uuid
+from typing import Awaitable, Callable
+
+from app.core.config import get_settings
+from app.core.redis_client import get_redis
+from app.utils.logger import setup_logger
+
+settings = get_settings()
+logger = setup_logger(name="leader")
+
+LEADER_PREFIX = "leader:"
+
+# Extends the lease only while the caller still holds it.
+_RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+async def _hold(key: str, token: str, job: asyncio.Task) -> None:
+    redis = await get_redis()
+    ttl_ms = int(settings.LEADER_LEASE_TTL * 1000)
+    while not job.done():
+        await asyncio.sleep(settings.LEADER_LEASE_TTL / 3)
+        if not await redis.eval(_RENEW_SCRIPT, 1, key, token, ttl_ms):
+            logger.warning("Lost leadership of %s; stopping job.", key)
+            job.cancel()
+            return
+
+
+async def run_as_leader(name: str, job: Callable[[], Awaitable[None]]) -> None:
+    """Run `job` in exactly one worker across the deployment, taking over if the holder dies."""
+    key = f"{LEADER_PREFIX}{name}"
+    token = f"{os.getpid()}:{uuid.uuid4().hex}"
+    current = asyncio.current_task()
+    # Jobs swallow their own cancellation, so check whether *this* task is being shut down.
+    while not current.cancelling():
+        try:
+            redis = await get_redis()
+            acquired = await redis.set(key, token, nx=True, px=int(settings.LEADER_LEASE_TTL * 1000))
+            if not acquired:
+                await asyncio.sleep(settings.LEADER_LEASE_TTL / 2)
+                continue
+
+            logger.info("Acquired leadership of %s | pid=%s", key, os.getpid())
+            task = asyncio.create_task(job())
+            holder = asyncio.create_task(_hold(key, token, task))
+            try:
+                await task
+            finally:
+                holder.cancel()
+                await redis.eval(_RELEASE_SCRIPT, 1, key, token)
+        except asyncio.CancelledError:
+            if current.cancelling():
+                break
+        except Exception as e:
+            logger.error("Leader election for %s failed: %s", key, e)
+            await asyncio.sleep(settings.LEADER_LEASE_TTL / 2)
@@ -1,4 +1,159 @@
-from slowapi import Limiter
-from slowapi.util import get_remote_address
+import ipaddress
+import time
+import uuid
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import AsyncIterator, List, Tuple
 
-limiter = Limiter(key_func=get_remote_address)
+from fastapi import HTTPException, status
+from starlette.requests import HTTPConnection
+
+from app.core.config import get_settings
+from app.core.redis_client import get_redis
+
+RATE_LIMIT_PREFIX = "ratelimit:"
+LLM_SLOTS_KEY = "llm_slots"
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+# Sliding-window log over sorted sets. All windows are checked first and the hit is
+# recorded in every window only if none is full, so one request never half-consumes quota.
+# ARGV: now_ms, member, then (window_ms, limit) per key. Returns {allowed, retry_after_ms}.
+_SLIDING_WINDOW_SCRIPT = """
+local now = tonumber(ARGV[1])
+local retry_after = 0
+for i, key in ipairs(KEYS) do
+    local window = tonumber(ARGV[1 + i * 2])
+    local limit = tonumber(ARGV[2 + i * 2])
+    redis.call('ZREMRANGEBYSCORE', key, 0, now - window)
+    if redis.call('ZCARD', key) >= limit then
+        local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+        retry_after = math.max(retry_after, tonumber(oldest[2]) + window - now)
+    end
+end
+if retry_after > 0 then
+    return {0, retry_after}
+end
+for i, key in ipairs(KEYS) do
+    local window = tonumber(ARGV[1 + i * 2])
+    redis.call('ZADD', key, now, ARGV[2])
+    redis.call('PEXPIRE', key, window)
+end
+return {1, 0}
+"""
+
+# Counting semaphore over a sorted set; holders older than ARGV[3] ms are treated as crashed.
+# ARGV: now_ms, token, stale_ms, capacity.
+_ACQUIRE_SLOT_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], 0, tonumber(ARGV[1]) - tonumber(ARGV[3]))
+if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[4]) then
+    redis.call('ZADD', KEYS[1], ARGV[1], ARGV[2])
+    return 1
+end
+return 0
+"""
+
+
+def parse_rate(rate: str) -> Tuple[int, int]:
+    """Parse '15/minute' into (limit, window_seconds)."""
+    amount, _, period = rate.partition("/")
+    return int(amount), _PERIODS[period.strip().rstrip("s")]
+
+
+@lru_cache
+def _trusted_proxies() -> Tuple[ipaddress._BaseNetwork, ...]:
+    return tuple(ipaddress.ip_network(proxy, strict=False) for proxy in get_settings().TRUSTED_PROXIES)
+
+
+def _is_trusted(host: str) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in _trusted_proxies())
+
+
+def client_ip(request: HTTPConnection) -> str:
+    host = request.client.host if request.client else "unknown"
+    forwarded = request.headers.get("x-forwarded-for")
+    if not forwarded or not _is_trusted(host):
+        return host
+    # Each trusted proxy appends the address it saw, so the nearest untrusted hop is the client;
+    # anything left of it was sent by the client and can be forged.
+    for hop in reversed([hop.strip() for hop in forwarded.split(",")]):
+        if not _is_trusted(hop):
+            return hop
+        host = hop
+    return host
+
+
+async def hit(limits: List[Tuple[str, str]]) -> float:
+    """Record one hit against every (key, rate) pair. Returns 0 if allowed, else seconds to wait."""
+    redis = await get_redis()
+    now_ms = int(time.time() * 1000)
+    args: list = [now_ms, f"{now_ms}-{uuid.uuid4().hex[:8]}"]
+    for _, rate in limits:
+        limit, window = parse_rate(rate)
+        args.extend([window * 1000, limit])
+    allowed, retry_after_ms = await redis.eval(
+        _SLIDING_WINDOW_SCRIPT,
+        len(limits),
+        *(f"{RATE_LIMIT_PREFIX}{key}" for key, _ in limits),
+        *args,
+    )
+    return 0.0 if allowed else int(retry_after_ms) / 1000
+
+
+async def chat_rate_limit(connection: HTTPConnection, session_id: str) -> float:
+    """Count one chat message; works for both HTTP requests and WebSocket connections."""
+    settings = get_settings()
+    return await hit([
+        (f"session:{session_id}", settings.RATE_LIMIT_CHAT),
+        (f"ip:{client_ip(connection)}", settings.RATE_LIMIT_CHAT_PER_IP),
+    ])
+
+
+async def enforce_chat_rate_limit(request: HTTPConnection, session_id: str) -> None:
+    retry_after = await chat_rate_limit(request, session_id)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded. Please slow down.",
+            headers={"Retry-After": str(max(1, round(retry_after)))},
+        )
+
+
+async def acquire_llm_slot() -> str:
+    settings = get_settings()
+    redis = await get_redis()
+    token = uuid.uuid4().hex
+    acquired = await redis.eval(
+        _ACQUIRE_SLOT_SCRIPT,
+        1,
+        LLM_SLOTS_KEY,
+        int(time.time() * 1000),
+        token,
+        int(settings.LLM_SLOT_STALE_AFTER * 1000),
+        settings.LLM_MAX_IN_FLIGHT,
+    )
+    if not acquired:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Trupy is handling a lot of conversations right now. Please try again in a moment.",
+            headers={"Retry-After": "2"},
+        )
+    return token
+
+
+async def release_llm_slot(token: str) -> None:
+    redis = await get_redis()
+    await redis.zrem(LLM_SLOTS_KEY, token)
+
+
+@asynccontextmanager
+async def llm_slot() -> AsyncIterator[None]:
+    token = await acquire_llm_slot()
+    try:
+        yield
+    finally:
+        await release_llm_slot(token)
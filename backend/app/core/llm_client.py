@@ -0,0 +1,225 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Deque, List, Optional
+
+import httpx
+from openai import APIConnectionError, APIStatusError, AsyncOpenAI, DefaultAsyncHttpxClient, OpenAIError
+
+from app.core.config import LLMProviderConfig, get_settings
+from app.utils.logger import setup_logger
+
+logger = setup_logger(name="llm_client")
+
+_router: Optional["LLMRouter"] = None
+
+
+class LLMUnavailableError(OpenAIError):
+    pass
+
+
+def is_endpoint_failure(error: BaseException) -> bool:
+    """Errors that say the endpoint is unhealthy: timeouts, connection errors, 429s and 5xx.
+
+    A 4xx such as a malformed request or a bad key is about the call, not the endpoint's health.
+    """
+    if isinstance(error, APIConnectionError):
+        return True
+    return isinstance(error, APIStatusError) and (error.status_code == 429 or error.status_code >= 500)
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures; after the reset timeout lets one trial call through."""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def release_trial(self) -> None:
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class LLMEndpoint:
+    def __init__(self, config: LLMProviderConfig, client: AsyncOpenAI, breaker: CircuitBreaker, window: int):
+        self.name = config.name
+        self.model = config.model
+        self.client = client
+        self.breaker = breaker
+        self.latencies: Deque[float] = deque(maxlen=window)
+
+    def p95(self) -> Optional[float]:
+        if len(self.latencies) < 20:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    async def create(self, **kwargs: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            response = await self.client.chat.completions.create(model=self.model, **kwargs)
+        except asyncio.CancelledError:
+            # A cancelled hedge loser says nothing about the endpoint's health.
+            self.breaker.release_trial()
+            raise
+        except OpenAIError as e:
+            if is_endpoint_failure(e):
+                self.breaker.record_failure()
+            else:
+                self.breaker.release_trial()
+            logger.warning("LLM endpoint %s failed: %s | breaker=%s", self.name, e, self.breaker.state)
+            raise
+        self.latencies.append(time.perf_counter() - start)
+        self.breaker.record_success()
+        return response
+
+
+class LLMRouter:
+    """Routes completions across OpenAI-compatible endpoints with failover and optional hedging."""
+
+    def __init__(self, endpoints: List[LLMEndpoint], hedge: bool, hedge_default_delay: float):
+        self.endpoints = endpoints
+        self.hedge = hedge
+        self.hedge_default_delay = hedge_default_delay
+
+    def _candidates(self) -> List[LLMEndpoint]:
+        # Endpoints without enough samples sort first (optimistic) so they get measured;
+        # the sort is stable, so configuration order breaks ties.
+        healthy = [ep for ep in self.endpoints if ep.breaker.state == "closed"]
+        healthy.sort(key=lambda ep: ep.p95() or 0.0)
+        recovering = [ep for ep in self.endpoints if ep.breaker.state == "half_open"]
+        return healthy + recovering
+
+    async def create(self, **kwargs: Any) -> Any:
+        candidates = self._candidates()
+        if self.hedge and not kwargs.get("stream") and len(candidates) > 1:
+            return await self._hedged(candidates, kwargs)
+        return await self._failover(candidates, kwargs)
+
+    async def _failover(self, candidates: List[LLMEndpoint], kwargs: dict) -> Any:
+        last_error: Optional[Exception] = None
+        for endpoint in candidates:
+            if not endpoint.breaker.allow():
+                continue
+            try:
+                return await endpoint.create(**kwargs)
+            except OpenAIError as e:
+                last_error = e
+        raise last_error or LLMUnavailableError("No LLM endpoint is currently available.")
+
+    async def _hedged(self, candidates: List[LLMEndpoint], kwargs: dict) -> Any:
+        primary, backups = candidates[0], candidates[1:]
+        if not primary.breaker.allow():
+            return await self._failover(backups, kwargs)
+
+        delay = primary.p95() or self.hedge_default_delay
+        primary_task = asyncio.create_task(primary.create(**kwargs))
+        pending = {primary_task}
+        # Whatever is still running when this returns, raises or is cancelled (client gone, deadline
+        # passed) is cancelled too, so no request is left holding an upstream connection.
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if done and primary_task.exception() is None:
+                return primary_task.result()
+
+            backup = next((ep for ep in backups if ep.breaker.allow()), None)
+            if backup is None:
+                return await primary_task
+
+            # Primary is slower than its p95 (or failed): race a backup and keep the first success.
+            pending.add(asyncio.create_task(backup.create(**kwargs)))
+            last_error: Optional[BaseException] = primary_task.exception() if done else None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    last_error = task.exception()
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def close(self) -> None:
+        for endpoint in self.endpoints:
+            await endpoint.client.close()
+
+
+def _build_client(config: LLMProviderConfig) -> AsyncOpenAI:
+    settings = get_settings()
+    return AsyncOpenAI(
+        base_url=config.base_url or None,
+        api_key=config.api_key,
+        # Retries are handled by the router (failover) and the caller's tenacity policy.
+        max_retries=0,
+        http_client=DefaultAsyncHttpxClient(
+            timeout=settings.LLM_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY,
+            ),
+        ),
+    )
+
+
+def get_llm_client() -> LLMRouter:
+    global _router
+    if _router is None:
+        settings = get_settings()
+        providers = settings.LLM_PROVIDERS or [
+            LLMProviderConfig(
+                name="default",
+                base_url=settings.BASE_URL,
+                api_key=settings.LLM_API_KEY,
+                model=settings.MODEL,
+            )
+        ]
+        endpoints = [
+            LLMEndpoint(
+                config,
+                _build_client(config),
+                CircuitBreaker(settings.LLM_CIRCUIT_FAILURE_THRESHOLD, settings.LLM_CIRCUIT_RESET_TIMEOUT),
+                settings.LLM_LATENCY_WINDOW,
+            )
+            for config in providers
+        ]
+        _router = LLMRouter(endpoints, settings.LLM_HEDGE_ENABLED, settings.LLM_HEDGE_DEFAULT_DELAY)
+    return _router
+
+
+async def close_llm_client() -> None:
+    global _router
+    if _router:
+        await _router.close()
+        _router = None
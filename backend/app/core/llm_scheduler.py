@@ -0,0 +1,200 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from openai import APITimeoutError, RateLimitError
+
+from app.core.config import get_settings
+from app.core.llm_client import LLMUnavailableError
+from app.core.metrics import (
+    LLM_CONCURRENCY_LIMIT,
+    LLM_IN_FLIGHT,
+    LLM_QUEUE_DEPTH,
+    LLM_QUEUE_WAIT_SECONDS,
+    LLM_SHED,
+    observe_stage,
+)
+from app.utils.logger import setup_logger
+
+logger = setup_logger(name="llm_scheduler")
+
+_scheduler: Optional["LLMScheduler"] = None
+
+# Multiplicative decrease factor. Decreases are at least one call duration apart, so that errors
+# from calls that were all in flight together count as a single congestion signal.
+BACKOFF = 0.7
+# Initial guess at how long a call holds its slot, until real calls have been measured.
+DEFAULT_SERVICE_TIME = 2.0
+# Background calls may fill only this share of the limit, so chat turns find a free slot
+# instead of waiting behind a summary that is already running.
+BACKGROUND_SHARE = 0.5
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    GREETING = 1
+    BACKGROUND = 2
+
+
+class LLMDeadlineError(LLMUnavailableError):
+    """The call could not start in time to finish before its deadline; nothing was sent upstream, so it can be retried."""
+
+
+class Slot:
+    def __init__(self):
+        # Latency used for the AIMD signal. Streams set it to time-to-first-token, since
+        # their total duration depends on the reply length rather than upstream load.
+        self.latency: Optional[float] = None
+
+
+class LLMScheduler:
+    """Orders upstream LLM calls by priority and deadline under an adaptive concurrency limit."""
+
+    def __init__(self, initial: int, minimum: int, maximum: int, latency_target: float):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.in_flight = 0
+        # Heap of (priority, deadline, seq, future); cancelled futures are skipped lazily.
+        self._waiters: List[Tuple[int, float, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._service_time: Dict[Priority, float] = {}
+        self._last_decrease = 0.0
+        LLM_CONCURRENCY_LIMIT.set(self.limit)
+
+    def deadline(self, priority: Priority) -> float:
+        settings = get_settings()
+        budget = {
+            Priority.INTERACTIVE: settings.LLM_DEADLINE_INTERACTIVE,
+            Priority.GREETING: settings.LLM_DEADLINE_GREETING,
+            Priority.BACKGROUND: settings.LLM_DEADLINE_BACKGROUND,
+        }[priority]
+        return time.monotonic() + budget
+
+    def _capacity(self, priority: Priority) -> int:
+        if priority == Priority.BACKGROUND:
+            return max(1, int(self.limit * BACKGROUND_SHARE))
+        return int(self.limit)
+
+    def _expected_service(self, priority: Priority) -> float:
+        return self._service_time.get(priority, DEFAULT_SERVICE_TIME)
+
+    def _queued(self, priority: Priority) -> int:
+        return sum(1 for p, _, _, f in self._waiters if p == priority and not f.done())
+
+    def _update_depth(self, priority: Priority) -> None:
+        LLM_QUEUE_DEPTH.set(self._queued(priority), priority.name.lower())
+
+    def _shed(self, priority: Priority, reason: str) -> LLMDeadlineError:
+        LLM_SHED.inc(1, priority.name.lower())
+        logger.warning("LLM call shed | priority=%s | %s", priority.name.lower(), reason)
+        return LLMDeadlineError(f"LLM call would miss its deadline ({reason}).")
+
+    async def _acquire(self, priority: Priority, deadline: float) -> None:
+        ahead = sum(1 for p, d, _, f in self._waiters if (p, d) <= (priority, deadline) and not f.done())
+        if ahead == 0 and self.in_flight < self._capacity(priority):
+            self.in_flight += 1
+            return
+
+        now = time.monotonic()
+        service = self._expected_service(priority)
+        # Calls ahead of this one drain `limit` at a time, each holding its slot for about `service`.
+        expected_wait = (ahead // self._capacity(priority) + 1) * service
+        latest_start = deadline - service
+        if now + expected_wait > latest_start:
+            raise self._shed(priority, f"expected wait {expected_wait:.1f}s, {ahead} ahead")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (int(priority), deadline, next(self._seq), future))
+        self._update_depth(priority)
+        try:
+            await asyncio.wait_for(future, timeout=max(0.0, latest_start - now))
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # Granted just as the wait ended: hand the slot on.
+                self._release()
+            if isinstance(e, asyncio.TimeoutError):
+                raise self._shed(priority, "deadline reached while queued")
+            raise
+        finally:
+            self._update_depth(priority)
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters:
+            priority, _, _, future = self._waiters[0]
+            if not future.done() and self.in_flight >= self._capacity(Priority(priority)):
+                break
+            heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self.in_flight += 1
+            future.set_result(None)
+            self._update_depth(Priority(priority))
+        LLM_IN_FLIGHT.set(self.in_flight)
+
+    def _record(self, priority: Priority, held: float, latency: float, error: Optional[BaseException]) -> None:
+        if error is None:
+            previous = self._service_time.get(priority)
+            self._service_time[priority] = held if previous is None else 0.8 * previous + 0.2 * held
+
+        congested = isinstance(error, (RateLimitError, APITimeoutError)) or (
+            error is None and latency > self.latency_target
+        )
+        if congested:
+            now = time.monotonic()
+            if now - self._last_decrease >= self._expected_service(priority) and self.limit > self.minimum:
+                self._last_decrease = now
+                self.limit = max(self.minimum, self.limit * BACKOFF)
+                logger.info("LLM concurrency limit decreased to %.1f | %s", self.limit, type(error).__name__ if error else "slow")
+        elif error is None and self.in_flight * 2 >= self.limit:
+            # Additive increase, about +1 per full window of successes; only while the limit is
+            # actually in use, so a quiet period does not inflate it past what upstream can take.
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        LLM_CONCURRENCY_LIMIT.set(self.limit)
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority, deadline: Optional[float] = None) -> AsyncIterator[Slot]:
+        """Hold one upstream concurrency slot. Raises LLMDeadlineError instead of waiting past `deadline`."""
+        if deadline is None:
+            deadline = self.deadline(priority)
+        queued_at = time.monotonic()
+        await self._acquire(priority, deadline)
+        started = time.monotonic()
+        LLM_QUEUE_WAIT_SECONDS.observe(started - queued_at, priority.name.lower())
+        observe_stage("llm_queue", started - queued_at)
+        LLM_IN_FLIGHT.set(self.in_flight)
+
+        slot = Slot()
+        error: Optional[BaseException] = None
+        try:
+            yield slot
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            held = time.monotonic() - started
+            if not isinstance(error, asyncio.CancelledError):
+                self._record(priority, held, slot.latency if slot.latency is not None else held, error)
+            self._release()
+
+
+def get_llm_scheduler() -> LLMScheduler:
+    global _scheduler
+    if _scheduler is None:
+        settings = get_settings()
+        _scheduler = LLMScheduler(
+            settings.LLM_CONCURRENCY_INITIAL,
+            settings.LLM_CONCURRENCY_MIN,
+            settings.LLM_CONCURRENCY_MAX,
+            settings.LLM_LATENCY_TARGET,
+        )
+    return _scheduler
@@ -0,0 +1,234 @@
+import asyncio
+import bisect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.utils.logger import setup_logger
+
+logger = setup_logger(name="metrics")
+
+# Prometheus text exposition for a handful of in-process metrics; values are per worker process.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = labels
+        REGISTRY.append(self)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, *labels: str) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for labels, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {value}")
+        return lines
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {} if labels else {(): 0.0}
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+    def inc(self, amount: float = 1.0, *labels: str) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, *labels: str) -> None:
+        self.inc(-amount, *labels)
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for labels, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {value}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = buckets
+        # Per label set: non-cumulative bucket counts (last slot is +Inf) and the running sum.
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        counts = self._counts.get(labels)
+        if counts is None:
+            counts = self._counts[labels] = [0] * (len(self.buckets) + 1)
+            self._sums[labels] = 0.0
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self._sums[labels] += value
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for labels, counts in self._counts.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = _format_labels(self.label_names, labels, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            label_str = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{label_str} {self._sums[labels]}")
+            lines.append(f"{self.name}_count{label_str} {cumulative}")
+        return lines
+
+
+REGISTRY: List[_Metric] = []
+
+REQUEST_SECONDS = Histogram(
+    "trupy_http_request_duration_seconds",
+    "HTTP request latency until the response headers are sent.",
+    ("method", "route", "status"),
+)
+STAGE_SECONDS = Histogram(
+    "trupy_stage_duration_seconds",
+    "Time spent in each stage of a chat turn.",
+    ("stage",),
+)
+LLM_TOKENS = Counter(
+    "trupy_llm_tokens_total",
+    "Tokens reported by the upstream LLM.",
+    ("kind",),
+)
+SESSION_CACHE_LOOKUPS = Counter(
+    "trupy_session_cache_lookups_total",
+    "In-process session cache lookups by result (hit, stale, miss).",
+    ("result",),
+)
+WEBSOCKET_CONNECTIONS = Gauge(
+    "trupy_websocket_connections",
+    "Open WebSocket chat connections.",
+)
+LLM_QUEUE_DEPTH = Gauge(
+    "trupy_llm_queue_depth",
+    "LLM calls waiting for a concurrency slot, by priority.",
+    ("priority",),
+)
+LLM_QUEUE_WAIT_SECONDS = Histogram(
+    "trupy_llm_queue_wait_seconds",
+    "Time LLM calls waited for a concurrency slot, by priority.",
+    ("priority",),
+)
+LLM_SHED = Counter(
+    "trupy_llm_shed_total",
+    "LLM calls answered with a fallback because they would have missed their deadline.",
+    ("priority",),
+)
+LLM_IN_FLIGHT = Gauge(
+    "trupy_llm_in_flight",
+    "LLM calls currently running in this worker.",
+)
+LLM_CONCURRENCY_LIMIT = Gauge(
+    "trupy_llm_concurrency_limit",
+    "Adaptive (AIMD) limit on concurrent LLM calls in this worker.",
+)
+EXPIRED_SESSIONS = Counter(
+    "trupy_expired_sessions_total",
+    "Timed-out sessions claimed by the expiry watcher, by outcome (queued, live, gone).",
+    ("outcome",),
+)
+RISK_FLAGS = Counter(
+    "trupy_risk_flags_total",
+    "User messages the risk classifier scored at or above its threshold.",
+)
+RISK_BATCH_SIZE = Histogram(
+    "trupy_risk_batch_size",
+    "Messages per risk classifier batch.",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+EVENT_LOOP_LAG = Gauge(
+    "trupy_event_loop_lag_seconds",
+    "How late the last event-loop lag probe woke up.",
+)
+
+# Stage durations of the current request, read by the Server-Timing middleware.
+_request_stages: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_stages", default=None)
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def observe_stage(name: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, name)
+    stages = _request_stages.get()
+    if stages is not None:
+        stages[name] = stages.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - start)
+
+
+def record_usage(usage) -> None:
+    if usage is None:
+        return
+    LLM_TOKENS.inc(usage.prompt_tokens or 0, "prompt")
+    LLM_TOKENS.inc(usage.completion_tokens or 0, "completion")
+
+
+def start_request() -> Dict[str, float]:
+    stages: Dict[str, float] = {}
+    _request_stages.set(stages)
+    return stages
+
+
+async def monitor_event_loop_lag(interval: float) -> None:
+    while True:
+        try:
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            lag = max(0.0, time.perf_counter() - start - interval)
+            EVENT_LOOP_LAG.set(lag)
+            if lag > 1.0:
+                logger.warning("Event loop blocked for %.2fs", lag)
+        except asyncio.CancelledError:
+            break
@@ -0,0 +1,51 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core import metrics
+
+
+def _route_template(scope: Scope) -> str:
+    # Label by path template (/sessions/{session_id}/end), not the raw path, to keep cardinality bounded.
+    template = getattr(scope.get("route"), "path", None)
+    if template is None:
+        return "unmatched"
+    # Newer FastAPI versions keep an included router's routes unprefixed; the prefix is then
+    # the leading segments of the path that the template does not cover.
+    prefix_segments = scope["path"].rstrip("/").count("/") - template.rstrip("/").count("/")
+    if prefix_segments > 0:
+        template = "/".join(scope["path"].split("/")[: prefix_segments + 1]) + template
+    return template
+
+
+class ServerTimingMiddleware:
+    """Records request latency and adds a Server-Timing header with the per-stage breakdown.
+
+    For streamed responses the header only covers the stages that ran before the first byte.
+    """
+
+    def __init__(self, app: ASGIApp, server_timing: bool = True):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        stages = metrics.start_request()
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - start
+                metrics.REQUEST_SECONDS.observe(elapsed, scope["method"], _route_template(scope), str(message["status"]))
+                if self.server_timing:
+                    entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in stages.items()]
+                    entries.append(f"total;dur={elapsed * 1000:.2f}")
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", ", ".join(entries).encode()))
+                    message["headers"] = headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_timing)
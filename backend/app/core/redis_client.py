@@ -1,21 +1,44 @@
-from redis.asyncio import Redis
-from redis.asyncio import from_url
+from redis.asyncio import BlockingConnectionPool, Redis
 
 from app.core.config import get_settings
 
 _redis: Redis | None = None
+_binary_redis: Redis | None = None
+
+
+def _connect(url: str, decode_responses: bool) -> Redis:
+    # A blocking pool makes bursts wait for a free connection instead of failing once the cap is hit.
+    settings = get_settings()
+    pool = BlockingConnectionPool.from_url(
+        url,
+        decode_responses=decode_responses,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        timeout=settings.REDIS_POOL_TIMEOUT,
+    )
+    return Redis.from_pool(pool)
 
 
 async def get_redis() -> Redis:
     global _redis
     if _redis is None:
         settings = get_settings()
-        _redis = from_url(settings.REDIS_URL, decode_responses=True)
+        _redis = _connect(settings.REDIS_URL, decode_responses=True)
     return _redis
 
 
+async def get_binary_redis() -> Redis:
+    global _binary_redis
+    if _binary_redis is None:
+        settings = get_settings()
+        _binary_redis = _connect(settings.REDIS_URL, decode_responses=False)
+    return _binary_redis
+
+
 async def close_redis() -> None:
-    global _redis
+    global _redis, _binary_redis
     if _redis:
         await _redis.aclose()
         _redis = None
+    if _binary_redis:
+        await _binary_redis.aclose()
+        _binary_redis = None
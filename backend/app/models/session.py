@@ -1,5 +1,5 @@
-from datetime import datetime
-from sqlalchemy import JSON, DateTime, Integer, String
+from datetime import date, datetime
+from sqlalchemy import JSON, Boolean, Date, DateTime, Index, Integer, String
 from sqlalchemy.orm import Mapped, mapped_column
 from app.core.database import Base
 
@@ -12,3 +12,23 @@ class SessionRecord(Base):
     user_data: Mapped[dict] = mapped_column(JSON, nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     ended_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Serves keyset pagination over (created_at DESC, id DESC) on /sessions/history.
+        Index("ix_sessions_created_at_id", "created_at", "id"),
+    )
+
+
+class SessionRollup(Base):
+    """Ended-session counts per UTC day and profile, kept in step with the sessions table.
+
+    Anonymous sessions have empty major and quarter.
+    """
+
+    __tablename__ = "session_rollups"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    anonymous: Mapped[bool] = mapped_column(Boolean, primary_key=True)
+    major: Mapped[str] = mapped_column(String, primary_key=True)
+    quarter: Mapped[str] = mapped_column(String, primary_key=True)
+    sessions: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from typing import Optional
-from datetime import datetime
+from datetime import date, datetime
 
 
 class UserProfile(BaseModel):
@@ -22,8 +22,9 @@ class SessionStartResponse(BaseModel):
 
 class SessionEndResponse(BaseModel):
     session_id: str
-    summary: str
-    user_data: dict
+    status: str
+    summary: Optional[str] = None
+    user_data: Optional[dict] = None
 
 
 class SessionRecordOut(BaseModel):
@@ -34,3 +35,24 @@ class SessionRecordOut(BaseModel):
     ended_at: Optional[datetime] = None
 
     model_config = {"from_attributes": True}
+
+
+class ActiveSessionsOut(BaseModel):
+    active: int
+    anonymous: int
+    identified: int
+
+
+class SessionStatsRow(BaseModel):
+    bucket: Optional[str] = None
+    group: Optional[str] = None
+    sessions: int
+
+
+class SessionStatsOut(BaseModel):
+    group_by: str
+    bucket: str
+    ended_from: Optional[date] = None
+    ended_to: Optional[date] = None
+    total: int
+    rows: list[SessionStatsRow]
@@ -0,0 +1,300 @@
+import csv
+import io
+import json
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, IO, Iterator, List, Optional, Sequence
+
+from sqlalchemy import Select, Text, cast, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import engine
+from app.models.session import SessionRecord
+from app.services import stats_service
+from app.utils.logger import setup_logger
+
+logger = setup_logger(name="archive_service")
+
+EXPORT_BATCH_SIZE = 1000
+IMPORT_BATCH_SIZE = 1000
+
+# Flat formats also get the summary as its own column so it can be read without parsing user_data.
+FLAT_COLUMNS = ("id", "session_id", "created_at", "ended_at", "summary", "user_data")
+
+
+def _iso(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def parse_datetime(value: Any) -> Optional[datetime]:
+    # Stored timestamps are naive UTC.
+    if value is None or value == "":
+        return None
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class NdjsonFormat:
+    name = "ndjson"
+    media_type = "application/x-ndjson"
+
+    def start(self) -> bytes:
+        return b""
+
+    def write(self, rows: Sequence[Any]) -> bytes:
+        # user_data arrives as JSON text and is spliced in as-is rather than decoded and re-encoded.
+        lines = [
+            f'{{"id": {row.id}, "session_id": {json.dumps(row.session_id)}, '
+            f'"created_at": {json.dumps(_iso(row.created_at))}, "ended_at": {json.dumps(_iso(row.ended_at))}, '
+            f'"user_data": {row.user_data}}}'
+            for row in rows
+        ]
+        return ("\n".join(lines) + "\n").encode()
+
+    def finish(self) -> bytes:
+        return b""
+
+    def read(self, stream: IO[bytes]) -> Iterator[Dict[str, Any]]:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+class CsvFormat:
+    name = "csv"
+    media_type = "text/csv"
+
+    def __init__(self):
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+
+    def _drain(self) -> bytes:
+        data = self._buffer.getvalue().encode()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+    def start(self) -> bytes:
+        self._writer.writerow(FLAT_COLUMNS)
+        return self._drain()
+
+    def write(self, rows: Sequence[Any]) -> bytes:
+        self._writer.writerows(
+            (
+                row.id,
+                row.session_id,
+                _iso(row.created_at),
+                _iso(row.ended_at) or "",
+                row.summary or "",
+                row.user_data,
+            )
+            for row in rows
+        )
+        return self._drain()
+
+    def finish(self) -> bytes:
+        return b""
+
+    def read(self, stream: IO[bytes]) -> Iterator[Dict[str, Any]]:
+        for row in csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8", newline="")):
+            row["user_data"] = json.loads(row["user_data"])
+            yield row
+
+
+class _ChunkSink(io.RawIOBase):
+    # Collects what the Parquet writer emits so each row group can be streamed out as it closes.
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ParquetFormat:
+    name = "parquet"
+    media_type = "application/vnd.apache.parquet"
+
+    def __init__(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self._pq = pq
+        self.schema = pa.schema(
+            [
+                ("id", pa.int64()),
+                ("session_id", pa.string()),
+                ("created_at", pa.timestamp("us")),
+                ("ended_at", pa.timestamp("us")),
+                ("summary", pa.string()),
+                ("user_data", pa.string()),
+            ]
+        )
+        self._sink = _ChunkSink()
+        self._writer = None
+
+    def start(self) -> bytes:
+        self._writer = self._pq.ParquetWriter(self._sink, self.schema, compression="zstd")
+        return self._sink.drain()
+
+    def write(self, rows: Sequence[Any]) -> bytes:
+        # One row group per fetched batch, so memory stays bounded by the batch size.
+        table = self._pa.Table.from_pydict(
+            {
+                "id": [row.id for row in rows],
+                "session_id": [row.session_id for row in rows],
+                "created_at": [row.created_at for row in rows],
+                "ended_at": [row.ended_at for row in rows],
+                "summary": [row.summary for row in rows],
+                "user_data": [row.user_data for row in rows],
+            },
+            schema=self.schema,
+        )
+        self._writer.write_table(table)
+        return self._sink.drain()
+
+    def finish(self) -> bytes:
+        self._writer.close()
+        return self._sink.drain()
+
+    def read(self, stream: IO[bytes]) -> Iterator[Dict[str, Any]]:
+        parquet_file = self._pq.ParquetFile(stream)
+        for batch in parquet_file.iter_batches(
+            batch_size=IMPORT_BATCH_SIZE, columns=["session_id", "created_at", "ended_at", "user_data"]
+        ):
+            for row in batch.to_pylist():
+                row["user_data"] = json.loads(row["user_data"])
+                yield row
+
+
+_FORMATS = {
+    "ndjson": NdjsonFormat,
+    "csv": CsvFormat,
+    "parquet": ParquetFormat,
+}
+
+FORMAT_NAMES = tuple(_FORMATS)
+
+
+def get_format(name: str):
+    try:
+        format_cls = _FORMATS[name]
+    except KeyError:
+        raise ValueError(f"Unknown archive format '{name}'. Expected one of: {', '.join(_FORMATS)}")
+    try:
+        return format_cls()
+    except ImportError as e:
+        raise ImportError(f"Archive format '{name}' requires the optional 'pyarrow' package.") from e
+
+
+def export_query(
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    ended_from: Optional[datetime] = None,
+    ended_to: Optional[datetime] = None,
+) -> Select:
+    """Archive rows oldest first; lower bounds are inclusive, upper bounds exclusive."""
+    query = select(
+        SessionRecord.id,
+        SessionRecord.session_id,
+        # Read as text: every format writes it back out as JSON, so decoding it would be wasted work.
+        cast(SessionRecord.user_data, Text).label("user_data"),
+        SessionRecord.user_data["summary"].as_string().label("summary"),
+        SessionRecord.created_at,
+        SessionRecord.ended_at,
+    ).order_by(SessionRecord.created_at, SessionRecord.id)
+    if created_from:
+        query = query.where(SessionRecord.created_at >= created_from)
+    if created_to:
+        query = query.where(SessionRecord.created_at < created_to)
+    if ended_from:
+        query = query.where(SessionRecord.ended_at >= ended_from)
+    if ended_to:
+        query = query.where(SessionRecord.ended_at < ended_to)
+    return query
+
+
+async def export_records(
+    db: AsyncSession,
+    archive_format,
+    query: Select,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> AsyncIterator[bytes]:
+    # Server-side cursor: rows are fetched batch_size at a time and never held all at once.
+    result = await db.stream(query.execution_options(yield_per=batch_size))
+    head = archive_format.start()
+    if head:
+        yield head
+    exported = 0
+    async for rows in result.partitions():
+        exported += len(rows)
+        yield archive_format.write(rows)
+    tail = archive_format.finish()
+    if tail:
+        yield tail
+    logger.info("Exported %s session records as %s", exported, archive_format.name)
+
+
+def insert_ignoring_duplicates(dialect: str):
+    """Insert of session records that skips existing session_ids and returns what rollup_key needs."""
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return (
+        insert(SessionRecord)
+        .on_conflict_do_nothing(index_elements=[SessionRecord.session_id])
+        .returning(SessionRecord.user_data, SessionRecord.ended_at, SessionRecord.created_at)
+    )
+
+
+async def import_records(records: Iterator[Dict[str, Any]], batch_size: int = IMPORT_BATCH_SIZE) -> Dict[str, int]:
+    """Bulk-insert archived records, one transaction per batch.
+
+    Ids are reassigned by the database; records whose session_id already exists are skipped,
+    so re-running an import is harmless. The rollups are updated for the inserted records only.
+    """
+    read = inserted = 0
+    batch: List[Dict[str, Any]] = []
+
+    async def _flush() -> int:
+        async with engine.begin() as conn:
+            result = await conn.execute(insert_ignoring_duplicates(engine.dialect.name), batch)
+            keys = [stats_service.rollup_key(*row) for row in result]
+            await stats_service.add_to_rollups(conn, keys)
+        return len(keys)
+
+    for record in records:
+        read += 1
+        batch.append(
+            {
+                "session_id": record["session_id"],
+                "user_data": record["user_data"],
+                "created_at": parse_datetime(record.get("created_at")) or datetime.utcnow(),
+                "ended_at": parse_datetime(record.get("ended_at")),
+            }
+        )
+        if len(batch) >= batch_size:
+            inserted += await _flush()
+            batch = []
+    if batch:
+        inserted += await _flush()
+
+    logger.info("Imported %s of %s archived session records", inserted, read)
+    return {"read": read, "inserted": inserted, "skipped": read - inserted}
@@ -0,0 +1,106 @@
+import json
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, Iterable, List
+
+from app.core.config import get_settings
+
+DEFAULT_CRISIS_KEYWORDS: Dict[str, List[str]] = {
+    "en": [
+        "suicid", "kill myself", "self-harm", "self harm", "hurt myself",
+        "end my life", "want to die", "harm others", "hurt someone",
+    ],
+    "es": [
+        "suicid", "matarme", "quitarme la vida", "acabar con mi vida", "quiero morir",
+        "no quiero vivir", "hacerme daño", "lastimarme", "autolesion", "hacerle daño a alguien",
+    ],
+}
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalize(text: str) -> str:
+    # Accents are stripped and any run of punctuation/whitespace collapses to one space,
+    # so "Self–Harm", "self  harm" and "self_harm" all normalize to "self harm".
+    if not text.isascii():
+        decomposed = unicodedata.normalize("NFKD", text)
+        text = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return _NON_WORD.sub(" ", text.casefold())
+
+
+def _trie_pattern(keywords: Iterable[str]) -> str:
+    trie: Dict[str, dict] = {}
+    for kw in keywords:
+        node = trie
+        for ch in kw:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        # A keyword ending here already counts as a hit; longer ones sharing the prefix are redundant.
+        if "" in node:
+            return ""
+        alternatives = [re.escape(ch) + build(child) for ch, child in sorted(node.items())]
+        if len(alternatives) == 1:
+            return alternatives[0]
+        return "(?:" + "|".join(alternatives) + ")"
+
+    return build(trie)
+
+
+class CrisisScanner:
+    def __init__(self, detector: "CrisisDetector"):
+        self._detector = detector
+        self._tail = ""
+        self.triggered = False
+
+    def feed(self, chunk: str) -> bool:
+        if self.triggered:
+            return True
+        normalized = normalize(chunk)
+        if self._tail.endswith(" ") and normalized.startswith(" "):
+            normalized = normalized[1:]
+        window = self._tail + normalized
+        if self._detector.matches_normalized(window):
+            self.triggered = True
+            return True
+        self._tail = window[-self._detector.overlap:] if self._detector.overlap else ""
+        return False
+
+
+class CrisisDetector:
+    def __init__(self, keywords: Iterable[str]):
+        normalized = sorted({normalize(kw).strip() for kw in keywords} - {""})
+        self.keywords = normalized
+        # A keyword split across two chunks has at most len(kw) - 1 chars in the earlier chunk.
+        self.overlap = max((len(kw) for kw in normalized), default=1) - 1
+        self._pattern = re.compile(_trie_pattern(normalized)) if normalized else None
+
+    def matches_normalized(self, text: str) -> bool:
+        return self._pattern is not None and self._pattern.search(text) is not None
+
+    def contains(self, text: str) -> bool:
+        return self.matches_normalized(normalize(text))
+
+    def scanner(self) -> CrisisScanner:
+        return CrisisScanner(self)
+
+
+def load_keywords() -> List[str]:
+    settings = get_settings()
+    keywords_by_language = {lang: list(kws) for lang, kws in DEFAULT_CRISIS_KEYWORDS.items()}
+    if settings.CRISIS_KEYWORDS_FILE:
+        with open(settings.CRISIS_KEYWORDS_FILE, encoding="utf-8") as f:
+            for lang, kws in json.load(f).items():
+                keywords_by_language.setdefault(lang, []).extend(kws)
+
+    keywords: List[str] = []
+    for lang in settings.CRISIS_LANGUAGES:
+        keywords.extend(keywords_by_language.get(lang, []))
+    return keywords
+
+
+@lru_cache()
+def get_crisis_detector() -> CrisisDetector:
+    return CrisisDetector(load_keywords())
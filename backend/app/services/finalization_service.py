@@ -0,0 +1,232 @@
+import asyncio
+import json
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import get_settings
+from app.core.database import AsyncSessionLocal, engine
+from app.core.metrics import EXPIRED_SESSIONS
+from app.core.redis_client import get_redis
+from app.services import session_service, stats_service
+from app.services.archive_service import insert_ignoring_duplicates
+from app.services.trupy_chat import TrupyOpenAI
+from app.utils.logger import setup_logger
+
+settings = get_settings()
+logger = setup_logger(name="finalization_service")
+
+JOB_PREFIX = "finalize_job:"
+
+
+def _job_key(session_id: str) -> str:
+    return f"{JOB_PREFIX}{session_id}"
+
+
+def _pending_job() -> str:
+    return json.dumps({"status": "pending", "queued_at": time.time()})
+
+
+def is_settled(job: Optional[Dict[str, Any]]) -> bool:
+    """Whether a job needs no new submission: done, or pending and recent enough to still be in a worker's queue."""
+    if job is None or job["status"] == "failed":
+        return False
+    if job["status"] == "pending":
+        # A pending job whose worker died (or one written before queued_at existed) would otherwise block forever.
+        return time.time() - job.get("queued_at", 0) < settings.FINALIZE_JOB_STALE_AFTER
+    return True
+
+
+def build_user_data(bot: TrupyOpenAI, summary: str) -> Dict[str, Any]:
+    user_data: Dict[str, Any] = {}
+    if bot.user_profile:
+        user_data = {**bot.user_profile}
+    user_data["summary"] = summary
+    if bot.risk_score is not None:
+        user_data["risk_flagged"] = True
+    return user_data
+
+
+class SessionFinalizer:
+    """Generates end-of-session summaries on a bounded worker pool and bulk-inserts the records."""
+
+    def __init__(self, concurrency: int, batch_size: int, flush_interval: float):
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._results: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._writer: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._results = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._summarize_loop()) for _ in range(self.concurrency)]
+        self._writer = asyncio.create_task(self._write_loop())
+
+    async def stop(self) -> None:
+        if self._writer is None:
+            return
+        await self._queue.join()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        await self._results.put(None)
+        await self._writer
+        self._workers = []
+        self._writer = None
+
+    async def submit(self, session_id: str, bot: TrupyOpenAI) -> Dict[str, Any]:
+        # Callers hold the session lock, so a stale or failed job can be replaced without racing another submit.
+        redis = await get_redis()
+        if not await redis.set(_job_key(session_id), _pending_job(), nx=True, ex=settings.FINALIZE_JOB_TTL):
+            existing = await self.get_job(session_id)
+            if is_settled(existing):
+                return existing
+            await redis.set(_job_key(session_id), _pending_job(), ex=settings.FINALIZE_JOB_TTL)
+
+        # Block further turns while the summary is pending; the session is removed once persisted.
+        concluded = bot.is_concluded
+        bot.is_concluded = True
+        try:
+            await session_service.save_session(session_id, bot)
+        except BaseException:
+            # Nothing was queued: leave no pending job behind to answer for it.
+            bot.is_concluded = concluded
+            await redis.delete(_job_key(session_id))
+            raise
+        self._queue.put_nowait((session_id, bot, datetime.utcnow()))
+        return {"status": "pending"}
+
+    async def submit_expired(self, session_id: str, bot: TrupyOpenAI, ended_at: datetime) -> bool:
+        # The session has already timed out, so nothing is saved back; a failed earlier attempt is retried.
+        redis = await get_redis()
+        if not await redis.set(_job_key(session_id), _pending_job(), nx=True, ex=settings.FINALIZE_JOB_TTL):
+            if is_settled(await self.get_job(session_id)):
+                return False
+            await redis.set(_job_key(session_id), _pending_job(), ex=settings.FINALIZE_JOB_TTL)
+        bot.is_concluded = True
+        self._queue.put_nowait((session_id, bot, ended_at))
+        return True
+
+    async def finalize_expired(self) -> int:
+        """Claim one batch of timed-out sessions and queue them; returns how many were claimed."""
+        session_ids = await session_service.claim_expired_sessions(settings.EXPIRY_BATCH_SIZE)
+        if not session_ids:
+            return 0
+        expired, live, gone = await session_service.load_expired_sessions(session_ids)
+        queued = 0
+        settled = [*live]
+        for session_id, bot, ended_at in expired:
+            if await self.submit_expired(session_id, bot, ended_at):
+                queued += 1
+            else:
+                # Ended explicitly meanwhile; that job removes the session.
+                settled.append(session_id)
+        await session_service.release_expiry_claims(settled)
+        await session_service.remove_sessions(gone)
+        EXPIRED_SESSIONS.inc(queued, "queued")
+        EXPIRED_SESSIONS.inc(len(live), "live")
+        EXPIRED_SESSIONS.inc(len(gone), "gone")
+        logger.info("Expired sessions claimed: %s | queued=%s live=%s gone=%s", len(session_ids), queued, len(live), len(gone))
+        return len(session_ids)
+
+    async def run_expiry_watcher(self) -> None:
+        # Each pass reads only the sessions due by now, so its cost follows expirations, not live sessions.
+        while True:
+            try:
+                if self._queue.qsize() < self.batch_size and await self.finalize_expired() == settings.EXPIRY_BATCH_SIZE:
+                    continue
+                await asyncio.sleep(settings.EXPIRY_POLL_INTERVAL)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error("Error finalizing expired sessions: %s", e)
+                await asyncio.sleep(settings.EXPIRY_POLL_INTERVAL)
+
+    async def get_job(self, session_id: str) -> Optional[Dict[str, Any]]:
+        redis = await get_redis()
+        raw = await redis.get(_job_key(session_id))
+        return json.loads(raw) if raw else None
+
+    async def _summarize_loop(self) -> None:
+        while True:
+            session_id, bot, ended_at = await self._queue.get()
+            try:
+                summary = await bot.generate_summary()
+                await self._results.put((session_id, build_user_data(bot, summary), ended_at))
+            except Exception as e:
+                logger.error("Error finalizing session %s: %s", session_id, e)
+                await self._mark_failed(session_id)
+            finally:
+                self._queue.task_done()
+
+    async def _mark_failed(self, session_id: str) -> None:
+        # Lets the next /end or expiry pass submit the session again.
+        try:
+            redis = await get_redis()
+            await redis.set(_job_key(session_id), json.dumps({"status": "failed"}), ex=settings.FINALIZE_JOB_TTL)
+        except Exception as e:
+            logger.error("Error marking finalization of %s as failed: %s", session_id, e)
+
+    async def _write_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._results.get()
+            if item is None:
+                break
+
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._results.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            try:
+                await self._flush(batch)
+            except Exception as e:
+                logger.error("Error flushing finalized sessions: %s", e)
+
+    async def _flush(self, batch: List[Tuple[str, Dict[str, Any], datetime]]) -> None:
+        rows = [
+            {"session_id": session_id, "user_data": user_data, "ended_at": ended_at}
+            for session_id, user_data, ended_at in batch
+        ]
+        session_ids = [row["session_id"] for row in rows]
+        status = "failed"
+        try:
+            async with AsyncSessionLocal() as db:
+                # A session finalized again (its earlier removal failed, or a stale job was requeued) already has
+                # its record; skipping it keeps the rest of the batch and the rollups counting it once.
+                result = await db.execute(insert_ignoring_duplicates(engine.dialect.name), rows)
+                await stats_service.add_to_rollups(db, [stats_service.rollup_key(*row) for row in result])
+                await db.commit()
+            await session_service.remove_sessions(session_ids)
+            status = "done"
+        except Exception as e:
+            logger.error("Error writing %s session records: %s", len(rows), e)
+        finally:
+            redis = await get_redis()
+            async with redis.pipeline(transaction=False) as pipe:
+                for row in rows:
+                    job = {"status": status, "summary": row["user_data"]["summary"], "user_data": row["user_data"]}
+                    pipe.set(_job_key(row["session_id"]), json.dumps(job), ex=settings.FINALIZE_JOB_TTL)
+                await pipe.execute()
+        logger.info("Finalized %s sessions | status=%s", len(rows), status)
+
+finalizer = SessionFinalizer(
+    concurrency=settings.FINALIZE_CONCURRENCY,
+    batch_size=settings.FINALIZE_BATCH_SIZE,
+    flush_interval=settings.FINALIZE_FLUSH_INTERVAL,
+)
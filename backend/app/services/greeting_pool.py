@@ -0,0 +1,99 @@
+import asyncio
+from typing import Dict, Optional, Set
+
+from app.core.config import get_settings
+from app.core.limiter import llm_slot
+from app.core.redis_client import get_redis
+from app.services import response_cache
+from app.services.prompts import CURRENT_PROMPT_VERSION
+from app.services.trupy_chat import FALLBACK_GREETING, TrupyOpenAI
+from app.utils.logger import setup_logger
+
+settings = get_settings()
+logger = setup_logger(name="greeting_pool")
+
+POOL_PREFIX = "greeting_pool:"
+SHAPES = ("anonymous", "identified")
+
+# Identified greetings are generated once against placeholder values and personalized on use.
+_PLACEHOLDER_PROFILE = {"name": "{name}", "major": "{major}", "quarter": "{quarter}"}
+
+_refills: Dict[str, asyncio.Task] = {}
+
+
+def _pool_key(version: str, shape: str) -> str:
+    return f"{POOL_PREFIX}{version}:{shape}"
+
+
+def _shape(user_profile: Optional[Dict[str, str]]) -> str:
+    return "identified" if user_profile else "anonymous"
+
+
+def _personalize(greeting: str, user_profile: Optional[Dict[str, str]]) -> str:
+    for field, value in (user_profile or {}).items():
+        greeting = greeting.replace(f"{{{field}}}", str(value))
+    return greeting
+
+
+async def refill(version: str, shape: str) -> int:
+    profile = _PLACEHOLDER_PROFILE if shape == "identified" else None
+    bot = TrupyOpenAI(user_profile=profile, prompt_version=version)
+
+    results = await asyncio.gather(
+        *(bot.generate_greeting() for _ in range(settings.GREETING_POOL_SIZE)),
+        return_exceptions=True,
+    )
+    greetings: Set[str] = {r for r in results if isinstance(r, str) and r}
+    if not greetings:
+        logger.warning("Greeting pool refill produced no variants: %s/%s", version, shape)
+        return 0
+
+    redis = await get_redis()
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.delete(_pool_key(version, shape))
+        pipe.sadd(_pool_key(version, shape), *greetings)
+        pipe.expire(_pool_key(version, shape), settings.GREETING_POOL_REFRESH_INTERVAL * 2)
+        await pipe.execute()
+    logger.info("Greeting pool refilled: %s/%s | variants=%s", version, shape, len(greetings))
+    return len(greetings)
+
+
+def _schedule_refill(version: str, shape: str) -> None:
+    key = _pool_key(version, shape)
+    if key in _refills:
+        return
+    task = asyncio.create_task(refill(version, shape))
+    _refills[key] = task
+    task.add_done_callback(lambda _: _refills.pop(key, None))
+
+
+async def open_conversation(bot: TrupyOpenAI) -> str:
+    """Greet from the precomputed pool; never waits on the model."""
+    if not settings.GREETING_POOL_ENABLED:
+        # The only path that calls the model, so the only one that needs an upstream slot.
+        async with llm_slot():
+            return await bot.start_conversation()
+
+    shape = _shape(bot.user_profile)
+    redis = await get_redis()
+    greeting = await redis.srandmember(_pool_key(bot.prompt_version, shape))
+    if greeting is None:
+        await response_cache.record("greeting_miss")
+        _schedule_refill(bot.prompt_version, shape)
+        return bot.open_with_greeting(FALLBACK_GREETING)
+
+    await response_cache.record("greeting_hit")
+    return bot.open_with_greeting(_personalize(greeting, bot.user_profile))
+
+
+async def run_refresher() -> None:
+    while True:
+        try:
+            for shape in SHAPES:
+                await refill(CURRENT_PROMPT_VERSION, shape)
+            await asyncio.sleep(settings.GREETING_POOL_REFRESH_INTERVAL)
+        except asyncio.CancelledError:
+            break
+        except Exception as e:
+            logger.error("Error refreshing greeting pool: %s", e)
+            await asyncio.sleep(60)
@@ -0,0 +1,160 @@
+import asyncio
+import copy
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from app.core.config import get_settings
+from app.services import session_cache, session_service
+from app.services.trupy_chat import TrupyOpenAI
+from app.utils.logger import setup_logger
+
+settings = get_settings()
+logger = setup_logger(name="live_session")
+
+
+class LiveSession:
+    """A session hydrated once and kept in memory by a single WebSocket connection.
+
+    The session lock is taken per turn, not per connection: it is held from the start of a turn
+    until the turn's changes are written back (right after the reply, or at the next checkpoint),
+    so HTTP requests on the same session wait for at most one turn. Each time the lock is taken the
+    stored version is checked, and the bot is reloaded if another request wrote it in between.
+    """
+
+    def __init__(self, session_id: str, bot: TrupyOpenAI):
+        self.session_id = session_id
+        self.bot = bot
+        # Serializes turns, write-backs and summary updates on the bot.
+        self.lock = asyncio.Lock()
+        self.dirty = False
+        self.removed = False
+        # Token of the session lock while this connection holds it; unsaved changes imply it is held.
+        self.token: Optional[str] = None
+        self._last_write = time.monotonic()
+        self._summary_task: Optional[asyncio.Task] = None
+
+    @classmethod
+    async def open(cls, session_id: str) -> Optional["LiveSession"]:
+        bot = await session_service.get_session(session_id)
+        if bot is None:
+            return None
+        logger.info("Live session opened: %s | version=%s", session_id, bot.version)
+        return cls(session_id, bot)
+
+    async def _claim(self) -> bool:
+        """Hold the session lock with an up-to-date bot. Raises SessionBusyError if another request
+        holds it past SESSION_LOCK_WAIT; returns False if the session is gone."""
+        if self.token is not None:
+            return True
+        self.token = await session_service.acquire_session_lock(self.session_id)
+        try:
+            if await session_service.get_version(self.session_id) != self.bot.version:
+                bot = await session_service.get_session(self.session_id)
+                if bot is None:
+                    await self._release()
+                    return False
+                logger.info("Live session reloaded: %s | version=%s", self.session_id, bot.version)
+                self.bot = bot
+                self.dirty = False
+        except BaseException:
+            await self._release()
+            raise
+        return True
+
+    async def _release(self) -> None:
+        token, self.token = self.token, None
+        if token is not None:
+            await session_service.release_session_lock(self.session_id, token)
+
+    async def renew(self) -> bool:
+        """Extend the lock if held. False if it expired and may now belong to someone else."""
+        if self.token is None:
+            return True
+        if await session_service.renew_session_lock(self.session_id, self.token):
+            return True
+        self.token = None
+        session_cache.evict(self.session_id)
+        return False
+
+    @asynccontextmanager
+    async def turn(self) -> AsyncIterator[Optional[TrupyOpenAI]]:
+        """The bot for one turn, under the session lock; None if the session ended elsewhere."""
+        async with self.lock:
+            if not await self._claim():
+                yield None
+                return
+            bot = self.bot
+            saved = (len(bot.messages), bot.turns_since_summary, bot.is_concluded, bot.crisis_detected, bot.risk_score)
+            try:
+                yield bot
+            except BaseException:
+                # Abandoned mid-reply (client gone, shutdown): undo the half-finished turn.
+                del bot.messages[saved[0]:]
+                bot.turns_since_summary, bot.is_concluded, bot.crisis_detected, bot.risk_score = saved[1:]
+                raise
+            finally:
+                if not self.dirty:
+                    await self._release()
+
+    def write_due(self) -> bool:
+        if not self.dirty:
+            return False
+        return time.monotonic() - self._last_write >= settings.WS_CHECKPOINT_INTERVAL
+
+    async def write_back(self) -> None:
+        async with self.lock:
+            await self._write_back()
+
+    async def _write_back(self) -> None:
+        # Saves any pending changes, then lets go of the session lock.
+        if self.dirty and not self.removed and self.token is not None:
+            try:
+                await session_service.save_session(self.session_id, self.bot, refresh_summary=False)
+            except BaseException:
+                # Redis disagrees with the bot now; the next claim sees another version and reloads.
+                await self._release()
+                raise
+            self.dirty = False
+            self._last_write = time.monotonic()
+            if self._summary_task is None and self.bot.needs_summary_refresh():
+                # Summarize a snapshot off the turn path; the result is folded into the live bot.
+                snapshot = copy.copy(self.bot)
+                snapshot.messages = list(self.bot.messages)
+                self._summary_task = asyncio.create_task(self._refresh_summary(snapshot))
+        await self._release()
+
+    async def _refresh_summary(self, snapshot: TrupyOpenAI) -> None:
+        try:
+            await snapshot.refresh_summary()
+            if not snapshot.summary:
+                return
+            async with self.lock:
+                if self.removed or not await self._claim():
+                    return
+                self.bot.apply_summary(snapshot.summary, snapshot.summarized_count)
+                self.dirty = True
+                await self._write_back()
+            logger.info("Rolling summary refreshed: %s | summarized=%s", self.session_id, snapshot.summarized_count)
+        except (session_service.SessionBusyError, session_service.SessionConflictError):
+            logger.warning("Rolling summary not applied, session busy: %s", self.session_id)
+        finally:
+            self._summary_task = None
+
+    async def remove(self) -> None:
+        self.removed = True
+        await session_service.remove_session(self.session_id)
+
+    async def close(self) -> None:
+        if self._summary_task is not None:
+            self._summary_task.cancel()
+        try:
+            async with self.lock:
+                await self._write_back()
+        except Exception as e:
+            # The cached bot is ahead of Redis now; drop it so the next load reads what was stored.
+            session_cache.evict(self.session_id)
+            logger.error("Final write-back failed for live session %s: %s", self.session_id, e)
+        finally:
+            await self._release()
+        logger.info("Live session closed: %s", self.session_id)
@@ -0,0 +1,48 @@
+import hashlib
+import json
+from typing import Dict, List, Optional
+
+from app.core.config import get_settings
+from app.core.redis_client import get_redis
+from app.utils.logger import setup_logger
+
+settings = get_settings()
+logger = setup_logger(name="response_cache")
+
+CACHE_PREFIX = "llm_cache:"
+STATS_KEY = "llm_cache_stats"
+
+
+def cache_key(messages: List[Dict[str, str]]) -> str:
+    normalized = [(m["role"], " ".join((m.get("content") or "").split())) for m in messages]
+    digest = hashlib.sha256(json.dumps([settings.MODEL, normalized]).encode()).hexdigest()
+    return f"{CACHE_PREFIX}{digest}"
+
+
+async def record(stat: str) -> None:
+    redis = await get_redis()
+    await redis.hincrby(STATS_KEY, stat, 1)
+
+
+async def get_stats() -> Dict[str, int]:
+    redis = await get_redis()
+    return {k: int(v) for k, v in (await redis.hgetall(STATS_KEY)).items()}
+
+
+async def get_cached(messages: List[Dict[str, str]]) -> Optional[str]:
+    try:
+        redis = await get_redis()
+        content = await redis.get(cache_key(messages))
+        await record("exact_hit" if content is not None else "exact_miss")
+        return content
+    except Exception as e:
+        logger.error("Response cache lookup failed: %s", e)
+        return None
+
+
+async def store(messages: List[Dict[str, str]], content: str) -> None:
+    try:
+        redis = await get_redis()
+        await redis.set(cache_key(messages), content, ex=settings.LLM_CACHE_TTL)
+    except Exception as e:
+        logger.error("Response cache store failed: %s", e)
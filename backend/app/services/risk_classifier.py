@@ -0,0 +1,176 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from app.core.config import get_settings
+from app.core.metrics import RISK_BATCH_SIZE
+from app.utils.logger import setup_logger
+
+settings = get_settings()
+logger = setup_logger(name="risk_classifier")
+
+# The model loaded in each worker process by the pool initializer.
+_model = None
+
+
+def _load_model(path: str) -> None:
+    global _model
+    from app.services.risk_model import HashedLinearModel
+
+    _model = HashedLinearModel.load(Path(path))
+
+
+def _model_threshold() -> float:
+    return _model.threshold
+
+
+def _score_batch(texts: List[str]) -> List[float]:
+    return _model.score(texts)
+
+
+class RiskScorer:
+    """Scores user messages with the local risk model, in micro-batches on a process pool.
+
+    Each worker scores one batch at a time; messages arriving meanwhile form the next batch, up to
+    `batch_size`. So batches grow with the load and a lone message is sent at once. A positive
+    `max_wait` also holds each batch open that long for more messages.
+    """
+
+    def __init__(
+        self,
+        model_path: Path,
+        threshold: Optional[float],
+        batch_size: int,
+        max_wait: float,
+        workers: int,
+        timeout: float,
+    ):
+        self.model_path = model_path
+        self.threshold = threshold
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.workers = workers
+        self.timeout = timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._in_flight: Optional[asyncio.Semaphore] = None
+        self._batcher: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._batcher is not None
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # spawn: forking a process with a running event loop and open sockets is not safe.
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_load_model,
+            initargs=(str(self.model_path),),
+        )
+
+    async def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._executor = self._new_executor()
+        # Starts the workers and loads the model now rather than on the first message.
+        model_threshold = await asyncio.gather(
+            *(loop.run_in_executor(self._executor, _model_threshold) for _ in range(self.workers))
+        )
+        if self.threshold is None:
+            self.threshold = model_threshold[0]
+        self._queue = asyncio.Queue()
+        self._in_flight = asyncio.Semaphore(self.workers)
+        self._batcher = asyncio.create_task(self._batch_loop())
+        logger.info("Risk classifier started: %s worker(s), threshold %.3f", self.workers, self.threshold)
+
+    async def stop(self) -> None:
+        if self._batcher is None:
+            return
+        self._batcher.cancel()
+        try:
+            await self._batcher
+        except asyncio.CancelledError:
+            pass
+        self._batcher = None
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._executor = None
+
+    async def score(self, text: str) -> Optional[float]:
+        """Probability that the message signals risk, or None if it could not be scored in time."""
+        if self._batcher is None:
+            return None
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((text, future))
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Risk scoring timed out after %ss; message passed unscored.", self.timeout)
+        except Exception as e:
+            logger.error("Risk scoring failed: %s", e)
+        return None
+
+    async def _batch_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Whatever queued up while the workers were busy joins this batch.
+            await self._in_flight.acquire()
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            batch = [(text, future) for text, future in batch if not future.done()]
+            if not batch:
+                self._in_flight.release()
+                continue
+            RISK_BATCH_SIZE.observe(len(batch))
+            executor = self._executor
+            try:
+                scoring = loop.run_in_executor(executor, _score_batch, [text for text, _ in batch])
+            except BrokenProcessPool as e:
+                scoring = loop.create_future()
+                scoring.set_exception(e)
+            scoring.add_done_callback(lambda done, batch=batch, executor=executor: self._resolve(done, batch, executor))
+
+    def _resolve(
+        self, done: asyncio.Future, batch: List[Tuple[str, asyncio.Future]], executor: ProcessPoolExecutor
+    ) -> None:
+        self._in_flight.release()
+        if done.cancelled():
+            for _, future in batch:
+                future.cancel()
+            return
+        error = done.exception()
+        # Every batch in flight on a broken pool fails; only the first one replaces it.
+        if isinstance(error, BrokenProcessPool) and executor is self._executor:
+            logger.error("Risk classifier worker died; restarting the pool.")
+            executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._new_executor()
+        for i, (_, future) in enumerate(batch):
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(done.result()[i])
+
+
+risk_scorer = RiskScorer(
+    model_path=settings.RISK_MODEL_PATH,
+    threshold=settings.RISK_THRESHOLD,
+    batch_size=settings.RISK_BATCH_SIZE,
+    max_wait=settings.RISK_BATCH_WAIT,
+    workers=settings.RISK_WORKERS,
+    timeout=settings.RISK_TIMEOUT,
+)
@@ -0,0 +1,115 @@
+import zlib
+from pathlib import Path
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from app.services.crisis_detection import normalize
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+DEFAULT_MODEL_PATH = DATA_DIR / "risk_model.npz"
+SEED_DATA_PATH = DATA_DIR / "risk_seed.jsonl"
+
+DEFAULT_DIMS = 2**18
+CHAR_NGRAMS = (3, 4, 5)
+# Multiplier of the polynomial rolling hash over the text's bytes (FNV prime, mod 2**32).
+_HASH_BASE = np.uint64(16777619)
+_MASK32 = np.uint64(0xFFFFFFFF)
+
+
+def _char_hashes(data: np.ndarray, n: int) -> np.ndarray:
+    # h = b[i] * B^(n-1) + ... + b[i+n-1], for every window at once.
+    count = len(data) - n + 1
+    if count <= 0:
+        return np.empty(0, dtype=np.uint64)
+    hashes = np.full(count, n, dtype=np.uint64)
+    for k in range(n):
+        hashes = (hashes * _HASH_BASE + data[k:k + count]) & _MASK32
+    return hashes
+
+
+def featurize(text: str, dims: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Signed hashed features of a message: character 3-5-grams plus word unigrams and bigrams.
+
+    Returns feature indices and values; the last index, `dims`, is a bias feature every message has.
+    """
+    normalized = f" {normalize(text).strip()} "
+    data = np.frombuffer(normalized.encode("utf-8"), dtype=np.uint8).astype(np.uint64)
+    words = normalized.split()
+    word_hashes = [zlib.crc32(w.encode()) for w in words]
+    word_hashes += [zlib.crc32(f"{a} {b}".encode()) for a, b in zip(words, words[1:])]
+    hashes = np.concatenate(
+        [_char_hashes(data, n) for n in CHAR_NGRAMS] + [np.asarray(word_hashes, dtype=np.uint64)]
+    )
+    # One hash bit picks the sign, so colliding features tend to cancel rather than add up.
+    signs = np.where(hashes & np.uint64(1 << 31), -1.0, 1.0)
+    values = signs / np.sqrt(max(1, len(hashes)))
+    indices = (hashes % np.uint64(dims)).astype(np.int64)
+    return np.append(indices, dims), np.append(values, 1.0)
+
+
+def featurize_batch(texts: Sequence[str], dims: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Concatenated features of several messages, with the offset where each one starts."""
+    features = [featurize(text, dims) for text in texts]
+    indices = np.concatenate([f[0] for f in features])
+    values = np.concatenate([f[1] for f in features])
+    offsets = np.cumsum([0] + [len(f[0]) for f in features[:-1]])
+    return indices, values, offsets
+
+
+class HashedLinearModel:
+    """Logistic regression over hashed n-gram features; scores are probabilities of risk."""
+
+    def __init__(self, weights: np.ndarray, threshold: float = 0.5):
+        self.weights = weights
+        self.dims = len(weights) - 1
+        self.threshold = threshold
+
+    def logits(self, indices: np.ndarray, values: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+        return np.add.reduceat(self.weights[indices] * values, offsets)
+
+    def score(self, texts: Sequence[str]) -> List[float]:
+        if not texts:
+            return []
+        logits = self.logits(*featurize_batch(texts, self.dims))
+        return (1.0 / (1.0 + np.exp(-logits))).tolist()
+
+    def save(self, path: Path) -> None:
+        np.savez_compressed(path, weights=self.weights.astype(np.float32), threshold=self.threshold)
+
+    @classmethod
+    def load(cls, path: Path) -> "HashedLinearModel":
+        with np.load(path) as data:
+            return cls(data["weights"].astype(np.float32), float(data["threshold"]))
+
+    @classmethod
+    def train(
+        cls,
+        texts: Sequence[str],
+        labels: Sequence[int],
+        dims: int = DEFAULT_DIMS,
+        epochs: int = 300,
+        learning_rate: float = 0.005,
+        l2: float = 1e-4,
+        threshold: float = 0.5,
+    ) -> "HashedLinearModel":
+        """Full-batch gradient descent with Adam; the data sets this is meant for fit in memory."""
+        indices, values, offsets = featurize_batch(texts, dims)
+        lengths = np.diff(np.append(offsets, len(indices)))
+        rows = np.repeat(np.arange(len(texts)), lengths)
+        y = np.asarray(labels, dtype=np.float64)
+        # Positives are rare; weight the classes equally.
+        class_weight = np.where(y == 1, 0.5 / max(1.0, y.sum()), 0.5 / max(1.0, len(y) - y.sum()))
+
+        # Zero start: weights of hash slots no training message uses stay zero, so the saved model compresses well.
+        weights = np.zeros(dims + 1)
+        m = np.zeros_like(weights)
+        v = np.zeros_like(weights)
+        for step in range(1, epochs + 1):
+            logits = np.add.reduceat(weights[indices] * values, offsets)
+            error = (1.0 / (1.0 + np.exp(-logits)) - y) * class_weight
+            grad = np.bincount(indices, weights=values * error[rows], minlength=dims + 1) + l2 * weights
+            m = 0.9 * m + 0.1 * grad
+            v = 0.999 * v + 0.001 * grad * grad
+            weights -= learning_rate * (m / (1 - 0.9**step)) / (np.sqrt(v / (1 - 0.999**step)) + 1e-8)
+        return cls(weights.astype(np.float32), threshold)
@@ -0,0 +1,66 @@
+import copy
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from app.core.config import get_settings
+from app.services.trupy_chat import TrupyOpenAI
+
+settings = get_settings()
+
+# Hydrated sessions keyed by id, least recently used first. Each entry is a snapshot of the bot
+# as of its last successful write, so bot.version identifies the Redis state it mirrors; the
+# writer keeps mutating its own instance, never the cached one.
+_entries: "OrderedDict[str, Tuple[TrupyOpenAI, int]]" = OrderedDict()
+_bytes = 0
+
+
+def _snapshot(bot: TrupyOpenAI) -> TrupyOpenAI:
+    # Messages are never edited in place, only appended or truncated, so copying the list suffices.
+    snapshot = copy.copy(bot)
+    snapshot.messages = list(bot.messages)
+    return snapshot
+
+
+def _size(bot: TrupyOpenAI) -> int:
+    return 512 + sum(len(m["content"]) + 64 for m in bot.messages)
+
+
+def peek(session_id: str) -> Optional[TrupyOpenAI]:
+    # Shared with other readers: must not be mutated.
+    entry = _entries.get(session_id)
+    if entry is None:
+        return None
+    _entries.move_to_end(session_id)
+    return entry[0]
+
+
+def take(session_id: str) -> Optional[TrupyOpenAI]:
+    # The caller is about to mutate the bot; a snapshot comes back through put() once the write succeeds.
+    # Readers may still hold the cached instance, so the caller gets its own copy.
+    entry = _pop(session_id)
+    return _snapshot(entry[0]) if entry is not None else None
+
+
+def _pop(session_id: str) -> Optional[Tuple[TrupyOpenAI, int]]:
+    global _bytes
+    entry = _entries.pop(session_id, None)
+    if entry is not None:
+        _bytes -= entry[1]
+    return entry
+
+
+def put(session_id: str, bot: TrupyOpenAI) -> None:
+    global _bytes
+    evict(session_id)
+    size = _size(bot)
+    if size > settings.SESSION_CACHE_MAX_BYTES:
+        return
+    _entries[session_id] = (_snapshot(bot), size)
+    _bytes += size
+    while len(_entries) > settings.SESSION_CACHE_MAX_ENTRIES or _bytes > settings.SESSION_CACHE_MAX_BYTES:
+        _, (_, evicted_size) = _entries.popitem(last=False)
+        _bytes -= evicted_size
+
+
+def evict(session_id: str) -> None:
+    _pop(session_id)
@@ -1,66 +1,447 @@
-import json
+import asyncio
+import copy
+import time
 import uuid
-from typing import Dict, Optional
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
-from app.core.redis_client import get_redis
+from redis.exceptions import WatchError
+
+from app.core.codecs import get_codec
+from app.core.metrics import SESSION_CACHE_LOOKUPS, stage
+from app.core.redis_client import get_binary_redis
 from app.core.config import get_settings
+from app.services import greeting_pool, session_cache
 from app.services.trupy_chat import TrupyOpenAI
-from app.utils.logger import setup_logger
+from app.utils.logger import bind_session, setup_logger
 
 settings = get_settings()
 logger = setup_logger(name="session_service")
 
 SESSION_PREFIX = "session:"
+MESSAGES_PREFIX = "session_messages:"
+VERSION_PREFIX = "session_version:"
+# Copy of the state blob that outlives the session by SESSION_EXPIRY_GRACE, for finalizing it after it times out.
+SHADOW_PREFIX = "session_shadow:"
+# Sorted sets of live session ids scored by their expiry timestamp.
+INDEX_ANONYMOUS = "session_index:anonymous"
+INDEX_IDENTIFIED = "session_index:identified"
+# Timed-out sessions claimed for finalization, scored by when to retry the claim.
+INDEX_EXPIRING = "session_index:expiring"
+LOCK_PREFIX = "session_lock:"
+REPLY_PREFIX = "session_reply:"
+
+# Deletes the lock only if it is still held by the caller's token.
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+_RENEW_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Moves up to ARGV[3] ids due by ARGV[1] from the live indexes (and stale claims from the
+# expiring index) into the expiring index at ARGV[2], so each is handed to one caller at a time.
+_CLAIM_EXPIRED_SCRIPT = """
+local claimed = {}
+for _, key in ipairs(KEYS) do
+    local remaining = tonumber(ARGV[3]) - #claimed
+    if remaining <= 0 then
+        break
+    end
+    local ids = redis.call('zrangebyscore', key, '-inf', ARGV[1], 'LIMIT', 0, remaining)
+    for _, id in ipairs(ids) do
+        redis.call('zrem', key, id)
+        redis.call('zadd', KEYS[#KEYS], ARGV[2], id)
+        table.insert(claimed, id)
+    end
+end
+return claimed
+"""
+
+# History read in one round trip: nothing but the version when it matches one the client holds
+# (ARGV[2..]), otherwise the version, the message count and the messages from index ARGV[1].
+_READ_HISTORY_SCRIPT = """
+if redis.call('exists', KEYS[1]) == 0 then
+    return false
+end
+local version = redis.call('get', KEYS[2])
+if not version then
+    return {false}
+end
+for i = 2, #ARGV do
+    if ARGV[i] == version then
+        return {version}
+    end
+end
+return {version, redis.call('llen', KEYS[3]), redis.call('lrange', KEYS[3], ARGV[1], -1)}
+"""
+
+codec = get_codec(settings.SESSION_CODEC)
+
+_summary_tasks: Dict[str, asyncio.Task] = {}
+
+
+class SessionBusyError(Exception):
+    pass
+
+
+class SessionConflictError(Exception):
+    pass
 
 
 def _key(session_id: str) -> str:
     return f"{SESSION_PREFIX}{session_id}"
 
 
+def _messages_key(session_id: str) -> str:
+    return f"{MESSAGES_PREFIX}{session_id}"
+
+
+def _version_key(session_id: str) -> str:
+    return f"{VERSION_PREFIX}{session_id}"
+
+
+def _shadow_key(session_id: str) -> str:
+    return f"{SHADOW_PREFIX}{session_id}"
+
+
+def _lock_key(session_id: str) -> str:
+    return f"{LOCK_PREFIX}{session_id}"
+
+
+def _reply_key(session_id: str, idempotency_key: str) -> str:
+    return f"{REPLY_PREFIX}{session_id}:{idempotency_key}"
+
+
+def _index_key(bot: TrupyOpenAI) -> str:
+    return INDEX_IDENTIFIED if bot.user_profile else INDEX_ANONYMOUS
+
+
+async def _write(session_id: str, bot: TrupyOpenAI, check_version: bool = True) -> None:
+    redis = await get_binary_redis()
+    # Only the small state blob and the messages appended since the last save are sent;
+    # the system prompt is rebuilt from user_profile on load.
+    async with redis.pipeline(transaction=True) as pipe:
+        if check_version:
+            # Optimistic concurrency: refuse to overwrite a version this bot was not loaded from.
+            with stage("redis_write"):
+                await pipe.watch(_version_key(session_id), _key(session_id))
+                stored_version = await pipe.get(_version_key(session_id))
+                if stored_version is None:
+                    # Sessions written before the version key existed carry the version in the blob only.
+                    raw = await pipe.get(_key(session_id))
+                    stored_version = codec.decode(raw).get("version", 0) if raw is not None else None
+            if stored_version is None or int(stored_version) != bot.version:
+                raise SessionConflictError(session_id)
+            pipe.multi()
+
+        rewrite = bot.persisted_count > len(bot.messages)
+        with stage("serialize"):
+            state = codec.encode({**bot.to_dict(), "version": bot.version + 1})
+            new_messages = [codec.encode(m) for m in bot.messages[1 if rewrite else bot.persisted_count:]]
+
+        pipe.set(_key(session_id), state, ex=settings.SESSION_TTL)
+        pipe.set(_version_key(session_id), bot.version + 1, ex=settings.SESSION_TTL)
+        # Only the state key gates loading, so the messages can outlive it along with the shadow.
+        pipe.set(_shadow_key(session_id), state, ex=settings.SESSION_TTL + settings.SESSION_EXPIRY_GRACE)
+        if rewrite:
+            pipe.delete(_messages_key(session_id))
+        if new_messages:
+            pipe.rpush(_messages_key(session_id), *new_messages)
+        pipe.expire(_messages_key(session_id), settings.SESSION_TTL + settings.SESSION_EXPIRY_GRACE)
+        pipe.zadd(_index_key(bot), {session_id: time.time() + settings.SESSION_TTL})
+        try:
+            with stage("redis_write"):
+                await pipe.execute()
+        except WatchError:
+            raise SessionConflictError(session_id)
+    bot.version += 1
+    bot.persisted_count = len(bot.messages)
+    if settings.SESSION_CACHE_ENABLED:
+        session_cache.put(session_id, bot)
+
+
 async def create_session(user_profile: Optional[Dict[str, str]] = None) -> tuple[str, str]:
     session_id = str(uuid.uuid4())
+    bind_session(session_id)
     bot = TrupyOpenAI(user_profile=user_profile)
-    greeting = bot.start_conversation()
+    greeting = await greeting_pool.open_conversation(bot)
 
-    redis = await get_redis()
-    await redis.setex(
-        _key(session_id),
-        settings.SESSION_TTL,
-        json.dumps(bot.to_dict()),
-    )
+    await _write(session_id, bot, check_version=False)
 
-    logger.info(f"Session created: {session_id} | anonymous={user_profile is None}")
+    logger.info("Session created: %s | anonymous=%s", session_id, user_profile is None)
     return session_id, greeting
 
 
-async def get_session(session_id: str) -> Optional[TrupyOpenAI]:
-    redis = await get_redis()
-    raw = await redis.get(_key(session_id))
+async def get_version(session_id: str) -> Optional[int]:
+    """Version of the stored session; None if it is gone or predates the version key."""
+    redis = await get_binary_redis()
+    version = await redis.get(_version_key(session_id))
+    return int(version) if version is not None else None
+
+
+async def get_session(session_id: str, readonly: bool = False) -> Optional[TrupyOpenAI]:
+    """Load a session. Unless `readonly`, the caller owns the returned bot until it saves it."""
+    redis = await get_binary_redis()
+    if settings.SESSION_CACHE_ENABLED:
+        cached = session_cache.peek(session_id)
+        if cached is not None:
+            # O(1) coherence check: another worker may have written a newer version.
+            with stage("redis_get"):
+                version = await redis.get(_version_key(session_id))
+            if version is not None and int(version) == cached.version:
+                if readonly:
+                    SESSION_CACHE_LOOKUPS.inc(1, "hit")
+                    return cached
+                owned = session_cache.take(session_id)
+                if owned is not None:
+                    SESSION_CACHE_LOOKUPS.inc(1, "hit")
+                    return owned
+            SESSION_CACHE_LOOKUPS.inc(1, "stale")
+            session_cache.evict(session_id)
+        else:
+            SESSION_CACHE_LOOKUPS.inc(1, "miss")
+
+    with stage("redis_get"):
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.get(_key(session_id))
+            pipe.lrange(_messages_key(session_id), 0, -1)
+            raw, raw_messages = await pipe.execute()
     if raw is None:
         return None
-    
-    logger.info(f"Session retrieved: {session_id}")
 
-    return TrupyOpenAI.from_dict(json.loads(raw))
+    logger.info("Session retrieved: %s", session_id)
 
+    with stage("deserialize"):
+        bot = TrupyOpenAI.from_dict(codec.decode(raw), [codec.decode(m) for m in raw_messages])
+    if readonly and settings.SESSION_CACHE_ENABLED:
+        session_cache.put(session_id, bot)
+    return bot
 
-async def save_session(session_id: str, bot: TrupyOpenAI) -> None:
-    redis = await get_redis()
-    await redis.setex(
-        _key(session_id),
-        settings.SESSION_TTL,
-        json.dumps(bot.to_dict()),
-    )
-    logger.info(f"Session saved: {session_id}")
+
+async def read_history(
+    session_id: str, since: int = 0, known_versions: Tuple[int, ...] = ()
+) -> Optional[Dict[str, Any]]:
+    """Messages from index `since` on, read straight from Redis without hydrating the session.
+
+    Returns None if the session is gone, and {"version": v, "history": None} when v is one of
+    `known_versions`, without reading the messages.
+    """
+    redis = await get_binary_redis()
+    with stage("redis_get"):
+        reply = await redis.eval(
+            _READ_HISTORY_SCRIPT,
+            3,
+            _key(session_id),
+            _version_key(session_id),
+            _messages_key(session_id),
+            since,
+            *known_versions,
+        )
+    if reply is None:
+        return None
+    if reply[0] is None:
+        # Saved before the version key existed; the transcript may still be inline in the blob.
+        bot = await get_session(session_id, readonly=True)
+        if bot is None:
+            return None
+        history = bot.get_history()
+        if bot.version in known_versions:
+            return {"version": bot.version, "history": None}
+        return {"version": bot.version, "message_count": len(history), "history": history[since:]}
+
+    version = int(reply[0])
+    if len(reply) == 1:
+        return {"version": version, "history": None}
+    with stage("deserialize"):
+        history = [codec.decode(m) for m in reply[2]]
+    return {"version": version, "message_count": reply[1], "history": history}
+
+
+async def save_session(session_id: str, bot: TrupyOpenAI, refresh_summary: bool = True) -> None:
+    await _write(session_id, bot)
+    logger.info("Session saved: %s", session_id)
+
+    if refresh_summary and bot.needs_summary_refresh() and session_id not in _summary_tasks:
+        # The saved bot may be cached and handed to the next turn, so summarize a snapshot.
+        snapshot = copy.copy(bot)
+        snapshot.messages = list(bot.messages)
+        task = asyncio.create_task(_refresh_summary(session_id, snapshot))
+        _summary_tasks[session_id] = task
+        task.add_done_callback(lambda _: _summary_tasks.pop(session_id, None))
+
+
+async def _refresh_summary(session_id: str, bot: TrupyOpenAI) -> None:
+    await bot.refresh_summary()
+    if not bot.summary:
+        return
+
+    # Re-read under the session lock so turns saved while the summary was generating are kept.
+    try:
+        async with session_lock(session_id):
+            latest = await get_session(session_id)
+            if latest is None:
+                return
+            latest.apply_summary(bot.summary, bot.summarized_count)
+            await save_session(session_id, latest)
+    except (SessionBusyError, SessionConflictError):
+        logger.warning("Rolling summary not applied, session busy: %s", session_id)
+        return
+    logger.info("Rolling summary refreshed: %s | summarized=%s", session_id, bot.summarized_count)
+
+
+async def acquire_session_lock(session_id: str) -> str:
+    redis = await get_binary_redis()
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + settings.SESSION_LOCK_WAIT
+    while not await redis.set(_lock_key(session_id), token, nx=True, px=int(settings.SESSION_LOCK_TTL * 1000)):
+        if time.monotonic() >= deadline:
+            raise SessionBusyError(session_id)
+        await asyncio.sleep(0.05)
+    return token
+
+
+async def release_session_lock(session_id: str, token: str) -> None:
+    redis = await get_binary_redis()
+    await redis.eval(_RELEASE_LOCK_SCRIPT, 1, _lock_key(session_id), token)
+
+
+async def renew_session_lock(session_id: str, token: str) -> bool:
+    redis = await get_binary_redis()
+    ttl_ms = int(settings.SESSION_LOCK_TTL * 1000)
+    return bool(await redis.eval(_RENEW_LOCK_SCRIPT, 1, _lock_key(session_id), token, ttl_ms))
+
+
+@asynccontextmanager
+async def session_lock(session_id: str) -> AsyncIterator[None]:
+    token = await acquire_session_lock(session_id)
+    try:
+        yield
+    finally:
+        await release_session_lock(session_id, token)
+
+
+async def get_cached_reply(session_id: str, idempotency_key: str) -> Optional[Dict[str, Any]]:
+    redis = await get_binary_redis()
+    raw = await redis.get(_reply_key(session_id, idempotency_key))
+    return codec.decode(raw) if raw is not None else None
+
+
+async def cache_reply(session_id: str, idempotency_key: str, reply: Dict[str, Any]) -> None:
+    redis = await get_binary_redis()
+    await redis.set(_reply_key(session_id, idempotency_key), codec.encode(reply), ex=settings.SESSION_TTL)
 
 
 async def remove_session(session_id: str) -> None:
-    redis = await get_redis()
-    await redis.delete(_key(session_id))
-    logger.info(f"Session removed: {session_id}")
+    await remove_sessions([session_id])
+    logger.info("Session removed: %s", session_id)
+
+
+async def remove_sessions(session_ids: List[str]) -> None:
+    if not session_ids:
+        return
+    for sid in session_ids:
+        session_cache.evict(sid)
+    redis = await get_binary_redis()
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.delete(
+            *(_key(sid) for sid in session_ids),
+            *(_messages_key(sid) for sid in session_ids),
+            *(_version_key(sid) for sid in session_ids),
+            *(_shadow_key(sid) for sid in session_ids),
+        )
+        pipe.zrem(INDEX_ANONYMOUS, *session_ids)
+        pipe.zrem(INDEX_IDENTIFIED, *session_ids)
+        pipe.zrem(INDEX_EXPIRING, *session_ids)
+        await pipe.execute()
+
+
+async def claim_expired_sessions(limit: int) -> List[str]:
+    """Claim up to `limit` timed-out sessions; unless released or removed, a claim is retried after EXPIRY_CLAIM_TIMEOUT."""
+    redis = await get_binary_redis()
+    now = time.time()
+    claimed = await redis.eval(
+        _CLAIM_EXPIRED_SCRIPT,
+        3,
+        INDEX_ANONYMOUS,
+        INDEX_IDENTIFIED,
+        INDEX_EXPIRING,
+        now,
+        now + settings.EXPIRY_CLAIM_TIMEOUT,
+        limit,
+    )
+    return [sid.decode() for sid in claimed]
+
+
+async def load_expired_sessions(
+    session_ids: List[str],
+) -> Tuple[List[Tuple[str, TrupyOpenAI, datetime]], List[str], List[str]]:
+    """Rebuild claimed sessions from their shadow copies.
+
+    Returns the sessions to finalize with the time of their last activity, the ids that are live
+    again (written since the claim), and the ids whose shadow is gone (saved before shadows
+    existed, or past the grace period). Sessions still locked by a request or a socket are in
+    none of these and stay claimed, to be retried.
+    """
+    redis = await get_binary_redis()
+    async with redis.pipeline(transaction=False) as pipe:
+        for sid in session_ids:
+            pipe.exists(_key(sid))
+            pipe.exists(_lock_key(sid))
+            pipe.get(_shadow_key(sid))
+            pipe.pttl(_shadow_key(sid))
+            pipe.lrange(_messages_key(sid), 0, -1)
+        replies = await pipe.execute()
+
+    expired: List[Tuple[str, TrupyOpenAI, datetime]] = []
+    live: List[str] = []
+    gone: List[str] = []
+    now = time.time()
+    for i, sid in enumerate(session_ids):
+        exists, locked, raw, pttl, raw_messages = replies[5 * i:5 * i + 5]
+        if exists:
+            live.append(sid)
+            continue
+        if locked:
+            continue
+        if raw is None:
+            gone.append(sid)
+            continue
+        bot = TrupyOpenAI.from_dict(codec.decode(raw), [codec.decode(m) for m in raw_messages])
+        ended_at = bot.last_active_at
+        if ended_at is None:
+            # Stored before last_active_at existed: the shadow was last written with the session,
+            # SESSION_TTL + SESSION_EXPIRY_GRACE before it expires.
+            ended_at = now + pttl / 1000 - settings.SESSION_TTL - settings.SESSION_EXPIRY_GRACE
+        expired.append((sid, bot, datetime.utcfromtimestamp(ended_at)))
+    return expired, live, gone
+
+
+async def release_expiry_claims(session_ids: List[str]) -> None:
+    if not session_ids:
+        return
+    redis = await get_binary_redis()
+    await redis.zrem(INDEX_EXPIRING, *session_ids)
+
+
+async def active_session_breakdown() -> Dict[str, int]:
+    redis = await get_binary_redis()
+    now = time.time()
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.zcount(INDEX_ANONYMOUS, now, "+inf")
+        pipe.zcount(INDEX_IDENTIFIED, now, "+inf")
+        anonymous, identified = await pipe.execute()
+    return {"anonymous": anonymous, "identified": identified}
 
 
 async def count_active_sessions() -> int:
-    redis = await get_redis()
-    keys = [k async for k in redis.scan_iter(f"{SESSION_PREFIX}*")]
-    return len(keys)
+    breakdown = await active_session_breakdown()
+    return breakdown["anonymous"] + breakdown["identified"]
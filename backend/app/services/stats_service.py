@@ -0,0 +1,133 @@
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from sqlalchemy import delete, func, or_, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app.core.database import engine
+from app.models.session import SessionRecord, SessionRollup
+from app.utils.logger import setup_logger
+
+logger = setup_logger(name="stats_service")
+
+GROUP_BY_NAMES = ("none", "major", "quarter", "anonymous")
+BUCKET_NAMES = ("day", "week", "month", "total")
+
+RollupKey = Tuple[date, bool, str, str]
+
+
+def rollup_key(user_data: Dict[str, Any], ended_at: Optional[datetime], created_at: Optional[datetime] = None) -> RollupKey:
+    # Records from before ended_at was stored fall back to created_at.
+    moment = ended_at or created_at or datetime.utcnow()
+    # Identified sessions store the whole profile; anonymous ones only the summary.
+    anonymous = not user_data.get("name")
+    return moment.date(), anonymous, user_data.get("major") or "", user_data.get("quarter") or ""
+
+
+def _upsert(dialect: str):
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    statement = insert(SessionRollup)
+    return statement.on_conflict_do_update(
+        index_elements=[SessionRollup.day, SessionRollup.anonymous, SessionRollup.major, SessionRollup.quarter],
+        set_={"sessions": SessionRollup.sessions + statement.excluded.sessions},
+    )
+
+
+async def add_to_rollups(db: Union[AsyncSession, AsyncConnection], keys: Iterable[RollupKey]) -> None:
+    """Count newly inserted session records; run it in the transaction that inserted them."""
+    counts = Counter(keys)
+    if not counts:
+        return
+    rows = [
+        {"day": day, "anonymous": anonymous, "major": major, "quarter": quarter, "sessions": sessions}
+        for (day, anonymous, major, quarter), sessions in counts.items()
+    ]
+    await db.execute(_upsert(engine.dialect.name), rows)
+
+
+def _bucket_label(day: Any, bucket: str) -> Optional[str]:
+    if bucket == "total":
+        return None
+    if not isinstance(day, date):
+        day = date.fromisoformat(day)
+    if bucket == "week":
+        day = day - timedelta(days=day.weekday())
+    elif bucket == "month":
+        return day.strftime("%Y-%m")
+    return day.isoformat()
+
+
+def _group_label(value: Any, group_by: str) -> Optional[str]:
+    if group_by == "none":
+        return None
+    if group_by == "anonymous":
+        return "anonymous" if value else "identified"
+    return value or None
+
+
+async def get_stats(
+    db: AsyncSession,
+    group_by: str = "none",
+    bucket: str = "day",
+    ended_from: Optional[date] = None,
+    ended_to: Optional[date] = None,
+) -> List[Dict[str, Any]]:
+    """Session counts per time bucket and group, read from the rollups instead of the sessions table."""
+    columns = []
+    if bucket != "total":
+        columns.append(SessionRollup.day)
+    if group_by != "none":
+        columns.append(getattr(SessionRollup, group_by))
+    query = select(*columns, func.sum(SessionRollup.sessions))
+    if ended_from:
+        query = query.where(SessionRollup.day >= ended_from)
+    if ended_to:
+        query = query.where(SessionRollup.day < ended_to)
+    if columns:
+        query = query.group_by(*columns).order_by(*columns)
+
+    # Rows come back per day; weeks and months are folded here, in day order.
+    counts: Dict[Tuple[Optional[str], Optional[str]], int] = {}
+    for row in await db.execute(query):
+        day = row[0] if bucket != "total" else None
+        value = row[-2] if group_by != "none" else None
+        key = (_bucket_label(day, bucket), _group_label(value, group_by))
+        counts[key] = counts.get(key, 0) + int(row[-1] or 0)
+    return [{"bucket": bucket_label, "group": group, "sessions": sessions} for (bucket_label, group), sessions in counts.items()]
+
+
+async def rebuild_rollups() -> int:
+    """Recompute all rollups from the sessions table in one transaction; returns the sessions counted."""
+    day = func.date(func.coalesce(SessionRecord.ended_at, SessionRecord.created_at))
+    name = SessionRecord.user_data["name"].as_string()
+    # Same test as rollup_key: a missing or empty name is anonymous.
+    anonymous = or_(name.is_(None), name == "")
+    major = func.coalesce(SessionRecord.user_data["major"].as_string(), "")
+    quarter = func.coalesce(SessionRecord.user_data["quarter"].as_string(), "")
+    query = select(day, anonymous, major, quarter, func.count()).group_by(day, anonymous, major, quarter)
+
+    async with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            # Finalizer flushes wait for the rebuild, so none is counted twice or missed.
+            await conn.execute(text(f"LOCK TABLE {SessionRollup.__tablename__} IN EXCLUSIVE MODE"))
+        # On SQLite the delete takes the write lock up front, to the same effect.
+        await conn.execute(delete(SessionRollup))
+        rows = [
+            {
+                "day": value if isinstance(value, date) else date.fromisoformat(value),
+                "anonymous": bool(is_anonymous),
+                "major": major_value,
+                "quarter": quarter_value,
+                "sessions": sessions,
+            }
+            for value, is_anonymous, major_value, quarter_value, sessions in await conn.execute(query)
+        ]
+        if rows:
+            await conn.execute(SessionRollup.__table__.insert(), rows)
+    total = sum(row["sessions"] for row in rows)
+    logger.info("Rebuilt %s session rollups covering %s sessions", len(rows), total)
+    return total
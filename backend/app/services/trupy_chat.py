@@ -1,23 +1,31 @@
+import time
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
 
-from openai import OpenAI, OpenAIError
-from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential
+from openai import OpenAIError
+from tenacity import retry, retry_if_exception_type, retry_if_not_exception_type, stop_after_attempt, wait_exponential
 
 from app.core.config import get_settings
+from app.core.llm_client import get_llm_client
+from app.core.llm_scheduler import LLMDeadlineError, Priority, get_llm_scheduler
+from app.core.metrics import RISK_FLAGS, observe_stage, record_usage, stage
+from app.services.crisis_detection import get_crisis_detector
+from app.services import response_cache
+from app.services.prompts import CURRENT_PROMPT_VERSION, render_system_prompt, resolve_version
+from app.services.risk_classifier import risk_scorer
 from app.utils.logger import setup_logger
+from app.utils.tokens import estimate_message_tokens
 
 settings = get_settings()
 
 LOGS_DIR = settings.LOGS_DIR
-LOGS_DIR.mkdir(parents=True, exist_ok=True)
 LOG_FILE = LOGS_DIR / "trupy_chat.log"
 logger = setup_logger(name="trupy_chat", log_file=LOG_FILE)
 
-CRISIS_KEYWORDS = [
-    "suicid", "kill myself", "self-harm", "self harm", "hurt myself",
-    "end my life", "want to die", "harm others", "hurt someone",
-]
+GREETING_TRIGGER = "Please greet the student and ask how you can help them today."
+FALLBACK_GREETING = (
+    "Hello! I'm Trupy AI, the assistant for the Psychology Department at UPY. How can I help you today?"
+)
 
 SAFETY_MESSAGE = (
     "Thank you for sharing that with me. It sounds like you are going through a lot right "
@@ -28,107 +36,260 @@ SAFETY_MESSAGE = (
     "- [Schedule a Confidential Appointment](https://upy.edu.mx/appointment)\n"
     "- [Report a Concern](https://upy.edu.mx/report)"
 )
+RISK_GUIDANCE = (
+    "The student's next message may be a sign that they are at risk of harming themselves. Respond "
+    "with warmth, gently ask how safe they are right now, and let them know the University "
+    "Psychologist (psicologia@upy.edu.mx) is available to talk confidentially."
+)
+BUSY_MESSAGE = (
+    "I'm sorry, I'm receiving a lot of messages right now and couldn't answer in time. "
+    "Please send your message again in a moment."
+)
 
 
 class TrupyOpenAI:
-    def __init__(self, user_profile: Optional[Dict[str, str]] = None):
-        self.client = OpenAI(
-            base_url=settings.BASE_URL or None,
-            api_key=settings.LLM_API_KEY,
-        )
+    def __init__(
+        self,
+        user_profile: Optional[Dict[str, str]] = None,
+        prompt_version: str = CURRENT_PROMPT_VERSION,
+    ):
+        self.client = get_llm_client()
         self.user_profile = user_profile
+        self.prompt_version: str = prompt_version
         self.messages: List[Dict[str, str]] = []
         self.crisis_detected: bool = False
+        # Highest risk classifier score among flagged messages; None while nothing was flagged.
+        self.risk_score: Optional[float] = None
         self.is_concluded: bool = False
+        self.version: int = 0
+        self.summary: Optional[str] = None
+        self.summarized_count: int = 0
+        self.turns_since_summary: int = 0
+        # When the student last sent a message; an expired session is recorded as ended then.
+        self.last_active_at: Optional[float] = time.time()
 
         system_prompt = self._build_system_prompt()
         self.messages.append({"role": "system", "content": system_prompt})
-
-
+        # Number of leading messages already stored; the system prompt is rebuilt, never stored.
+        self.persisted_count: int = 1
 
     def _build_system_prompt(self) -> str:
-        profile_context = ""
-        if self.user_profile:
-            profile_context = (
-                f"\nThe student has already identified themselves:\n"
-                f"  - Name: {self.user_profile.get('name')}\n"
-                f"  - Major: {self.user_profile.get('major')}\n"
-                f"  - Quarter: {self.user_profile.get('quarter')}\n"
-                "Use this information to personalize the conversation. Do NOT ask for name, major, or quarter again."
-            )
-        else:
-            profile_context = "\nThe student has chosen to remain anonymous. Do NOT ask for personal details."
-
-        return f"""
-                Persona: You are a virtual assistant, called Trupy AI, for the Department of Psychology at UPY University. Your personality is that of a kind, respectful, and professional companion. Always maintain this character.
-                Core Objective:
-                Your main purpose is to be a supportive figure for students to talk with about psychology and their mental well-being.
-                Operational Guidelines:
-                1.  Conversation Scope: You must only engage in conversations related to psychology and mental well-being.
-                2.  Information Boundaries: You are not equipped to handle academic inquiries (e.g., courses, grades, university policies). If asked, politely state that you do not have that information.
-                3.  Off-Topic Queries: For any requests outside your core objective, simply state that the topic is outside your scope of knowledge.
-                4.  Response Length: Keep your responses brief and to the point. Only elaborate if the user specifically asks for more detail.
-                5.  Formatting: All output must be plain text. Do not use markdown or any rich text formatting.
-                6.  Student Identity: {profile_context}
-                Safety Protocol:
-                    - If the student expresses any sign of self-harm or intent to harm others, politely recommend to contact a professional or the university's psychological support team.
-                """
+        return render_system_prompt(self.prompt_version, self.user_profile)
 
     def to_dict(self) -> Dict[str, Any]:
         return {
             "user_profile": self.user_profile,
-            "messages": self.messages,
+            "prompt_version": self.prompt_version,
             "crisis_detected": self.crisis_detected,
+            "risk_score": self.risk_score,
             "is_concluded": self.is_concluded,
+            "version": self.version,
+            "summary": self.summary,
+            "summarized_count": self.summarized_count,
+            "turns_since_summary": self.turns_since_summary,
+            "last_active_at": self.last_active_at,
         }
 
     @classmethod
-    def from_dict(cls, data: Dict[str, Any]) -> "TrupyOpenAI":
+    def from_dict(
+        cls, data: Dict[str, Any], history: Optional[List[Dict[str, str]]] = None
+    ) -> "TrupyOpenAI":
         instance = cls.__new__(cls)
-        instance.client = OpenAI(
-            base_url=settings.BASE_URL or None,
-            api_key=settings.LLM_API_KEY,
-        )
+        instance.client = get_llm_client()
         instance.user_profile = data.get("user_profile")
-        instance.messages = data.get("messages", [])
+        # Sessions stored before prompt versioning were built from the v1 template.
+        instance.prompt_version = resolve_version(data.get("prompt_version", "1"))
+        if "messages" in data:
+            # Legacy blob with the full transcript inline: re-persist everything on next save.
+            instance.messages = data["messages"]
+            instance.persisted_count = 1
+        else:
+            instance.messages = [
+                {"role": "system", "content": instance._build_system_prompt()},
+                *(history or []),
+            ]
+            instance.persisted_count = len(instance.messages)
         instance.crisis_detected = data.get("crisis_detected", False)
+        instance.risk_score = data.get("risk_score")
         instance.is_concluded = data.get("is_concluded", False)
+        instance.version = data.get("version", 0)
+        instance.summary = data.get("summary")
+        instance.summarized_count = data.get("summarized_count", 0)
+        instance.turns_since_summary = data.get("turns_since_summary", 0)
+        instance.last_active_at = data.get("last_active_at")
 
         return instance
 
+    @retry(
+        retry=retry_if_exception_type(OpenAIError) & retry_if_not_exception_type(LLMDeadlineError),
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=0.5, min=0.5, max=4),
+    )
+    async def _call_openai_api(
+        self, messages: List[Dict[str, str]], priority: Priority, deadline: float, stage_name: str = "llm_total"
+    ) -> Any:
+        try:
+            async with get_llm_scheduler().slot(priority, deadline):
+                with stage(stage_name):
+                    response = await self.client.create(messages=messages)
+            record_usage(response.usage)
+            return response
+        except OpenAIError as e:
+            logger.error("OpenAI API error: %s", e)
+            raise
+
+    async def _complete(
+        self,
+        messages: List[Dict[str, str]],
+        use_cache: bool = False,
+        priority: Priority = Priority.INTERACTIVE,
+    ) -> Optional[str]:
+        # Only for stateless prompts (the greeting): a chat turn is keyed by its whole transcript, so it
+        # would almost never hit and would keep a student's conversation in Redis past the session.
+        use_cache = use_cache and settings.LLM_CACHE_ENABLED
+        if use_cache:
+            cached = await response_cache.get_cached(messages)
+            if cached is not None:
+                return cached
+
+        # One deadline for all attempts: retries must not push the reply past it.
+        deadline = get_llm_scheduler().deadline(priority)
+        response = await self._call_openai_api(messages, priority, deadline)
+        content = response.choices[0].message.content
+        if use_cache and content:
+            await response_cache.store(messages, content)
+        return content
+
     @retry(
         retry=retry_if_exception_type(OpenAIError),
         stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=4, max=10),
+        wait=wait_exponential(multiplier=0.5, min=0.5, max=4),
     )
-    def _call_openai_api(self, messages: List[Dict[str, str]]) -> Any:
+    async def _stream_openai_api(self, messages: List[Dict[str, str]]) -> Any:
         try:
-            return self.client.chat.completions.create(
-                model=settings.MODEL,
-                messages=messages,
+            return await self.client.create(
+                messages=messages, stream=True, stream_options={"include_usage": True}
             )
         except OpenAIError as e:
-            logger.error(f"OpenAI API error: {e}")
+            logger.error("OpenAI API error: %s", e)
             raise
 
+    def _window_start(self) -> int:
+        history = self.messages[1:]
+        budget = settings.CONTEXT_TOKEN_BUDGET - estimate_message_tokens(self.messages[0])
+        if self.summary:
+            budget -= estimate_message_tokens(self._summary_message())
+
+        start = len(history)
+        while start > 0:
+            cost = estimate_message_tokens(history[start - 1])
+            if cost > budget:
+                break
+            budget -= cost
+            start -= 1
+        return start
+
+    def _summary_message(self) -> Dict[str, str]:
+        return {"role": "system", "content": f"Summary of the earlier conversation: {self.summary}"}
+
+    def _context_messages(self) -> List[Dict[str, str]]:
+        # Messages not yet folded into the summary stay verbatim even past the budget, until the
+        # next refresh covers them; otherwise they would be in neither.
+        start = min(self._window_start(), self.summarized_count)
+        context = [self.messages[0]]
+        if self.summary and start > 0:
+            context.append(self._summary_message())
+        context.extend(self.messages[1 + start:])
+        return context
+
+    def needs_summary_refresh(self) -> bool:
+        return (
+            self.turns_since_summary >= settings.SUMMARY_REFRESH_TURNS
+            and self._window_start() > self.summarized_count
+        )
+
+    async def _summarize(self, messages: List[Dict[str, str]], prompt: str) -> Optional[str]:
+        deadline = get_llm_scheduler().deadline(Priority.BACKGROUND)
+        response = await self._call_openai_api(
+            [*messages, {"role": "user", "content": prompt}], Priority.BACKGROUND, deadline, "llm_summary"
+        )
+        return response.choices[0].message.content
+
+    async def refresh_summary(self) -> None:
+        start = self._window_start()
+        folded = self.messages[1 + self.summarized_count:1 + start]
+        if not folded:
+            return
+
+        context = [self.messages[0]]
+        if self.summary:
+            context.append(self._summary_message())
+        context.extend(folded)
+        prompt = (
+            "Update the summary of the conversation so far so that it also covers the messages above. "
+            "Keep the themes and anything needed to continue the conversation naturally. Keep it under 150 words."
+        )
+        try:
+            summary = await self._summarize(context, prompt)
+        except Exception as e:
+            logger.error("Error refreshing rolling summary: %s", e)
+            return
+        if summary:
+            self.apply_summary(summary, start)
+
+    def apply_summary(self, summary: str, summarized_count: int) -> None:
+        if summarized_count <= self.summarized_count:
+            return
+        self.summary = summary
+        self.summarized_count = summarized_count
+        self.turns_since_summary = 0
+
     def _contains_crisis_keywords(self, text: str) -> bool:
-        lower = text.lower()
-        return any(kw in lower for kw in CRISIS_KEYWORDS)
+        with stage("crisis_scan"):
+            return get_crisis_detector().contains(text)
+
+    async def _assess_risk(self, text: str) -> bool:
+        # Second stage for what the keywords miss: flags the turn, never ends the session.
+        if not risk_scorer.running:
+            return False
+        with stage("risk_score"):
+            score = await risk_scorer.score(text)
+        if score is None or score < risk_scorer.threshold:
+            return False
+        self.risk_score = max(score, self.risk_score or 0.0)
+        RISK_FLAGS.inc()
+        logger.warning("Risk classifier flagged user input (score %.2f).", score)
+        return True
 
-    def start_conversation(self) -> str:
-        trigger = "Please greet the student and ask how you can help them today."
-        self.messages.append({"role": "user", "content": trigger})
+    def _turn_context(self, at_risk: bool) -> List[Dict[str, str]]:
+        context = self._context_messages()
+        if at_risk:
+            # Guidance for this reply only, placed right before the message it concerns; it is not stored.
+            context.insert(len(context) - 1, {"role": "system", "content": RISK_GUIDANCE})
+        return context
+
+    async def start_conversation(self) -> str:
+        self.messages.append({"role": "user", "content": GREETING_TRIGGER})
         try:
-            response = self._call_openai_api(self.messages)
-            message = response.choices[0].message
-            if message.content:
-                self.messages.append({"role": "assistant", "content": message.content})
-                return message.content
+            content = await self._complete(self._context_messages(), use_cache=True, priority=Priority.GREETING)
+            if content:
+                self.messages.append({"role": "assistant", "content": content})
+                return content
         except Exception as e:
-            logger.error(f"Error starting conversation: {e}")
-        return "Hello! I'm Trupy AI, the assistant for the Psychology Department at UPY. How can I help you today?"
+            logger.error("Error starting conversation: %s", e)
+        return FALLBACK_GREETING
+
+    def open_with_greeting(self, greeting: str) -> str:
+        self.messages.append({"role": "user", "content": GREETING_TRIGGER})
+        self.messages.append({"role": "assistant", "content": greeting})
+        return greeting
 
-    def get_response(self, user_input: str) -> Union[str, Dict[str, Any]]:
+    async def generate_greeting(self) -> Optional[str]:
+        # Fresh variant for the greeting pool: bypasses the exact-match cache and leaves history untouched.
+        messages = [*self._context_messages(), {"role": "user", "content": GREETING_TRIGGER}]
+        return await self._complete(messages, priority=Priority.BACKGROUND)
+
+    async def get_response(self, user_input: str) -> Union[str, Dict[str, Any]]:
         if self._contains_crisis_keywords(user_input):
             self.crisis_detected = True
             self.is_concluded = True
@@ -139,14 +300,16 @@ class TrupyOpenAI:
                 "crisis_detected": True,
             }
 
+        at_risk = await self._assess_risk(user_input)
         self.messages.append({"role": "user", "content": user_input})
+        self.turns_since_summary += 1
+        self.last_active_at = time.time()
 
         try:
-            response = self._call_openai_api(self.messages)
-            message = response.choices[0].message
+            content = await self._complete(self._turn_context(at_risk))
 
-            if message.content:
-                if self._contains_crisis_keywords(message.content):
+            if content:
+                if self._contains_crisis_keywords(content):
                     self.crisis_detected = True
                     self.is_concluded = True
                     return {
@@ -154,33 +317,106 @@ class TrupyOpenAI:
                         "message": SAFETY_MESSAGE,
                         "crisis_detected": True,
                     }
-                self.messages.append({"role": "assistant", "content": message.content})
-                return message.content
+                self.messages.append({"role": "assistant", "content": content})
+                return content
 
             return "I'm having trouble understanding. Could you please repeat that?"
 
+        except LLMDeadlineError:
+            # Nothing was answered: drop the turn so the student's resend is not a duplicate.
+            self.messages.pop()
+            self.turns_since_summary -= 1
+            raise
         except Exception as e:
-            logger.error(f"Unexpected error in get_response: {e}")
+            logger.error("Unexpected error in get_response: %s", e)
             return "I apologize, but I'm currently experiencing technical difficulties. Please try again later."
 
-    def generate_summary(self) -> str:
+    async def stream_response(self, user_input: str) -> AsyncIterator[Dict[str, Any]]:
+        if self._contains_crisis_keywords(user_input):
+            self.crisis_detected = True
+            self.is_concluded = True
+            logger.warning("Crisis keywords detected in user input.")
+            yield {
+                "type": "crisis",
+                "message": SAFETY_MESSAGE,
+                "crisis_detected": True,
+            }
+            return
+
+        at_risk = await self._assess_risk(user_input)
+        self.messages.append({"role": "user", "content": user_input})
+        self.turns_since_summary += 1
+        self.last_active_at = time.time()
+
+        parts: List[str] = []
+        scanner = get_crisis_detector().scanner()
+        first_token = True
+        try:
+            # The slot is held for the whole stream; time to first token is what reflects upstream load.
+            async with get_llm_scheduler().slot(Priority.INTERACTIVE) as slot:
+                start = time.perf_counter()
+                stream = await self._stream_openai_api(self._turn_context(at_risk))
+                async for chunk in stream:
+                    if getattr(chunk, "usage", None):
+                        record_usage(chunk.usage)
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if not delta:
+                        continue
+                    if first_token:
+                        slot.latency = time.perf_counter() - start
+                        observe_stage("llm_ttft", slot.latency)
+                        first_token = False
+
+                    if scanner.feed(delta):
+                        self.crisis_detected = True
+                        self.is_concluded = True
+                        await stream.close()
+                        logger.warning("Crisis keywords detected in streamed model output.")
+                        yield {
+                            "type": "crisis",
+                            "message": SAFETY_MESSAGE,
+                            "crisis_detected": True,
+                        }
+                        return
+                    parts.append(delta)
+                    yield {"type": "delta", "content": delta}
+
+        except LLMDeadlineError:
+            self.messages.pop()
+            self.turns_since_summary -= 1
+            yield {"type": "error", "message": BUSY_MESSAGE}
+            return
+        except Exception as e:
+            logger.error("Unexpected error in stream_response: %s", e)
+            self.messages.pop()
+            self.turns_since_summary -= 1
+            yield {
+                "type": "error",
+                "message": "I apologize, but I'm currently experiencing technical difficulties. Please try again later.",
+            }
+            return
+
+        observe_stage("llm_total", time.perf_counter() - start)
+        content = "".join(parts)
+        if not content:
+            self.messages.pop()
+            self.turns_since_summary -= 1
+            yield {"type": "error", "message": "I'm having trouble understanding. Could you please repeat that?"}
+            return
+
+        self.messages.append({"role": "assistant", "content": content})
+        yield {"type": "done", "message": content}
+
+    async def generate_summary(self) -> str:
+        # Errors propagate: the finalizer keeps the session and retries rather than storing a placeholder.
         summary_prompt = (
             "Based on the conversation so far, generate a concise, non-identifiable summary "
             "of the main topics discussed. Focus on themes, not personal details. Keep it under 100 words."
         )
-        summary_messages = [
-            *self.messages,
-            {"role": "user", "content": summary_prompt},
-        ]
-        try:
-            response = self.client.chat.completions.create(
-                model=settings.MODEL,
-                messages=summary_messages,
-            )
-            return response.choices[0].message.content or "No summary available."
-        except Exception as e:
-            logger.error(f"Error generating summary: {e}")
-            return "Summary could not be generated."
+        summary = await self._summarize(self._context_messages(), summary_prompt)
+        return summary or "No summary available."
 
     def get_history(self) -> List[Dict[str, str]]:
         return [m for m in self.messages if m["role"] != "system"]
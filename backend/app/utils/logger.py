@@ -1,33 +1,194 @@
+import atexit
+import json
 import logging
+import os
+import queue
 import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
 from pathlib import Path
+from typing import Any, Dict, List, Optional
 
-def setup_logger(name: str, log_file: Path | None = None, level: int = logging.INFO) -> logging.Logger:
-    logger = logging.getLogger(name)
-    logger.setLevel(level)
+from app.core.config import get_settings
+
+settings = get_settings()
+
+session_id_var: ContextVar[Optional[str]] = ContextVar("session_id", default=None)
+
+_queue: Any = queue.SimpleQueue()
+_queue_handlers: List[QueueHandler] = []
+_listener: Optional[QueueListener] = None
+_file_router: Optional["_FileRouter"] = None
+# Set in forked workers whose records are written by the supervisor process.
+_remote_writer = False
+
+
+def bind_session(session_id: Optional[str]) -> None:
+    session_id_var.set(session_id)
+
+
+class _ContextFilter(logging.Filter):
+    # Runs in the calling thread, so the record carries the caller's context into the queue.
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.session_id = session_id_var.get()
+        return True
+
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only this handler sees the record, so merge the args in place instead of
+        # formatting and copying it on the event loop; the listener does the formatting.
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "session_id", None):
+            entry["session_id"] = record.session_id
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _FileRouter(logging.Handler):
+    # Sends each record to the file of the logger that produced it.
+    def __init__(self):
+        super().__init__()
+        self.files: Dict[str, logging.Handler] = {}
+
+    def emit(self, record: logging.LogRecord) -> None:
+        handler = self.files.get(record.name)
+        if handler is not None:
+            handler.handle(record)
+
+    def close(self) -> None:
+        for handler in self.files.values():
+            handler.close()
+        super().close()
+
+
+def _formatter() -> logging.Formatter:
+    if settings.LOG_FORMAT == "json":
+        return JsonFormatter()
+    return logging.Formatter('%(asctime)s - [%(name)s] - %(levelname)s - %(message)s')
 
-    if logger.handlers:  # Avoid duplicate handlers
-        return logger
 
-    # Formatter for structured logs (timestamp, level, name, message)
-    formatter = logging.Formatter('%(asctime)s - [%(name)s] - %(levelname)s - %(message)s')
+class _LazyRotatingFileHandler(RotatingFileHandler):
+    def _open(self):
+        Path(self.baseFilename).parent.mkdir(parents=True, exist_ok=True)
+        return super()._open()
 
-    # Console handler
+
+class _LazyTimedRotatingFileHandler(TimedRotatingFileHandler):
+    def _open(self):
+        Path(self.baseFilename).parent.mkdir(parents=True, exist_ok=True)
+        return super()._open()
+
+
+def _file_handler(log_file: Path) -> logging.Handler:
+    # delay=True: neither the file nor its directory is created until the first record is written.
+    if settings.LOG_ROTATION == "time":
+        handler = _LazyTimedRotatingFileHandler(
+            log_file, when=settings.LOG_ROTATE_WHEN, backupCount=settings.LOG_BACKUP_COUNT, delay=True
+        )
+    else:
+        handler = _LazyRotatingFileHandler(
+            log_file, maxBytes=settings.LOG_MAX_BYTES, backupCount=settings.LOG_BACKUP_COUNT, delay=True
+        )
+    handler.setFormatter(_formatter())
+    return handler
+
+
+def _start_listener() -> None:
+    global _listener, _file_router
     console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
+    console_handler.setFormatter(_formatter())
+    if _file_router is None:
+        _file_router = _FileRouter()
+    _listener = QueueListener(_queue, console_handler, _file_router)
+    _listener.start()
+
+
+def use_process_queue(process_queue: Any) -> None:
+    """Route every logger through a multiprocessing queue drained by this (supervisor) process.
+
+    Call before forking workers: the children only enqueue, so each log file has a single writer
+    and rotation never races between workers.
+    """
+    global _queue
+    shutdown_logging()
+    _queue = process_queue
+    for handler in _queue_handlers:
+        handler.queue = process_queue
+    _start_listener()
+
+
+def _after_fork_in_child() -> None:
+    # The listener thread does not survive fork(). With a process queue the parent keeps writing.
+    global _listener, _remote_writer
+    if _listener is None:
+        return
+    _listener = None
+    if isinstance(_queue, queue.SimpleQueue):
+        _start_listener()
+    else:
+        # A bare os.fork() skips multiprocessing's own after-fork hook, so the queue would
+        # still point at the parent's feeder thread.
+        _queue._after_fork()
+        _remote_writer = True
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _file_router.close()
+        _listener = None
+    elif _remote_writer:
+        # Flush records still buffered in the process queue's feeder thread.
+        _queue.close()
+        _queue.join_thread()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+atexit.register(shutdown_logging)
+
+
+def setup_logger(name: str, log_file: Path | None = None, level: int | str | None = None) -> logging.Logger:
+    global _file_router
+    logger = logging.getLogger(name)
+    logger.setLevel(level or settings.LOG_LEVELS.get(name, settings.LOG_LEVEL))
+
+    if logger.handlers:  # Avoid duplicate handlers
+        return logger
 
-    # File handler if specified
-    if log_file:
-        # Ensure parent directory exists
-        log_file.parent.mkdir(parents=True, exist_ok=True)
+    if _listener is None and not _remote_writer:
+        _start_listener()
 
-        # Touch the file if it doesn't exist
-        if not log_file.exists():
-            log_file.touch()
+    # The caller only merges the message and enqueues; formatting and I/O happen on the listener thread.
+    queue_handler = _QueueHandler(_queue)
+    queue_handler.addFilter(_ContextFilter())
+    _queue_handlers.append(queue_handler)
+    logger.addHandler(queue_handler)
+    logger.propagate = False
 
-        file_handler = logging.FileHandler(log_file, mode='a')
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+    if log_file and settings.LOG_FILE_ENABLED:
+        if _file_router is None:
+            _file_router = _FileRouter()
+        _file_router.files[name] = _file_handler(log_file)
 
     return logger
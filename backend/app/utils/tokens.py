@@ -0,0 +1,18 @@
+from typing import Dict, Iterable
+
+# Rough heuristic for English chat text (~4 characters per token) plus the
+# per-message framing overhead used by chat completion APIs.
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def estimate_message_tokens(message: Dict[str, str]) -> int:
+    return MESSAGE_OVERHEAD_TOKENS + estimate_tokens(message.get("content") or "")
+
+
+def estimate_messages_tokens(messages: Iterable[Dict[str, str]]) -> int:
+    return sum(estimate_message_tokens(m) for m in messages)
@@ -0,0 +1,92 @@
+"""Export or re-import the finished-session archive.
+
+    python archive.py export --format csv --created-from 2025-08-01 --created-to 2026-01-01 -o term.csv
+    python archive.py import term.ndjson
+
+Exports stream from a server-side cursor, so memory stays flat regardless of the archive size.
+Imports insert in batches and skip sessions that already exist.
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# stdout carries the archive itself; the app's console logging goes to stderr instead.
+_archive_stdout = sys.stdout.buffer
+sys.stdout = sys.stderr
+
+from app.core.database import AsyncSessionLocal, engine, init_db  # noqa: E402
+from app.services import archive_service  # noqa: E402
+
+
+def _format_for(path: str | None, explicit: str | None) -> str:
+    if explicit:
+        return explicit
+    suffix = Path(path).suffix.lstrip(".") if path else ""
+    if suffix == "jsonl":
+        return "ndjson"
+    return suffix if suffix in archive_service.FORMAT_NAMES else "ndjson"
+
+
+async def _export(args: argparse.Namespace) -> None:
+    archive_format = archive_service.get_format(_format_for(args.output, args.format))
+    query = archive_service.export_query(
+        created_from=archive_service.parse_datetime(args.created_from),
+        created_to=archive_service.parse_datetime(args.created_to),
+        ended_from=archive_service.parse_datetime(args.ended_from),
+        ended_to=archive_service.parse_datetime(args.ended_to),
+    )
+    out = open(args.output, "wb") if args.output else _archive_stdout
+    try:
+        async with AsyncSessionLocal() as db:
+            async for chunk in archive_service.export_records(db, archive_format, query, args.batch_size):
+                out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+
+
+async def _import(args: argparse.Namespace) -> None:
+    archive_format = archive_service.get_format(_format_for(args.input, args.format))
+    await init_db()
+    with open(args.input, "rb") as stream:
+        counts = await archive_service.import_records(archive_format.read(stream), args.batch_size)
+    print(f"read={counts['read']} inserted={counts['inserted']} skipped={counts['skipped']}", file=sys.stderr)
+
+
+async def _run(args: argparse.Namespace) -> None:
+    try:
+        await args.handler(args)
+    finally:
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export or import the Trupy AI session archive.")
+    subparsers = parser.add_subparsers(required=True)
+
+    export_parser = subparsers.add_parser("export", help="Stream session records to a file or stdout.")
+    export_parser.add_argument("-o", "--output", help="Defaults to stdout; the format follows the extension.")
+    export_parser.add_argument("--format", choices=archive_service.FORMAT_NAMES)
+    export_parser.add_argument("--created-from", help="ISO date or datetime, inclusive.")
+    export_parser.add_argument("--created-to", help="ISO date or datetime, exclusive.")
+    export_parser.add_argument("--ended-from", help="ISO date or datetime, inclusive.")
+    export_parser.add_argument("--ended-to", help="ISO date or datetime, exclusive.")
+    export_parser.add_argument("--batch-size", type=int, default=archive_service.EXPORT_BATCH_SIZE)
+    export_parser.set_defaults(handler=_export)
+
+    import_parser = subparsers.add_parser("import", help="Load an exported archive back into the database.")
+    import_parser.add_argument("input")
+    import_parser.add_argument("--format", choices=archive_service.FORMAT_NAMES)
+    import_parser.add_argument("--batch-size", type=int, default=archive_service.IMPORT_BATCH_SIZE)
+    import_parser.set_defaults(handler=_import)
+
+    args = parser.parse_args()
+    try:
+        asyncio.run(_run(args))
+    except (ImportError, ValueError) as e:
+        parser.exit(1, f"{e}\n")
+
+
+if __name__ == "__main__":
+    main()
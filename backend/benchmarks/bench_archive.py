@@ -0,0 +1,138 @@
+"""Pulling the whole archive: /sessions/history cursor paging vs the streaming /sessions/export.
+
+Run from backend/:  python -m benchmarks.bench_archive --rows 200000
+Each strategy is run twice: once for throughput, once under tracemalloc for peak Python memory.
+The database is seeded once and reused on later runs (pass --db to choose the file).
+"""
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--rows", type=int, default=200_000)
+parser.add_argument("--limit", type=int, default=500, help="Page size for /history (its maximum).")
+parser.add_argument("--db", default=str(Path(tempfile.gettempdir()) / "trupy-bench-archive.db"))
+args = parser.parse_args()
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{args.db}")
+
+from app.core.database import engine, init_db  # noqa: E402
+from app.models.session import SessionRecord  # noqa: E402
+
+SQLITE_DATETIME = "%Y-%m-%d %H:%M:%S.%f"
+SUMMARY = "The student talked about exam stress, sleeping badly before finals and feeling behind in two courses."
+
+
+def _seed(path: str, rows: int) -> None:
+    conn = sqlite3.connect(path)
+    existing = conn.execute(f"SELECT COUNT(*) FROM {SessionRecord.__tablename__}").fetchone()[0]
+    start = datetime(2024, 1, 1)
+    batch = []
+    for i in range(existing, rows):
+        created = start + timedelta(seconds=i * 60)
+        user_data = {"major": "Data Engineering", "quarter": str(i % 10 + 1), "summary": SUMMARY}
+        ended = created + timedelta(minutes=12)
+        batch.append((f"bench-{i}", json.dumps(user_data), created.strftime(SQLITE_DATETIME), ended.strftime(SQLITE_DATETIME)))
+        if len(batch) == 50_000:
+            conn.executemany("INSERT INTO sessions (session_id, user_data, created_at, ended_at) VALUES (?, ?, ?, ?)", batch)
+            conn.commit()
+            batch.clear()
+    if batch:
+        conn.executemany("INSERT INTO sessions (session_id, user_data, created_at, ended_at) VALUES (?, ?, ?, ?)", batch)
+        conn.commit()
+    conn.close()
+
+
+async def _get(app, path: str, query: str = "") -> tuple[dict, int, bytes]:
+    """Drive one request through the ASGI app, counting body bytes as they are sent.
+
+    Only the last chunk is kept, so the measured memory is the server's, not the client's.
+    """
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": query.encode(), "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    headers: dict = {}
+    size = 0
+    last = b""
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if requested:
+            # The client never disconnects; StreamingResponse polls for that while it streams.
+            await asyncio.Event().wait()
+        requested = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal size, last
+        if message["type"] == "http.response.start":
+            headers.update((k.decode(), v.decode()) for k, v in message["headers"])
+        elif message["type"] == "http.response.body":
+            size += len(message.get("body", b""))
+            last = message.get("body", b"")
+
+    await app(scope, receive, send)
+    return headers, size, last
+
+
+async def _page_history(app) -> tuple[int, int]:
+    rows = size = 0
+    query = f"limit={args.limit}"
+    while True:
+        headers, page_size, body = await _get(app, "/api/v1/sessions/history", query)
+        rows += len(json.loads(body))
+        size += page_size
+        cursor = headers.get("x-next-cursor")
+        if not cursor:
+            return rows, size
+        query = f"limit={args.limit}&cursor={cursor}"
+
+
+async def _export(app, fmt: str) -> tuple[int, int]:
+    _, size, _ = await _get(app, "/api/v1/sessions/export", f"format={fmt}")
+    return args.rows, size
+
+
+async def _run(label: str, strategy) -> None:
+    start = time.perf_counter()
+    rows, size = await strategy()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    await strategy()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<22} {elapsed:>8.2f} {rows / elapsed:>10.0f} {size / 2**20:>9.1f} {peak / 2**20:>9.1f}")
+
+
+async def main() -> None:
+    await init_db()
+    _seed(args.db, args.rows)
+    from main import app
+
+    print(f"{args.rows} rows ({args.db})")
+    print(f"{'strategy':<22} {'seconds':>8} {'rows/s':>10} {'body MiB':>9} {'peak MiB':>9}")
+    await _run(f"history limit={args.limit}", lambda: _page_history(app))
+    await _run("export ndjson", lambda: _export(app, "ndjson"))
+    await _run("export csv", lambda: _export(app, "csv"))
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        print("export parquet         skipped (pyarrow not installed)")
+    else:
+        await _run("export parquet", lambda: _export(app, "parquet"))
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
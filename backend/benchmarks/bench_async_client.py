@@ -0,0 +1,64 @@
+"""Concurrent-chat throughput on a single event loop: blocking sync client vs shared AsyncOpenAI.
+
+Run from backend/:  python -m benchmarks.bench_async_client --students 50 --turns 3
+"""
+import argparse
+import asyncio
+import os
+import time
+
+PORT = 18080
+os.environ.setdefault("BASE_URL", f"http://127.0.0.1:{PORT}/v1")
+os.environ.setdefault("LLM_API_KEY", "stub")
+os.environ.setdefault("MODEL", "stub")
+os.environ.setdefault("LLM_CACHE_ENABLED", "false")
+
+from openai import OpenAI  # noqa: E402
+
+from app.core.config import get_settings  # noqa: E402
+from app.core.llm_client import close_llm_client  # noqa: E402
+from app.services.trupy_chat import TrupyOpenAI  # noqa: E402
+from benchmarks.stub_llm import run_stub  # noqa: E402
+
+settings = get_settings()
+
+
+async def _sync_student(turns: int) -> None:
+    # Mirrors the previous implementation: a fresh sync client per request, called from async code.
+    messages = [{"role": "system", "content": "stub"}]
+    for i in range(turns):
+        client = OpenAI(base_url=settings.BASE_URL, api_key=settings.LLM_API_KEY)
+        messages.append({"role": "user", "content": f"turn {i}"})
+        response = client.chat.completions.create(model=settings.MODEL, messages=messages)
+        messages.append({"role": "assistant", "content": response.choices[0].message.content})
+        client.close()
+
+
+async def _async_student(turns: int) -> None:
+    bot = TrupyOpenAI()
+    for i in range(turns):
+        await bot.get_response(f"turn {i}")
+
+
+async def _run(label: str, student, students: int, turns: int) -> None:
+    start = time.perf_counter()
+    await asyncio.gather(*(student(turns) for _ in range(students)))
+    elapsed = time.perf_counter() - start
+    total = students * turns
+    print(f"{label:<8} {total:>5} turns in {elapsed:7.2f}s  ->  {total / elapsed:8.1f} turns/s")
+
+
+async def main(students: int, turns: int) -> None:
+    await _run("before", _sync_student, students, turns)
+    await _run("after", _async_student, students, turns)
+    await close_llm_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+    with run_stub(port=PORT, latency=args.latency):
+        asyncio.run(main(args.students, args.turns))
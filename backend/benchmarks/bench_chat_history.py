@@ -0,0 +1,87 @@
+"""Resyncing a transcript: GET /chat/{id}/history in full vs ?since= and If-None-Match, per transcript length.
+
+Run from backend/:  python -m benchmarks.bench_chat_history --repeat 200
+"full (hydrate)" is the previous handler: load the session into a TrupyOpenAI and list its history.
+Uses fakeredis unless --redis-url is given; the session cache is off so every read goes to Redis.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--repeat", type=int, default=200)
+parser.add_argument("--redis-url", default=None)
+args = parser.parse_args()
+os.environ.update(SESSION_CACHE_ENABLED="false", LLM_API_KEY="bench")
+
+import httpx  # noqa: E402
+
+from app.services import session_service  # noqa: E402
+from app.services.trupy_chat import TrupyOpenAI  # noqa: E402
+from benchmarks.redis_backend import count_bytes_read, use_redis  # noqa: E402
+
+LENGTHS = (10, 100, 500)
+USER = "I have been feeling overwhelmed with my coursework and I am not sure how to cope with it all."
+ASSISTANT = (
+    "That sounds really heavy. It is common to feel that way when deadlines pile up. "
+    "Would it help to talk through which course is weighing on you the most right now?"
+)
+
+
+async def _seed(session_id: str, length: int) -> None:
+    bot = TrupyOpenAI(user_profile={"name": "Student", "major": "Robotics", "quarter": "3"})
+    for _ in range(length // 2):
+        bot.messages += [{"role": "user", "content": USER}, {"role": "assistant", "content": ASSISTANT}]
+    await session_service._write(session_id, bot, check_version=False)
+
+
+async def _legacy_history(session_id: str):
+    # The previous handler body.
+    bot = await session_service.get_session(session_id, readonly=True)
+    return {"session_id": session_id, "history": bot.get_history()}
+
+
+async def _get(client: httpx.AsyncClient, path: str, **kwargs) -> int:
+    response = await client.get(path, **kwargs)
+    assert response.status_code in (200, 304), response.text
+    return len(response.content)
+
+
+async def _measure(call) -> tuple[float, float, int]:
+    timings = []
+    with count_bytes_read() as read:
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            size = await call()
+            timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), read.bytes / args.repeat, size
+
+
+async def main() -> None:
+    use_redis(args.redis_url)
+    from main import app
+
+    app.add_api_route("/bench/legacy-history/{session_id}", _legacy_history)
+
+    print(f"{'messages':>8} {'request':<22} {'median ms':>10} {'redis read B':>13} {'body B':>8}")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for length in LENGTHS:
+            session_id = f"bench-history-{length}"
+            await _seed(session_id, length)
+            path = f"/api/v1/chat/{session_id}/history"
+            etag = (await client.get(path)).headers["etag"]
+            variants = [
+                ("full (hydrate)", lambda: _get(client, f"/bench/legacy-history/{session_id}")),
+                ("full", lambda: _get(client, path)),
+                ("since=last turn", lambda: _get(client, path, params={"since": length - 2})),
+                ("If-None-Match -> 304", lambda: _get(client, path, headers={"If-None-Match": etag})),
+            ]
+            for label, call in variants:
+                median, read, size = await _measure(call)
+                print(f"{length:>8} {label:<22} {median:>10.3f} {read:>13.0f} {size:>8}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
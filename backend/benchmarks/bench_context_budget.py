@@ -0,0 +1,74 @@
+"""Prompt tokens sent per turn over a synthetic 100-turn conversation, unbounded vs budgeted.
+
+Run from backend/:  python -m benchmarks.bench_context_budget --turns 100
+"""
+import argparse
+import asyncio
+import os
+from types import SimpleNamespace
+
+os.environ.setdefault("LLM_CACHE_ENABLED", "false")
+
+from app.core.config import get_settings  # noqa: E402
+from app.services.trupy_chat import TrupyOpenAI  # noqa: E402
+from app.utils.tokens import estimate_messages_tokens  # noqa: E402
+
+settings = get_settings()
+
+USER_TURN = "Lately I have been feeling stressed about exams and I am not sleeping well. {i}"
+BOT_TURN = (
+    "That sounds really difficult. Stress around exams is very common, and poor sleep can make "
+    "everything feel heavier. What usually helps you unwind at the end of the day? {i}"
+)
+SUMMARY = "The student discussed ongoing exam stress, poor sleep and ways to unwind. " * 3
+
+
+def _completion(content: str) -> SimpleNamespace:
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+class _Recorder:
+    def __init__(self, bot: TrupyOpenAI):
+        self.bot = bot
+        self.prompt_tokens: list[int] = []
+
+    async def call(self, messages, *args, **kwargs):
+        self.prompt_tokens.append(estimate_messages_tokens(messages))
+        return _completion(BOT_TURN.format(i=len(self.prompt_tokens)))
+
+    async def summarize(self, messages, prompt):
+        return SUMMARY
+
+
+async def _run(turns: int, budgeted: bool) -> list[int]:
+    bot = TrupyOpenAI()
+    recorder = _Recorder(bot)
+    bot._call_openai_api = recorder.call
+    bot._summarize = recorder.summarize
+    if not budgeted:
+        bot._context_messages = lambda: bot.messages
+
+    for i in range(turns):
+        await bot.get_response(USER_TURN.format(i=i))
+        if budgeted and bot.needs_summary_refresh():
+            await bot.refresh_summary()
+    return recorder.prompt_tokens
+
+
+async def main(turns: int) -> None:
+    unbounded = await _run(turns, budgeted=False)
+    budgeted = await _run(turns, budgeted=True)
+
+    print(f"budget={settings.CONTEXT_TOKEN_BUDGET} tokens, summary refresh every {settings.SUMMARY_REFRESH_TURNS} turns")
+    print(f"{'turn':>5} {'unbounded':>10} {'budgeted':>10}")
+    for i in range(0, turns, max(turns // 10, 1)):
+        print(f"{i + 1:>5} {unbounded[i]:>10} {budgeted[i]:>10}")
+    print(f"{turns:>5} {unbounded[-1]:>10} {budgeted[-1]:>10}")
+    print(f"{'total':>5} {sum(unbounded):>10} {sum(budgeted):>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.turns))
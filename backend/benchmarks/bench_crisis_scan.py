@@ -0,0 +1,56 @@
+"""Crisis scan time per message as the keyword list grows: legacy linear scan vs compiled matcher.
+
+Run from backend/:  python -m benchmarks.bench_crisis_scan
+"""
+import argparse
+import random
+import string
+import timeit
+
+from app.services.crisis_detection import DEFAULT_CRISIS_KEYWORDS, CrisisDetector
+
+MESSAGE = (
+    "Honestly this week has been rough. I have three exams, my roommate keeps playing music "
+    "until late and I barely sleep. I feel tired all the time and I do not know how to organize "
+    "myself anymore. Do you have any advice for managing stress before finals? "
+) * 2
+
+
+def _synthetic_keywords(count: int, rng: random.Random) -> list[str]:
+    keywords = list(DEFAULT_CRISIS_KEYWORDS["en"])
+    while len(keywords) < count:
+        words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(rng.randint(1, 3))]
+        keyword = " ".join(words)
+        if keyword not in MESSAGE.lower():
+            keywords.append(keyword)
+    return keywords
+
+
+def _legacy(keywords: list[str]):
+    def scan(text: str) -> bool:
+        lower = text.lower()
+        return any(kw in lower for kw in keywords)
+    return scan
+
+
+def main(sizes: list[int], number: int) -> None:
+    rng = random.Random(42)
+    print(f"message length: {len(MESSAGE)} chars, {number} scans per measurement")
+    print(f"{'keywords':>9} {'legacy us/scan':>15} {'compiled us/scan':>17}")
+    for size in sizes:
+        keywords = _synthetic_keywords(size, rng)
+        legacy = _legacy(keywords)
+        detector = CrisisDetector(keywords)
+        assert legacy(MESSAGE) == detector.contains(MESSAGE)
+
+        legacy_us = min(timeit.repeat(lambda: legacy(MESSAGE), number=number, repeat=3)) / number * 1e6
+        compiled_us = min(timeit.repeat(lambda: detector.contains(MESSAGE), number=number, repeat=3)) / number * 1e6
+        print(f"{size:>9} {legacy_us:>15.1f} {compiled_us:>17.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    parser.add_argument("--number", type=int, default=500)
+    args = parser.parse_args()
+    main(args.sizes, args.number)
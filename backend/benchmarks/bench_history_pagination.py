@@ -0,0 +1,98 @@
+"""/sessions/history page latency at page 1 vs page 10,000: OFFSET vs keyset cursor.
+
+Run from backend/:  python -m benchmarks.bench_history_pagination --rows 1000000
+The database is seeded once and reused on later runs (pass --db to choose the file).
+"""
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--rows", type=int, default=1_000_000)
+parser.add_argument("--page", type=int, default=10_000)
+parser.add_argument("--limit", type=int, default=50)
+parser.add_argument("--repeat", type=int, default=20)
+parser.add_argument("--db", default=str(Path(tempfile.gettempdir()) / "trupy-bench-history.db"))
+args = parser.parse_args()
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{args.db}")
+
+import httpx  # noqa: E402
+
+from app.core.database import init_db  # noqa: E402
+from app.models.session import SessionRecord  # noqa: E402
+
+# Same storage format SQLAlchemy uses for DateTime columns on SQLite.
+SQLITE_DATETIME = "%Y-%m-%d %H:%M:%S.%f"
+MAJORS = ["Data Engineering", "Cybersecurity", "Robotics", "Embedded Systems", "Biomedical"]
+
+
+def _seed(path: str, rows: int) -> None:
+    conn = sqlite3.connect(path)
+    existing = conn.execute(f"SELECT COUNT(*) FROM {SessionRecord.__tablename__}").fetchone()[0]
+    if existing >= rows:
+        conn.close()
+        return
+    start = datetime(2024, 1, 1)
+    batch = []
+    for i in range(existing, rows):
+        created = start + timedelta(seconds=i * 30)
+        user_data = {"major": MAJORS[i % len(MAJORS)], "quarter": str(i % 10 + 1), "summary": "Exam stress and sleep."}
+        ended = created + timedelta(minutes=12)
+        batch.append((f"bench-{i}", json.dumps(user_data), created.strftime(SQLITE_DATETIME), ended.strftime(SQLITE_DATETIME)))
+        if len(batch) == 50_000:
+            conn.executemany("INSERT INTO sessions (session_id, user_data, created_at, ended_at) VALUES (?, ?, ?, ?)", batch)
+            conn.commit()
+            batch.clear()
+    if batch:
+        conn.executemany("INSERT INTO sessions (session_id, user_data, created_at, ended_at) VALUES (?, ?, ?, ?)", batch)
+        conn.commit()
+    conn.close()
+
+
+async def _measure(client: httpx.AsyncClient, params: dict) -> float:
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        response = await client.get("/api/v1/sessions/history", params=params)
+        timings.append((time.perf_counter() - start) * 1000)
+        response.raise_for_status()
+    return statistics.median(timings)
+
+
+async def main() -> None:
+    await init_db()
+    seed_start = time.perf_counter()
+    _seed(args.db, args.rows)
+    print(f"{args.rows} rows ready in {time.perf_counter() - seed_start:.1f}s ({args.db})")
+
+    from main import app
+
+    deep_skip = (args.page - 1) * args.limit
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        # Walk to the page once via OFFSET to grab the cursor a client would hold at that point.
+        previous = await client.get("/api/v1/sessions/history", params={"skip": deep_skip - args.limit, "limit": args.limit})
+        deep_cursor = previous.headers["X-Next-Cursor"]
+
+        offset_first = await _measure(client, {"limit": args.limit})
+        offset_deep = await _measure(client, {"skip": deep_skip, "limit": args.limit})
+        keyset_deep = await _measure(client, {"cursor": deep_cursor, "limit": args.limit})
+
+        by_offset = await client.get("/api/v1/sessions/history", params={"skip": deep_skip, "limit": args.limit})
+        by_cursor = await client.get("/api/v1/sessions/history", params={"cursor": deep_cursor, "limit": args.limit})
+        assert by_offset.json() == by_cursor.json(), "keyset page differs from offset page"
+
+    print(f"{'query':<22} {'median ms':>10}")
+    print(f"{'page 1':<22} {offset_first:>10.2f}")
+    print(f"{f'page {args.page} offset':<22} {offset_deep:>10.2f}")
+    print(f"{f'page {args.page} keyset':<22} {keyset_deep:>10.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,80 @@
+"""Tail latency and error rate against a flaky primary: single endpoint vs failover router vs hedged router.
+
+Run from backend/:  python -m benchmarks.bench_llm_router --requests 400 --concurrency 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("LLM_API_KEY", "stub")
+
+from openai import OpenAIError  # noqa: E402
+
+from app.core.config import LLMProviderConfig, get_settings  # noqa: E402
+from app.core.llm_client import CircuitBreaker, LLMEndpoint, LLMRouter, _build_client  # noqa: E402
+from benchmarks.stub_llm import run_stub  # noqa: E402
+
+settings = get_settings()
+MESSAGES = [{"role": "system", "content": "stub"}, {"role": "user", "content": "How are you?"}]
+
+
+def _router(urls: list[str], hedge: bool) -> LLMRouter:
+    endpoints = [
+        LLMEndpoint(
+            LLMProviderConfig(name=f"ep{i}", base_url=url, api_key="stub", model="stub"),
+            _build_client(LLMProviderConfig(name=f"ep{i}", base_url=url, api_key="stub", model="stub")),
+            CircuitBreaker(settings.LLM_CIRCUIT_FAILURE_THRESHOLD, settings.LLM_CIRCUIT_RESET_TIMEOUT),
+            settings.LLM_LATENCY_WINDOW,
+        )
+        for i, url in enumerate(urls)
+    ]
+    return LLMRouter(endpoints, hedge=hedge, hedge_default_delay=settings.LLM_HEDGE_DEFAULT_DELAY)
+
+
+async def _run(label: str, router: LLMRouter, requests: int, concurrency: int) -> None:
+    latencies: list[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one() -> None:
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await router.create(messages=MESSAGES)
+            except OpenAIError:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    await router.close()
+
+    q = statistics.quantiles(latencies, n=100)
+    print(
+        f"{label:<10} p50={q[49] * 1000:7.1f}ms  p95={q[94] * 1000:7.1f}ms  p99={q[98] * 1000:7.1f}ms  "
+        f"errors={errors:>4}/{requests}  wall={elapsed:6.2f}s"
+    )
+
+
+async def main(primary: str, backup: str, requests: int, concurrency: int) -> None:
+    await _run("single", _router([primary], hedge=False), requests, concurrency)
+    await _run("failover", _router([primary, backup], hedge=False), requests, concurrency)
+    await _run("hedged", _router([primary, backup], hedge=True), requests, concurrency)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--slow-rate", type=float, default=0.08)
+    args = parser.parse_args()
+
+    faults = {"error_rate": args.error_rate, "slow_rate": args.slow_rate, "slow_latency": 2.0, "seed": 7}
+    with run_stub(port=18081, latency=0.1, **faults) as primary, run_stub(port=18082, latency=0.15, seed=8) as backup:
+        asyncio.run(main(primary, backup, args.requests, args.concurrency))
@@ -0,0 +1,139 @@
+"""Mixed LLM load against a rate-limited stub: the priority scheduler vs sending every call at once.
+
+Run from backend/:  python -m benchmarks.bench_llm_scheduler --seconds 20
+Chat users take turns continuously and greetings arrive at a steady rate while a burst of session-end
+summaries lands. The stub answers at most --capacity calls at a time and returns 429 beyond that, like
+a provider's concurrency limit. "unbounded" uses a scheduler with no effective limit or deadlines.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--seconds", type=float, default=20.0)
+parser.add_argument("--users", type=int, default=10, help="Concurrent chat users.")
+parser.add_argument("--think", type=float, default=1.0, help="Pause between a user's turns.")
+parser.add_argument("--greetings", type=float, default=4.0, help="New sessions per second.")
+parser.add_argument("--summaries", type=int, default=150, help="Size of the session-end burst.")
+parser.add_argument("--capacity", type=int, default=8)
+parser.add_argument("--latency", type=float, default=0.4)
+parser.add_argument("--stub-port", type=int, default=18080)
+args = parser.parse_args()
+os.environ.update(
+    BASE_URL=f"http://127.0.0.1:{args.stub_port}/v1",
+    LLM_API_KEY="bench",
+    MODEL="stub",
+)
+
+from app.core import llm_scheduler  # noqa: E402
+from app.core.config import get_settings  # noqa: E402
+from app.core.llm_scheduler import LLMDeadlineError, LLMScheduler, Priority  # noqa: E402
+from app.services.trupy_chat import TrupyOpenAI  # noqa: E402
+from benchmarks.stub_llm import run_stub  # noqa: E402
+
+settings = get_settings()
+MESSAGE = {"role": "user", "content": "I have been feeling overwhelmed with my coursework lately."}
+SUMMARY_PROMPT = "Summarize the conversation so far in under 100 words."
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class Results:
+    def __init__(self):
+        self.latencies = {p: [] for p in Priority}
+        self.shed = {p: 0 for p in Priority}
+        self.failed = {p: 0 for p in Priority}
+
+    async def run(self, priority: Priority, call) -> None:
+        start = time.perf_counter()
+        try:
+            await call()
+        except LLMDeadlineError:
+            self.shed[priority] += 1
+        except Exception:
+            self.failed[priority] += 1
+        else:
+            self.latencies[priority].append(time.perf_counter() - start)
+
+
+async def _load(results: Results, stop_at: float) -> None:
+    bot = TrupyOpenAI()
+    messages = [*bot.messages, MESSAGE]
+
+    async def chat_user() -> None:
+        while time.monotonic() < stop_at:
+            await results.run(Priority.INTERACTIVE, lambda: bot._complete(messages, use_cache=False))
+            await asyncio.sleep(args.think)
+
+    async def greetings() -> None:
+        tasks = []
+        while time.monotonic() < stop_at:
+            call = lambda: bot._complete(messages, use_cache=False, priority=Priority.GREETING)  # noqa: E731
+            tasks.append(asyncio.create_task(results.run(Priority.GREETING, call)))
+            await asyncio.sleep(1 / args.greetings)
+        await asyncio.gather(*tasks)
+
+    async def summary_burst() -> None:
+        await asyncio.sleep(1.0)
+        call = lambda: bot._summarize(messages, SUMMARY_PROMPT)  # noqa: E731
+        await asyncio.gather(*(results.run(Priority.BACKGROUND, call) for _ in range(args.summaries)))
+
+    await asyncio.gather(*(chat_user() for _ in range(args.users)), greetings(), summary_burst())
+
+
+async def _run(label: str, scheduler: LLMScheduler) -> None:
+    llm_scheduler._scheduler = scheduler
+    results = Results()
+    trajectory = []
+
+    stop_at = time.monotonic() + args.seconds
+
+    async def sample() -> None:
+        while time.monotonic() < stop_at:
+            trajectory.append(scheduler.limit)
+            await asyncio.sleep(1.0)
+
+    sampler = asyncio.create_task(sample())
+    start = time.perf_counter()
+    await _load(results, stop_at)
+    elapsed = time.perf_counter() - start
+    await sampler
+
+    print(f"\n{label} (finished in {elapsed:.1f}s)")
+    print(f"{'class':<12} {'ok':>6} {'shed':>6} {'failed':>7} {'p50 s':>7} {'p99 s':>7}")
+    for priority in Priority:
+        latencies = results.latencies[priority]
+        print(
+            f"{priority.name.lower():<12} {len(latencies):>6} {results.shed[priority]:>6} "
+            f"{results.failed[priority]:>7} {_percentile(latencies, 50):>7.2f} {_percentile(latencies, 99):>7.2f}"
+        )
+    if scheduler.maximum < 10**6:
+        print("limit per second while under load: " + " ".join(f"{value:.1f}" for value in trajectory))
+
+
+async def main() -> None:
+    print(
+        f"{args.users} chat users, {args.greetings:g} greetings/s, {args.summaries} summaries at t=1s; "
+        f"stub capacity {args.capacity}, {args.latency:g}s per call"
+    )
+    await _run("unbounded", LLMScheduler(10**6, 10**6, 10**6, float("inf")))
+    await _run(
+        "scheduler",
+        LLMScheduler(
+            settings.LLM_CONCURRENCY_INITIAL,
+            settings.LLM_CONCURRENCY_MIN,
+            settings.LLM_CONCURRENCY_MAX,
+            settings.LLM_LATENCY_TARGET,
+        ),
+    )
+
+
+if __name__ == "__main__":
+    with run_stub(args.stub_port, latency=args.latency, capacity=args.capacity):
+        asyncio.run(main())
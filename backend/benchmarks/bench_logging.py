@@ -0,0 +1,113 @@
+"""Event-loop time spent per chat turn on logging: legacy synchronous handlers vs the queue-backed logger.
+
+Run from backend/:  python -m benchmarks.bench_logging --turns 20000 --disk-latency-ms 0 1
+Each simulated turn emits the lines session_service logs for a chat message (retrieved, saved).
+--disk-latency-ms adds a delay to every file write to model a slow or contended disk.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from app.utils import logger as app_logger
+
+LOG_DIR = Path(tempfile.mkdtemp(prefix="trupy-bench-logs-"))
+
+
+class SlowFile:
+    def __init__(self, stream, delay: float):
+        self.stream = stream
+        self.delay = delay
+
+    def write(self, data: str) -> int:
+        if self.delay:
+            time.sleep(self.delay)
+        return self.stream.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def _slow_down(handler: logging.Handler, delay: float) -> None:
+    handler.stream = SlowFile(handler._open(), delay)
+
+
+def _legacy_logger(name: str, log_file: Path | None, delay: float) -> logging.Logger:
+    # Mirrors the previous setup_logger: StreamHandler + FileHandler written on the calling thread.
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    formatter = logging.Formatter('%(asctime)s - [%(name)s] - %(levelname)s - %(message)s')
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(formatter)
+    logger.addHandler(console_handler)
+    if log_file:
+        file_handler = logging.FileHandler(log_file, mode="a")
+        file_handler.setFormatter(formatter)
+        _slow_down(file_handler, delay)
+        logger.addHandler(file_handler)
+    return logger
+
+
+def _queue_logger(name: str, log_file: Path | None, delay: float) -> logging.Logger:
+    app_logger.settings.LOG_FILE_ENABLED = log_file is not None
+    logger = app_logger.setup_logger(name=name, log_file=log_file)
+    if log_file:
+        _slow_down(app_logger._file_router.files[name], delay)
+    return logger
+
+
+async def _run(label: str, logger: logging.Logger, turns: int, legacy: bool) -> None:
+    blocked: list[float] = []
+    start = time.perf_counter()
+    for i in range(turns):
+        session_id = f"5f0c6a1e-{i:08d}"
+        t0 = time.perf_counter()
+        if legacy:
+            logger.info(f"Session retrieved: {session_id}")
+        else:
+            logger.info("Session retrieved: %s", session_id)
+        t1 = time.perf_counter()
+        await asyncio.sleep(0)
+        t2 = time.perf_counter()
+        if legacy:
+            logger.info(f"Session saved: {session_id}")
+        else:
+            logger.info("Session saved: %s", session_id)
+        blocked.append(t1 - t0 + time.perf_counter() - t2)
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+
+    q = statistics.quantiles(blocked, n=100)
+    print(
+        f"{label:<28} p50={q[49] * 1e6:8.1f}us  p99={q[98] * 1e6:8.1f}us  turns/s={turns / elapsed:8.0f}",
+        file=sys.__stdout__,
+    )
+
+
+async def main(turns: int, disk_latencies: list[float]) -> None:
+    await _run("legacy no-file", _legacy_logger("legacy_off", None, 0), turns, legacy=True)
+    await _run("queue no-file", _queue_logger("queue_off", None, 0), turns, legacy=False)
+    for ms in disk_latencies:
+        delay = ms / 1000
+        legacy = _legacy_logger(f"legacy_{ms}", LOG_DIR / f"legacy_{ms}.log", delay)
+        await _run(f"legacy file (+{ms}ms/write)", legacy, turns, legacy=True)
+        queued = _queue_logger(f"queue_{ms}", LOG_DIR / f"queue_{ms}.log", delay)
+        await _run(f"queue file (+{ms}ms/write)", queued, turns, legacy=False)
+        # Let the writer thread drain before the next variant.
+        app_logger.shutdown_logging()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=20000)
+    parser.add_argument("--disk-latency-ms", type=float, nargs="+", default=[0, 1])
+    args = parser.parse_args()
+    # Console output from both variants goes to /dev/null so neither pays for a terminal.
+    sys.stdout = open(os.devnull, "w")
+    asyncio.run(main(args.turns, args.disk_latency_ms))
@@ -0,0 +1,120 @@
+"""Risk classifier: latency it adds to a chat turn, and how it holds up at a steady 1k messages/sec.
+
+Run from backend/:  python -m benchmarks.bench_risk_classifier --rate 1000 --seconds 10
+"inline" scores each message on the event loop; "pool, batch 1" sends every message to the process
+pool on its own; "pool, 5 ms window" holds each batch open for up to 5 ms or 32 messages; "pool,
+micro-batched" is the app's default, where batches form while the worker is busy.
+Loop lag is how late a 1 ms timer fires while the load runs, i.e. what every other request waits.
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--rate", type=float, default=1000.0, help="Messages per second in the load test.")
+parser.add_argument("--seconds", type=float, default=10.0)
+parser.add_argument("--turns", type=int, default=500, help="Sequential turns for the per-turn latency.")
+parser.add_argument("--batch-size", type=int, default=32)
+parser.add_argument("--workers", type=int, default=1)
+args = parser.parse_args()
+
+from app.services.risk_classifier import RiskScorer  # noqa: E402
+from app.services.risk_model import DEFAULT_MODEL_PATH, SEED_DATA_PATH, HashedLinearModel  # noqa: E402
+
+with open(SEED_DATA_PATH, encoding="utf-8") as f:
+    SEED = [json.loads(line)["text"] for line in f]
+# Chat turns are usually longer than the seed sentences.
+MESSAGES = SEED + [" ".join(random.Random(i).sample(SEED, 3)) for i in range(200)]
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class InlineScorer:
+    def __init__(self):
+        self.model = HashedLinearModel.load(DEFAULT_MODEL_PATH)
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def score(self, text: str) -> float:
+        return self.model.score([text])[0]
+
+
+def _variants():
+    return [
+        ("inline", InlineScorer()),
+        ("pool, batch 1", RiskScorer(DEFAULT_MODEL_PATH, None, 1, 0.0, args.workers, 5.0)),
+        ("pool, 5 ms window", RiskScorer(DEFAULT_MODEL_PATH, None, args.batch_size, 0.005, args.workers, 5.0)),
+        ("pool, micro-batched", RiskScorer(DEFAULT_MODEL_PATH, None, args.batch_size, 0.0, args.workers, 5.0)),
+    ]
+
+
+async def _probe_lag(lags: list[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append((time.perf_counter() - start - 0.001) * 1000)
+
+
+async def _per_turn(scorer) -> list[float]:
+    timings = []
+    for i in range(args.turns):
+        start = time.perf_counter()
+        await scorer.score(MESSAGES[i % len(MESSAGES)])
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+async def _load(scorer) -> tuple[list[float], float, list[float]]:
+    timings: list[float] = []
+    lags: list[float] = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_probe_lag(lags, stop))
+
+    async def one(text: str) -> None:
+        start = time.perf_counter()
+        await scorer.score(text)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    total = int(args.rate * args.seconds)
+    tasks = []
+    started = time.perf_counter()
+    for i in range(total):
+        # Open loop: messages arrive on schedule whether or not earlier ones are done.
+        delay = started + i / args.rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(MESSAGES[i % len(MESSAGES)])))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+    return timings, total / elapsed, lags
+
+
+async def main() -> None:
+    print(f"{'scorer':<20} {'turn p50':>9} {'turn p99':>9} | {'load msg/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'lag p99':>8}")
+    for label, scorer in _variants():
+        await scorer.start()
+        try:
+            turn = await _per_turn(scorer)
+            timings, throughput, lags = await _load(scorer)
+        finally:
+            await scorer.stop()
+        print(
+            f"{label:<20} {statistics.median(turn):>9.3f} {_percentile(turn, 99):>9.3f} | {throughput:>10.0f} "
+            f"{statistics.median(timings):>8.2f} {_percentile(timings, 99):>8.2f} {_percentile(lags, 99):>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,68 @@
+"""Per-turn Redis payload and load latency with and without the in-process session cache.
+
+Run from backend/:  python -m benchmarks.bench_session_cache --turns 50
+Each turn mirrors a chat message: get_session, append a user/assistant pair, save_session.
+Uses fakeredis unless --redis-url is given (use a real server for meaningful latency numbers).
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+from app.core.config import get_settings
+from app.services import session_service
+from app.services.trupy_chat import FALLBACK_GREETING, TrupyOpenAI
+from benchmarks.redis_backend import count_bytes_read, count_bytes_written, use_redis
+
+settings = get_settings()
+
+USER_TURN = "I have been feeling overwhelmed with my coursework and I am not sure how to cope. ({i})"
+BOT_TURN = (
+    "It makes sense to feel overwhelmed when there is a lot going on. Would it help to talk "
+    "through what feels most urgent right now, so we can break it into smaller steps? ({i})"
+)
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def _run(label: str, enabled: bool, turns: int) -> None:
+    settings.SESSION_CACHE_ENABLED = enabled
+    session_id = str(uuid.uuid4())
+    bot = TrupyOpenAI()
+    bot.open_with_greeting(FALLBACK_GREETING)
+    await session_service._write(session_id, bot, check_version=False)
+    latencies: list[float] = []
+    with count_bytes_read() as read, count_bytes_written() as written:
+        for i in range(turns):
+            start = time.perf_counter()
+            bot = await session_service.get_session(session_id)
+            latencies.append((time.perf_counter() - start) * 1000)
+            bot.messages.append({"role": "user", "content": USER_TURN.format(i=i)})
+            bot.messages.append({"role": "assistant", "content": BOT_TURN.format(i=i)})
+            await session_service.save_session(session_id, bot)
+
+    print(
+        f"{label:<10} {read.bytes / turns:>12.0f} {written.bytes / turns:>13.0f} "
+        f"{_percentile(latencies, 50):>9.3f} {_percentile(latencies, 99):>9.3f}"
+    )
+
+
+async def main(turns: int) -> None:
+    print(f"{turns} turns per session")
+    print(f"{'cache':<10} {'read B/turn':>12} {'write B/turn':>13} {'get p50ms':>9} {'get p99ms':>9}")
+    await _run("off", False, turns)
+    await _run("on", True, turns)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--redis-url", default=None)
+    args = parser.parse_args()
+    # Summary refreshes call the LLM; keep them out of the measurement.
+    settings.SUMMARY_REFRESH_TURNS = 10**9
+    use_redis(args.redis_url)
+    asyncio.run(main(args.turns))
@@ -0,0 +1,107 @@
+"""Load test: N simultaneous session ends, legacy inline summary + single-row insert vs the finalizer.
+
+Run from backend/:  python -m benchmarks.bench_session_end --sessions 500
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime
+
+PORT = 18080
+_DB_DIR = tempfile.mkdtemp(prefix="trupy-bench-")
+os.environ.setdefault("BASE_URL", f"http://127.0.0.1:{PORT}/v1")
+os.environ.setdefault("LLM_API_KEY", "stub")
+os.environ.setdefault("MODEL", "stub")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_DB_DIR}/bench.db")
+
+import httpx  # noqa: E402
+from sqlalchemy import func, select  # noqa: E402
+
+from app.core.database import AsyncSessionLocal, init_db  # noqa: E402
+from app.models.session import SessionRecord  # noqa: E402
+from app.services import session_service  # noqa: E402
+from app.services.finalization_service import build_user_data, finalizer  # noqa: E402
+from benchmarks.redis_backend import use_redis  # noqa: E402
+from benchmarks.stub_llm import run_stub  # noqa: E402
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def _create(count: int) -> list[str]:
+    results = await asyncio.gather(*(session_service.create_session() for _ in range(count)))
+    return [session_id for session_id, _ in results]
+
+
+async def _legacy_end(session_id: str) -> None:
+    # Mirrors the previous handler: inline summary, then a single-row insert per request.
+    bot = await session_service.get_session(session_id)
+    summary = await bot.generate_summary()
+    async with AsyncSessionLocal() as db:
+        db.add(SessionRecord(session_id=session_id, user_data=build_user_data(bot, summary), ended_at=datetime.utcnow()))
+        await db.commit()
+    await session_service.remove_session(session_id)
+
+
+async def _timed(coro) -> float:
+    start = time.perf_counter()
+    await coro
+    return time.perf_counter() - start
+
+
+async def _count_records() -> int:
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(select(func.count()).select_from(SessionRecord))).scalar_one()
+
+
+def _report(label: str, latencies: list[float], errors: int, wall: float, finalized: float) -> None:
+    print(
+        f"{label:<10} p50={_percentile(latencies, 50) * 1000:8.1f}ms p99={_percentile(latencies, 99) * 1000:8.1f}ms "
+        f"errors={errors:<4} responses in {wall:6.2f}s, all records written after {finalized:6.2f}s"
+    )
+
+
+async def main(sessions: int) -> None:
+    await init_db()
+
+    session_ids = await _create(sessions)
+    start = time.perf_counter()
+    results = await asyncio.gather(*(_timed(_legacy_end(sid)) for sid in session_ids), return_exceptions=True)
+    wall = time.perf_counter() - start
+    latencies = [r for r in results if isinstance(r, float)]
+    _report("legacy", latencies, len(results) - len(latencies), wall, wall)
+
+    from main import app
+
+    await finalizer.start()
+    before = await _count_records()
+    session_ids = await _create(sessions)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        responses = await asyncio.gather(
+            *(_timed(client.post(f"/api/v1/sessions/{sid}/end")) for sid in session_ids),
+            return_exceptions=True,
+        )
+        wall = time.perf_counter() - start
+        while await _count_records() - before < sessions and time.perf_counter() - start < 120:
+            await asyncio.sleep(0.1)
+        finalized = time.perf_counter() - start
+    latencies = [r for r in responses if isinstance(r, float)]
+    _report("finalizer", latencies, len(responses) - len(latencies), wall, finalized)
+    await finalizer.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--redis-url", default=None)
+    args = parser.parse_args()
+    use_redis(args.redis_url)
+    with run_stub(port=PORT, latency=args.latency):
+        asyncio.run(main(args.sessions))
@@ -0,0 +1,118 @@
+"""Timed-out sessions: how soon they are finalized, and what an idle watcher pass costs as live sessions grow.
+
+Run from backend/:  python -m benchmarks.bench_session_expiry --sessions 500
+Uses fakeredis unless --redis-url is given (e.g. redis://localhost:6379/15 for a local redis-server;
+the database is flushed). Summaries come from the stub LLM.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--sessions", type=int, default=500, help="Sessions left to time out.")
+parser.add_argument("--ttl", type=int, default=2)
+parser.add_argument("--poll", type=float, default=0.5)
+parser.add_argument("--stub-port", type=int, default=18080)
+parser.add_argument("--redis-url", default=None)
+args = parser.parse_args()
+_DB_DIR = tempfile.mkdtemp(prefix="trupy-bench-")
+os.environ.update(
+    BASE_URL=f"http://127.0.0.1:{args.stub_port}/v1",
+    LLM_API_KEY="bench",
+    MODEL="stub",
+    DATABASE_URL=f"sqlite+aiosqlite:///{_DB_DIR}/bench.db",
+    SESSION_TTL=str(args.ttl),
+    EXPIRY_POLL_INTERVAL=str(args.poll),
+)
+
+from sqlalchemy import func, select  # noqa: E402
+
+from app.core.database import AsyncSessionLocal, engine, init_db  # noqa: E402
+from app.core.redis_client import get_binary_redis  # noqa: E402
+from app.models.session import SessionRecord  # noqa: E402
+from app.services import session_service  # noqa: E402
+from app.services.finalization_service import finalizer  # noqa: E402
+from app.services.trupy_chat import TrupyOpenAI  # noqa: E402
+from benchmarks.redis_backend import count_bytes_read, use_redis  # noqa: E402
+from benchmarks.stub_llm import run_stub  # noqa: E402
+
+LIVE_SIZES = (0, 10_000, 100_000)
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def _leave_sessions(count: int) -> None:
+    for i in range(count):
+        bot = TrupyOpenAI(user_profile={"name": "Student", "major": "Robotics", "quarter": "3"} if i % 2 else None)
+        bot.messages += [
+            {"role": "user", "content": "I have been feeling overwhelmed with my coursework."},
+            {"role": "assistant", "content": "That sounds like a lot. What feels heaviest right now?"},
+        ]
+        await session_service._write(f"expiring-{i}", bot, check_version=False)
+
+
+async def _count_records() -> int:
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(select(func.count()).select_from(SessionRecord))).scalar_one()
+
+
+async def _finalization_lag() -> None:
+    await _leave_sessions(args.sessions)
+    watcher = asyncio.create_task(finalizer.run_expiry_watcher())
+    start = time.perf_counter()
+    while await _count_records() < args.sessions:
+        await asyncio.sleep(0.1)
+    elapsed = time.perf_counter() - start
+    watcher.cancel()
+    await watcher
+
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(select(SessionRecord.ended_at, SessionRecord.created_at))).all()
+    # ended_at is the last save, so the session timed out SESSION_TTL later; created_at is the insert.
+    lags = [(created - ended).total_seconds() - args.ttl for ended, created in rows]
+    print(
+        f"{args.sessions} sessions timed out after {args.ttl}s, all finalized within {elapsed:.1f}s; "
+        f"expiry-to-record p50={_percentile(lags, 50):.2f}s p99={_percentile(lags, 99):.2f}s"
+    )
+
+
+async def _idle_pass_cost() -> None:
+    redis = await get_binary_redis()
+    expires_at = time.time() + 3600
+    print(f"{'live sessions':>14} {'pass ms':>8} {'read B':>7}")
+    for size in LIVE_SIZES:
+        await redis.delete(session_service.INDEX_ANONYMOUS)
+        for start in range(0, size, 10_000):
+            await redis.zadd(session_service.INDEX_ANONYMOUS, {f"live-{i}": expires_at for i in range(start, min(size, start + 10_000))})
+        timings = []
+        with count_bytes_read() as read:
+            for _ in range(50):
+                pass_start = time.perf_counter()
+                await finalizer.finalize_expired()
+                timings.append((time.perf_counter() - pass_start) * 1000)
+        print(f"{size:>14} {statistics.median(timings):>8.3f} {read.bytes / 50:>7.0f}")
+
+
+async def main() -> None:
+    use_redis(args.redis_url)
+    if args.redis_url:
+        await (await get_binary_redis()).flushdb()
+    await init_db()
+    await finalizer.start()
+    try:
+        await _finalization_lag()
+        await _idle_pass_cost()
+    finally:
+        await finalizer.stop()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    with run_stub(args.stub_port, latency=0.05):
+        asyncio.run(main())
@@ -0,0 +1,77 @@
+"""Bytes written per turn and save latency: legacy full-blob SETEX vs append-only session storage.
+
+Run from backend/:  python -m benchmarks.bench_session_storage --turns 50
+Uses fakeredis unless --redis-url is given (use a real server for meaningful latency numbers).
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from app.core.codecs import get_codec
+from app.core.config import get_settings
+from app.core.redis_client import get_redis
+from app.services import session_service
+from app.services.trupy_chat import TrupyOpenAI
+from benchmarks.redis_backend import count_bytes_written, use_redis
+
+settings = get_settings()
+
+USER_TURN = "I have been feeling overwhelmed with my coursework and I am not sure how to cope. ({i})"
+BOT_TURN = (
+    "It makes sense to feel overwhelmed when there is a lot going on. Would it help to talk "
+    "through what feels most urgent right now, so we can break it into smaller steps? ({i})"
+)
+PROFILE = {"name": "Ana", "major": "Data Engineering", "quarter": "5"}
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def _legacy_save(session_id: str, bot: TrupyOpenAI) -> None:
+    redis = await get_redis()
+    data = {**bot.to_dict(), "messages": bot.messages}
+    await redis.set(f"legacy:{session_id}", json.dumps(data), ex=settings.SESSION_TTL)
+
+
+async def _run(label: str, save, turns: int) -> None:
+    bot = TrupyOpenAI(user_profile=PROFILE)
+    session_id = f"bench-{label}"
+    latencies: list[float] = []
+    with count_bytes_written() as counter:
+        for i in range(turns):
+            bot.messages.append({"role": "user", "content": USER_TURN.format(i=i)})
+            bot.messages.append({"role": "assistant", "content": BOT_TURN.format(i=i)})
+            start = time.perf_counter()
+            await save(session_id, bot)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    print(
+        f"{label:<14} {counter.bytes / turns:>12.0f} {_percentile(latencies, 50):>9.3f} "
+        f"{_percentile(latencies, 99):>9.3f}"
+    )
+
+
+async def main(turns: int, codecs: list[str]) -> None:
+    print(f"{turns} turns per session")
+    print(f"{'format':<14} {'bytes/turn':>12} {'p50 ms':>9} {'p99 ms':>9}")
+    await _run("legacy-json", _legacy_save, turns)
+    for name in codecs:
+        try:
+            session_service.codec = get_codec(name)
+        except ImportError as e:
+            print(f"{name:<14} skipped: {e}")
+            continue
+        await _run(f"append-{name}", session_service._write, turns)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--codecs", nargs="+", default=["json", "orjson", "msgpack"])
+    parser.add_argument("--redis-url", default=None)
+    args = parser.parse_args()
+    use_redis(args.redis_url)
+    asyncio.run(main(args.turns, args.codecs))
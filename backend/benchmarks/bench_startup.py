@@ -0,0 +1,107 @@
+"""Import time, time-to-first-request and worker recycle stall: `uvicorn --workers N` vs serve.py.
+
+Run from backend/:  python -m benchmarks.bench_startup --workers 4
+Only /health is requested, so no Redis server or LLM is needed.
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+PORT = 18091
+
+
+def _env() -> dict:
+    data_dir = tempfile.mkdtemp(prefix="trupy-bench-")
+    return {
+        **os.environ,
+        "DATABASE_URL": f"sqlite+aiosqlite:///{data_dir}/bench.db",
+        "LOGS_DIR": f"{data_dir}/logs",
+        "REDIS_URL": "redis://127.0.0.1:1/0",
+        "LOG_LEVEL": "WARNING",
+    }
+
+
+def _import_seconds() -> float:
+    code = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], env=_env(), capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def _wait_ready(timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{PORT}/health", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            time.sleep(0.01)
+    raise TimeoutError("server did not start")
+
+
+def _start(command: list[str]) -> tuple[subprocess.Popen, float]:
+    try:
+        httpx.get(f"http://127.0.0.1:{PORT}/health", timeout=1)
+        raise SystemExit(f"Port {PORT} is already serving; stop that process first.")
+    except httpx.TransportError:
+        pass
+    start = time.perf_counter()
+    proc = subprocess.Popen(command, env=_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    _wait_ready()
+    return proc, time.perf_counter() - start
+
+
+def _stop(proc: subprocess.Popen) -> None:
+    proc.send_signal(signal.SIGTERM)
+    proc.wait(timeout=30)
+
+
+def _recycle_stall(requests: int) -> float:
+    # One worker recycled every 20 requests: the slowest request includes the replacement's startup.
+    worst = 0.0
+    with httpx.Client(headers={"Connection": "close"}) as client:
+        for _ in range(requests):
+            start = time.perf_counter()
+            while True:
+                try:
+                    client.get(f"http://127.0.0.1:{PORT}/health", timeout=60)
+                    break
+                except httpx.TransportError:
+                    # A connection accepted by the exiting worker is reset; the client retries.
+                    continue
+            worst = max(worst, time.perf_counter() - start)
+    return worst
+
+
+def main(workers: int) -> None:
+    print(f"import main: {_import_seconds():.3f}s")
+
+    uvicorn_cmd = [sys.executable, "-m", "uvicorn", "main:app", "--port", str(PORT), "--log-level", "warning"]
+    serve_cmd = [sys.executable, "serve.py", "--port", str(PORT)]
+
+    proc, ttfr = _start([*uvicorn_cmd, "--workers", str(workers)])
+    _stop(proc)
+    print(f"uvicorn --workers {workers}: first request after {ttfr:.3f}s")
+
+    proc, ttfr = _start([*serve_cmd, "--workers", str(workers)])
+    _stop(proc)
+    print(f"serve.py --workers {workers}: first request after {ttfr:.3f}s")
+
+    proc, _ = _start([*serve_cmd, "--workers", "1", "--max-requests", "20"])
+    try:
+        stall = _recycle_stall(100)
+    finally:
+        _stop(proc)
+    print(f"serve.py worker recycle: worst request {stall * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    main(args.workers)
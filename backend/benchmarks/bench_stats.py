@@ -0,0 +1,152 @@
+"""Session statistics: GROUP BY over the sessions table (JSON parsed per row) vs /sessions/stats rollups.
+
+Run from backend/:  python -m benchmarks.bench_stats --rows 1000000
+The database is seeded once and reused on later runs (pass --db to choose the file). Also times the
+backfill, and what maintaining the rollups adds to a finalizer flush.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--rows", type=int, default=1_000_000)
+parser.add_argument("--repeat", type=int, default=5)
+parser.add_argument("--db", default=str(Path(tempfile.gettempdir()) / "trupy-bench-stats.db"))
+args = parser.parse_args()
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{args.db}")
+
+import httpx  # noqa: E402
+from sqlalchemy import func, insert, or_, select  # noqa: E402
+
+from app.core.database import AsyncSessionLocal, engine, init_db  # noqa: E402
+from app.models.session import SessionRecord  # noqa: E402
+from app.services import stats_service  # noqa: E402
+
+SQLITE_DATETIME = "%Y-%m-%d %H:%M:%S.%f"
+MAJORS = ["Data Engineering", "Cybersecurity", "Robotics", "Embedded Systems", "Biomedical"]
+QUERIES = [
+    ("none", "total"),
+    ("major", "day"),
+    ("quarter", "month"),
+    ("anonymous", "week"),
+]
+
+
+def _seed(path: str, rows: int) -> None:
+    conn = sqlite3.connect(path)
+    existing = conn.execute(f"SELECT COUNT(*) FROM {SessionRecord.__tablename__}").fetchone()[0]
+    if existing >= rows:
+        conn.close()
+        return
+    start = datetime(2024, 1, 1)
+    batch = []
+    for i in range(existing, rows):
+        # About two years of sessions; every third one anonymous.
+        created = start + timedelta(seconds=i * 60)
+        user_data = {"summary": "Exam stress and sleep."}
+        if i % 3:
+            user_data.update(name="Student", major=MAJORS[i % len(MAJORS)], quarter=str(i % 10 + 1))
+        ended = created + timedelta(minutes=12)
+        batch.append((f"bench-{i}", json.dumps(user_data), created.strftime(SQLITE_DATETIME), ended.strftime(SQLITE_DATETIME)))
+        if len(batch) == 50_000:
+            conn.executemany("INSERT INTO sessions (session_id, user_data, created_at, ended_at) VALUES (?, ?, ?, ?)", batch)
+            conn.commit()
+            batch.clear()
+    if batch:
+        conn.executemany("INSERT INTO sessions (session_id, user_data, created_at, ended_at) VALUES (?, ?, ?, ?)", batch)
+        conn.commit()
+    conn.close()
+
+
+def _scan_query(group_by: str, bucket: str):
+    """What answering the question without rollups takes: a GROUP BY over every record's JSON."""
+    ended = func.coalesce(SessionRecord.ended_at, SessionRecord.created_at)
+    buckets = {"day": func.date(ended), "week": func.date(ended, "weekday 0", "-6 days"), "month": func.strftime("%Y-%m", ended)}
+    name = SessionRecord.user_data["name"].as_string()
+    groups = {
+        "major": SessionRecord.user_data["major"].as_string(),
+        "quarter": SessionRecord.user_data["quarter"].as_string(),
+        "anonymous": or_(name.is_(None), name == ""),
+    }
+    columns = [c for c in (buckets.get(bucket), groups.get(group_by)) if c is not None]
+    query = select(*columns, func.count()).select_from(SessionRecord)
+    return query.group_by(*columns) if columns else query
+
+
+async def _median_ms(call) -> tuple[float, object]:
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        result = await call()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), result
+
+
+async def _flush_cost() -> tuple[float, float]:
+    """Median time to insert a 50-record finalizer batch, without and with the rollup upsert."""
+    rows = [
+        {"session_id": f"flush-{i}", "user_data": {"name": "S", "major": MAJORS[i % 5], "quarter": "3", "summary": "x"},
+         "ended_at": datetime.utcnow()}
+        for i in range(50)
+    ]
+
+    async def flush(with_rollups: bool):
+        async with AsyncSessionLocal() as db:
+            await db.execute(insert(SessionRecord), rows)
+            if with_rollups:
+                await stats_service.add_to_rollups(
+                    db, (stats_service.rollup_key(row["user_data"], row["ended_at"]) for row in rows)
+                )
+            # Measure the work, then leave the table as it was.
+            await db.flush()
+            await db.rollback()
+
+    plain, _ = await _median_ms(lambda: flush(False))
+    rolled, _ = await _median_ms(lambda: flush(True))
+    return plain, rolled
+
+
+async def main() -> None:
+    await init_db()
+    seed_start = time.perf_counter()
+    _seed(args.db, args.rows)
+    print(f"{args.rows} rows ready in {time.perf_counter() - seed_start:.1f}s ({args.db})")
+
+    backfill_start = time.perf_counter()
+    total = await stats_service.rebuild_rollups()
+    print(f"backfill: {total} sessions in {time.perf_counter() - backfill_start:.2f}s")
+
+    from main import app
+
+    print(f"{'query':<24} {'buckets':>8} {'scan ms':>9} {'rollup ms':>10}")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for group_by, bucket in QUERIES:
+            async def scan():
+                async with AsyncSessionLocal() as db:
+                    return (await db.execute(_scan_query(group_by, bucket))).all()
+
+            async def rollup():
+                response = await client.get("/api/v1/sessions/stats", params={"group_by": group_by, "bucket": bucket})
+                response.raise_for_status()
+                return response.json()
+
+            scan_ms, scanned = await _median_ms(scan)
+            rollup_ms, body = await _median_ms(rollup)
+            assert body["total"] == sum(row[-1] for row in scanned) == total, "rollup totals differ from the scan"
+            assert len(body["rows"]) == len(scanned), "rollup buckets differ from the scan"
+            print(f"{f'{group_by} by {bucket}':<24} {len(body['rows']):>8} {scan_ms:>9.1f} {rollup_ms:>10.1f}")
+
+    plain, rolled = await _flush_cost()
+    print(f"finalizer flush of 50 records: {plain:.2f} ms insert only, {rolled:.2f} ms with rollups")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,122 @@
+"""Per-turn latency and Redis traffic: POST /chat/message(/stream) vs the /chat/ws/{session_id} socket.
+
+Run from backend/:  python -m benchmarks.bench_websocket --turns 200
+Starts the app on a local port with a zero-latency stub LLM, so the numbers are the transport
+and session-state overhead of a turn. Uses fakeredis unless --redis-url is given.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--turns", type=int, default=200)
+parser.add_argument("--port", type=int, default=8765)
+parser.add_argument("--stub-port", type=int, default=18080)
+parser.add_argument("--redis-url", default=None)
+args = parser.parse_args()
+os.environ.update(
+    BASE_URL=f"http://127.0.0.1:{args.stub_port}/v1",
+    LLM_API_KEY="bench",
+    MODEL="stub",
+    DATABASE_URL=f"sqlite+aiosqlite:///{Path(tempfile.gettempdir()) / 'trupy-bench-websocket.db'}",
+    RATE_LIMIT_CHAT="1000000/minute",
+    RATE_LIMIT_CHAT_PER_IP="1000000/minute",
+)
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+import websockets  # noqa: E402
+
+from app.core.config import get_settings  # noqa: E402
+from benchmarks.redis_backend import count_bytes_read, count_bytes_written, use_redis  # noqa: E402
+from benchmarks.stub_llm import run_stub  # noqa: E402
+
+settings = get_settings()
+MESSAGE = "I have been feeling overwhelmed with my coursework and I am not sure how to cope."
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def _http_turns(client: httpx.AsyncClient, session_id: str) -> list[float]:
+    latencies = []
+    for _ in range(args.turns):
+        start = time.perf_counter()
+        response = await client.post("/api/v1/chat/message", json={"session_id": session_id, "message": MESSAGE})
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+async def _sse_turns(client: httpx.AsyncClient, session_id: str) -> list[float]:
+    latencies = []
+    for _ in range(args.turns):
+        start = time.perf_counter()
+        body = {"session_id": session_id, "message": MESSAGE}
+        async with client.stream("POST", "/api/v1/chat/message/stream", json=body) as response:
+            response.raise_for_status()
+            async for _ in response.aiter_bytes():
+                pass
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+async def _ws_turns(client: httpx.AsyncClient, session_id: str) -> list[float]:
+    latencies = []
+    async with websockets.connect(f"ws://127.0.0.1:{args.port}/api/v1/chat/ws/{session_id}") as ws:
+        await ws.recv()
+        for _ in range(args.turns):
+            start = time.perf_counter()
+            await ws.send(json.dumps({"type": "message", "message": MESSAGE}))
+            while True:
+                frame = json.loads(await ws.recv())
+                if frame["type"] in ("done", "error"):
+                    break
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+async def _run(label: str, client: httpx.AsyncClient, turns, cache: bool) -> None:
+    settings.SESSION_CACHE_ENABLED = cache
+    session_id = (await client.post("/api/v1/sessions/start", json={"anonymous": True})).json()["session_id"]
+    with count_bytes_read() as read, count_bytes_written() as written:
+        latencies = await turns(client, session_id)
+    print(
+        f"{label:<18} {_percentile(latencies, 50):>8.2f} {_percentile(latencies, 99):>8.2f} "
+        f"{read.bytes / args.turns:>12.0f} {written.bytes / args.turns:>13.0f}"
+    )
+
+
+async def main() -> None:
+    use_redis(args.redis_url)
+    import main as app_module
+
+    server = uvicorn.Server(uvicorn.Config(app_module.app, port=args.port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=30) as client:
+            print(f"{args.turns} turns per session, stub LLM with no latency")
+            print(f"{'transport':<18} {'p50 ms':>8} {'p99 ms':>8} {'read B/turn':>12} {'write B/turn':>13}")
+            await _run("http, cache off", client, _http_turns, cache=False)
+            await _run("http, cache on", client, _http_turns, cache=True)
+            # The streaming transports stream from the LLM too, so compare these two with each other.
+            await _run("sse, cache on", client, _sse_turns, cache=True)
+            await _run("websocket", client, _ws_turns, cache=True)
+    finally:
+        server.should_exit = True
+        await serving
+
+
+if __name__ == "__main__":
+    # Summary refreshes call the LLM; keep them out of the measurement.
+    settings.SUMMARY_REFRESH_TURNS = 10**9
+    with run_stub(args.stub_port, latency=0.0):
+        asyncio.run(main())
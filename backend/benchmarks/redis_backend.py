@@ -0,0 +1,105 @@
+from contextlib import contextmanager
+
+from redis.asyncio import BlockingConnectionPool, Redis
+from redis.asyncio.client import Pipeline
+
+from app.core import redis_client
+from app.core.config import get_settings
+
+
+def use_redis(url: str | None = None) -> None:
+    """Point the app's Redis clients at `url`, or at an in-process fakeredis server when omitted."""
+    if url:
+        redis_client._redis = redis_client._connect(url, decode_responses=True)
+        redis_client._binary_redis = redis_client._connect(url, decode_responses=False)
+        return
+
+    try:
+        import fakeredis
+    except ImportError:
+        raise SystemExit("fakeredis is not installed; pass --redis-url redis://localhost:6379/15 instead.")
+    settings = get_settings()
+    server = fakeredis.FakeServer()
+    for attr, decode_responses in (("_redis", True), ("_binary_redis", False)):
+        client = fakeredis.aioredis.FakeRedis(
+            server=server,
+            decode_responses=decode_responses,
+            connection_pool_class=BlockingConnectionPool,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+        )
+        setattr(redis_client, attr, client)
+
+
+def _arg_size(arg) -> int:
+    if isinstance(arg, bytes):
+        return len(arg)
+    return len(str(arg).encode())
+
+
+class ByteCounter:
+    def __init__(self):
+        self.bytes = 0
+
+    def add(self, args) -> None:
+        self.bytes += sum(_arg_size(a) for a in args)
+
+
+@contextmanager
+def count_bytes_written():
+    """Count the payload bytes of every command sent through redis-py (args only, no RESP framing)."""
+    counter = ByteCounter()
+    execute_command = Redis.execute_command
+    execute = Pipeline.execute
+
+    async def counting_execute_command(self, *args, **options):
+        if not isinstance(self, Pipeline):
+            counter.add(args)
+        return await execute_command(self, *args, **options)
+
+    async def counting_execute(self, *args, **kwargs):
+        for command_args, _ in self.command_stack:
+            counter.add(command_args)
+        return await execute(self, *args, **kwargs)
+
+    Redis.execute_command = counting_execute_command
+    Pipeline.execute = counting_execute
+    try:
+        yield counter
+    finally:
+        Redis.execute_command = execute_command
+        Pipeline.execute = execute
+
+
+def _reply_size(reply) -> int:
+    if isinstance(reply, (list, tuple)):
+        return sum(_reply_size(r) for r in reply)
+    if reply is None or isinstance(reply, bool):
+        return 0
+    return _arg_size(reply)
+
+
+@contextmanager
+def count_bytes_read():
+    """Count the payload bytes of every reply received through redis-py (no RESP framing)."""
+    counter = ByteCounter()
+    execute_command = Redis.execute_command
+    execute = Pipeline.execute
+
+    async def counting_execute_command(self, *args, **options):
+        reply = await execute_command(self, *args, **options)
+        if not isinstance(self, Pipeline):
+            counter.bytes += _reply_size(reply)
+        return reply
+
+    async def counting_execute(self, *args, **kwargs):
+        replies = await execute(self, *args, **kwargs)
+        counter.bytes += _reply_size(replies)
+        return replies
+
+    Redis.execute_command = counting_execute_command
+    Pipeline.execute = counting_execute
+    try:
+        yield counter
+    finally:
+        Redis.execute_command = execute_command
+        Pipeline.execute = execute
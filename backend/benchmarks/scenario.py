@@ -0,0 +1,189 @@
+"""End-to-end load test: N concurrent students run start -> K messages -> end against the in-process app.
+
+Run from backend/:
+    python -m benchmarks.scenario --students 50 --turns 5 --output baseline.json
+    python -m benchmarks.scenario --students 50 --turns 5 --baseline baseline.json
+
+The LLM is the local stub (no paid completions) and Redis is fakeredis unless --redis-url is given.
+Reports p50/p95/p99 per endpoint, requests/sec, Redis bytes written per turn and event-loop lag.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from collections import defaultdict
+
+PORT = 18083
+_DB_DIR = tempfile.mkdtemp(prefix="trupy-bench-")
+os.environ.setdefault("BASE_URL", f"http://127.0.0.1:{PORT}/v1")
+os.environ.setdefault("LLM_API_KEY", "stub")
+os.environ.setdefault("MODEL", "stub")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_DB_DIR}/bench.db")
+os.environ.setdefault("LLM_CACHE_ENABLED", "false")
+# Every simulated student shares one client IP.
+os.environ.setdefault("RATE_LIMIT_CHAT_PER_IP", "1000000/minute")
+
+import httpx  # noqa: E402
+
+import main  # noqa: E402
+from benchmarks.redis_backend import count_bytes_written, use_redis  # noqa: E402
+from benchmarks.stub_llm import run_stub  # noqa: E402
+
+MESSAGES = [
+    "Hi, I have been feeling stressed about my exams.",
+    "I can't sleep well and I keep thinking about my grades.",
+    "My friends say I should take breaks but I feel guilty.",
+    "Do you have any tips to organise my study time?",
+    "Thanks, that helps. Maybe I will talk to someone at the department.",
+]
+LAG_INTERVAL = 0.01
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def _summary(values: list[float]) -> dict:
+    return {
+        "count": len(values),
+        "p50_ms": round(_percentile(values, 50) * 1000, 2),
+        "p95_ms": round(_percentile(values, 95) * 1000, 2),
+        "p99_ms": round(_percentile(values, 99) * 1000, 2),
+    }
+
+
+async def _sample_loop_lag(samples: list[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(LAG_INTERVAL)
+        samples.append(max(0.0, time.perf_counter() - start - LAG_INTERVAL))
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    async def call(self, client: httpx.AsyncClient, name: str, method: str, url: str, **kwargs) -> httpx.Response | None:
+        start = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.latencies[name].append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            self.errors[f"{name} {response.status_code}"] += 1
+            return None
+        return response
+
+
+async def _student(client: httpx.AsyncClient, recorder: Recorder, turns: int, stream: bool) -> None:
+    response = await recorder.call(client, "start", "POST", "/api/v1/sessions/start", json={"anonymous": True})
+    if response is None:
+        return
+    session_id = response.json()["session_id"]
+    for i in range(turns):
+        body = {"session_id": session_id, "message": MESSAGES[i % len(MESSAGES)]}
+        if stream:
+            await recorder.call(client, "message_stream", "POST", "/api/v1/chat/message/stream", json=body)
+        else:
+            await recorder.call(client, "message", "POST", "/api/v1/chat/message", json=body)
+    await recorder.call(client, "end", "POST", f"/api/v1/sessions/{session_id}/end")
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(students: int, turns: int, stream: bool) -> dict:
+    recorder = Recorder()
+    lag: list[float] = []
+    stop = asyncio.Event()
+
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            lag_task = asyncio.create_task(_sample_loop_lag(lag, stop))
+            with count_bytes_written() as counter:
+                start = time.perf_counter()
+                await asyncio.gather(*(_student(client, recorder, turns, stream) for _ in range(students)))
+                elapsed = time.perf_counter() - start
+            stop.set()
+            await lag_task
+
+    requests = sum(len(v) for v in recorder.latencies.values())
+    return {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "config": {"students": students, "turns": turns, "stream": stream},
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_s": round(requests / elapsed, 1),
+        "redis_bytes_per_turn": round(counter.bytes / (students * turns)),
+        "event_loop_lag": {
+            "p50_ms": round(_percentile(lag, 50) * 1000, 2),
+            "p99_ms": round(_percentile(lag, 99) * 1000, 2),
+            "max_ms": round(max(lag) * 1000, 2),
+        },
+        "endpoints": {name: _summary(values) for name, values in recorder.latencies.items()},
+        "errors": dict(recorder.errors),
+    }
+
+
+def _delta(current: float, previous: float | None) -> str:
+    if not previous:
+        return ""
+    return f" ({(current - previous) / previous * 100:+.1f}%)"
+
+
+def report(result: dict, baseline: dict | None) -> None:
+    base_endpoints = (baseline or {}).get("endpoints", {})
+    print(f"{'endpoint':<16} {'count':>6} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+    for name, stats in result["endpoints"].items():
+        base = base_endpoints.get(name, {})
+        print(
+            f"{name:<16} {stats['count']:>6} {stats['p50_ms']:>10.1f} {stats['p95_ms']:>10.1f} "
+            f"{stats['p99_ms']:>10.1f}{_delta(stats['p99_ms'], base.get('p99_ms'))}"
+        )
+    base = baseline or {}
+    print(f"requests/s          {result['requests_per_s']}{_delta(result['requests_per_s'], base.get('requests_per_s'))}")
+    print(
+        f"redis bytes/turn    {result['redis_bytes_per_turn']}"
+        f"{_delta(result['redis_bytes_per_turn'], base.get('redis_bytes_per_turn'))}"
+    )
+    lag = result["event_loop_lag"]
+    print(f"event-loop lag      p50={lag['p50_ms']}ms p99={lag['p99_ms']}ms max={lag['max_ms']}ms")
+    if result["errors"]:
+        print(f"errors              {result['errors']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--stream", action="store_true", help="Use the SSE endpoint for messages.")
+    parser.add_argument("--latency", type=float, default=0.3, help="Stub time to first token (s).")
+    parser.add_argument("--token-latency", type=float, default=0.01, help="Stub per-token latency (s).")
+    parser.add_argument("--redis-url", default=None)
+    parser.add_argument("--output", help="Write the result as a JSON baseline.")
+    parser.add_argument("--baseline", help="Compare against a previously saved JSON baseline.")
+    args = parser.parse_args()
+
+    use_redis(args.redis_url)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    with run_stub(port=PORT, latency=args.latency, token_latency=args.token_latency):
+        result = asyncio.run(run(args.students, args.turns, args.stream))
+    report(result, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Saved baseline to {args.output}")
@@ -0,0 +1,133 @@
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+STUB_REPLY = "I hear you. Would you like to tell me a bit more about how you have been feeling lately?"
+WORDS = STUB_REPLY.split(" ")
+
+
+def create_app(
+    latency: float = 0.2,
+    token_latency: float | None = None,
+    error_rate: float = 0.0,
+    slow_rate: float = 0.0,
+    slow_latency: float = 2.0,
+    seed: int = 0,
+    capacity: int | None = None,
+) -> FastAPI:
+    app = FastAPI(title="Stub LLM")
+    rng = random.Random(seed)
+    # With `capacity`, requests beyond that many in flight are rejected with 429 like a rate-limited provider.
+    in_flight = 0
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        nonlocal in_flight
+        body = await request.json()
+        if rng.random() < error_rate:
+            return JSONResponse(status_code=500, content={"error": {"message": "stub failure", "type": "server_error"}})
+        if capacity is not None and in_flight >= capacity:
+            return JSONResponse(status_code=429, content={"error": {"message": "stub rate limit", "type": "rate_limit_error"}})
+        delay = slow_latency if rng.random() < slow_rate else latency
+        if body.get("stream"):
+            in_flight += 1
+            return StreamingResponse(_stream(body, delay), media_type="text/event-stream")
+        if token_latency is not None:
+            delay += len(WORDS) * token_latency
+        in_flight += 1
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            in_flight -= 1
+        prompt_tokens = sum(len(m.get("content", "")) // 4 for m in body.get("messages", []))
+        completion_tokens = len(STUB_REPLY) // 4
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": STUB_REPLY},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    async def _stream(body: dict, delay: float):
+        nonlocal in_flight
+        try:
+            async for event in _events(body, delay):
+                yield event
+        finally:
+            in_flight -= 1
+
+    async def _events(body: dict, delay: float):
+        # With token_latency, `delay` is the time to first token; otherwise it is spread over the reply.
+        if token_latency is not None:
+            await asyncio.sleep(delay)
+        for i, word in enumerate(WORDS):
+            await asyncio.sleep(token_latency if token_latency is not None else delay / len(WORDS))
+            chunk = {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "delta": {"content": word if i == 0 else f" {word}"},
+                        "finish_reason": None,
+                    }
+                ],
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return app
+
+
+@contextmanager
+def run_stub(port: int = 18080, latency: float = 0.2, **options):
+    config = uvicorn.Config(create_app(latency, **options), host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}/v1"
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub server for benchmarks.")
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--token-latency", type=float, default=None)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-latency", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--capacity", type=int, default=None)
+    args = parser.parse_args()
+    app = create_app(
+        args.latency, args.token_latency, args.error_rate, args.slow_rate, args.slow_latency, args.seed, args.capacity
+    )
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
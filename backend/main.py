@@ -1,53 +1,79 @@
 import asyncio
+import time
 from contextlib import asynccontextmanager
+from typing import Optional
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from slowapi import _rate_limit_exceeded_handler
-from slowapi.errors import RateLimitExceeded
+from fastapi.responses import JSONResponse, PlainTextResponse
 
+from app.core import metrics
 from app.core.config import get_settings
 from app.core.database import init_db
-from app.core.limiter import limiter
+from app.core.leader import run_as_leader
+from app.core.llm_client import close_llm_client, get_llm_client
+from app.core.llm_scheduler import get_llm_scheduler
+from app.core.middleware import ServerTimingMiddleware
 from app.core.redis_client import close_redis
-from app.services import session_service
+from app.services import greeting_pool
+from app.services.crisis_detection import get_crisis_detector
+from app.services.finalization_service import finalizer
+from app.services.risk_classifier import risk_scorer
 from app.api.v1.router import api_router
 from app.utils.logger import setup_logger
 
 settings = get_settings()
 logger = setup_logger(name="main")
 
-SWEEP_INTERVAL = 300
 
+def _warm_up() -> None:
+    # Build what the first chat turn would otherwise pay for: the pooled LLM clients and the crisis regex.
+    get_llm_client()
+    get_llm_scheduler()
+    get_crisis_detector()
 
-async def _redis_sweep():
-    while True:
+
+async def _cancel(*tasks: Optional[asyncio.Task]) -> None:
+    for task in tasks:
+        if task is None:
+            continue
+        task.cancel()
         try:
-            await asyncio.sleep(SWEEP_INTERVAL)
-            count = await session_service.count_active_sessions()
-            logger.info(f"[sweep] Active Redis sessions: {count}")
+            await task
         except asyncio.CancelledError:
-            break
-        except Exception as e:
-            logger.error(f"[sweep] Error during session sweep: {e}")
+            pass
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    started = time.perf_counter()
     await init_db()
-    sweep_task = asyncio.create_task(_redis_sweep())
-    logger.info("Background session sweep started.")
+    await finalizer.start()
+    _warm_up()
+    if settings.RISK_CLASSIFIER_ENABLED:
+        await risk_scorer.start()
+    # With several workers, only the lease holder runs the singleton jobs.
+    expiry_task = asyncio.create_task(run_as_leader("expiry", finalizer.run_expiry_watcher))
+    logger.info("Expired-session finalization scheduled.")
+    greeting_task = None
+    if settings.GREETING_POOL_ENABLED:
+        greeting_task = asyncio.create_task(run_as_leader("greeting_pool", greeting_pool.run_refresher))
+        logger.info("Greeting pool refresher scheduled.")
+    logger.info("Startup completed in %.3fs", time.perf_counter() - started)
+    lag_task = asyncio.create_task(metrics.monitor_event_loop_lag(settings.EVENT_LOOP_LAG_INTERVAL))
     try:
         yield
     finally:
-        sweep_task.cancel()
-        try:
-            await sweep_task
-        except asyncio.CancelledError:
-            pass
+        # The leader jobs go first: the expiry watcher would otherwise keep queueing sessions after the drain.
+        await _cancel(expiry_task, greeting_task)
+        await finalizer.stop()
+        logger.info("Session finalizer drained.")
+        await risk_scorer.stop()
+        await _cancel(lag_task)
         await close_redis()
         logger.info("Redis connection closed.")
+        await close_llm_client()
+        logger.info("LLM client closed.")
 
 
 app = FastAPI(
@@ -56,9 +82,6 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
-
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.CORS_ORIGINS,
@@ -67,9 +90,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.METRICS_ENABLED:
+    app.add_middleware(ServerTimingMiddleware, server_timing=settings.SERVER_TIMING_ENABLED)
+
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
 
 @app.get("/health")
 async def health():
     return {"status": "ok", "service": settings.APP_NAME}
+
+
+if settings.METRICS_ENABLED:
+
+    @app.get("/metrics", include_in_schema=False)
+    async def prometheus_metrics():
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,33 @@
+"""Backfill the session rollups behind /sessions/stats from the sessions table.
+
+    python rollups.py
+
+Needed once for records stored before the rollups existed; new sessions (finalizer flushes and
+archive imports) update them as they are inserted. Rebuilding is safe to repeat: the rollups are
+replaced in a single transaction.
+"""
+import argparse
+import asyncio
+import time
+
+from app.core.database import engine, init_db
+from app.services import stats_service
+
+
+async def _run() -> None:
+    try:
+        await init_db()
+        started = time.perf_counter()
+        total = await stats_service.rebuild_rollups()
+        print(f"Counted {total} sessions in {time.perf_counter() - started:.1f}s")
+    finally:
+        await engine.dispose()
+
+
+def main() -> None:
+    argparse.ArgumentParser(description="Rebuild the Trupy AI session rollups from the sessions table.").parse_args()
+    asyncio.run(_run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Production entry point: a pre-forking supervisor running N uvicorn workers on one socket.
+
+    python serve.py --workers 4 --port 8000
+
+The app is imported once in the supervisor and workers are forked from it, so starting or
+recycling a worker skips the import entirely. Loop-bound resources (Redis pools, LLM clients,
+the database engine's connections) are only created inside each worker's lifespan.
+Log records from every worker are written by the supervisor, one writer per file.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+
+import uvicorn
+
+
+def default_workers() -> int:
+    if os.environ.get("WEB_CONCURRENCY"):
+        return int(os.environ["WEB_CONCURRENCY"])
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app, sock: socket.socket, args: argparse.Namespace) -> None:
+    config = uvicorn.Config(
+        app,
+        log_level=args.log_level,
+        timeout_keep_alive=args.keep_alive,
+        limit_max_requests=args.max_requests or None,
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def _fork_worker(app, sock: socket.socket, args: argparse.Namespace) -> int:
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        code = 0
+        try:
+            _run_worker(app, sock, args)
+        except BaseException:
+            code = 1
+        finally:
+            from app.utils.logger import shutdown_logging
+
+            shutdown_logging()
+            os._exit(code)
+    return pid
+
+
+async def _prepare_database() -> None:
+    from app.core.database import engine, init_db
+
+    await init_db()
+    # No pooled connections may be inherited across fork().
+    await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run Trupy AI with several worker processes.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=default_workers())
+    parser.add_argument("--max-requests", type=int, default=0, help="Recycle a worker after this many requests.")
+    parser.add_argument("--keep-alive", type=int, default=5)
+    parser.add_argument("--log-level", default="warning", help="uvicorn's own log level.")
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers)
+        return
+
+    started = time.perf_counter()
+    from app.utils import logger as app_logger
+    import main as app_module
+
+    import_seconds = time.perf_counter() - started
+    log = app_logger.setup_logger(name="serve")
+    app_logger.use_process_queue(multiprocessing.get_context("fork").Queue())
+    log.info(f"Imported app in {import_seconds:.3f}s | starting {args.workers} workers on {args.host}:{args.port}")
+    # Create the schema once here; workers racing on CREATE TABLE would fail their startup.
+    asyncio.run(_prepare_database())
+    # Pure CPU setup (LLM clients with their TLS contexts, crisis regex) is shared copy-on-write;
+    # no sockets are open yet, so it is safe to inherit.
+    app_module._warm_up()
+
+    sock = _bind(args.host, args.port)
+    workers = {_fork_worker(app_module.app, sock, args): time.monotonic() for _ in range(args.workers)}
+    stopping = False
+
+    def _stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        forked_at = workers.pop(pid, None)
+        if stopping or forked_at is None:
+            continue
+        # Recycled (max requests) or crashed: fork a replacement from the already-imported app.
+        log.info(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}; restarting.")
+        if status != 0 and time.monotonic() - forked_at < 1:
+            time.sleep(1)  # Avoid a fork loop when workers crash during startup.
+        workers[_fork_worker(app_module.app, sock, args)] = time.monotonic()
+
+    sock.close()
+    log.info("All workers stopped.")
+    app_logger.shutdown_logging()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
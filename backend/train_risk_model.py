@@ -0,0 +1,100 @@
+"""Train and evaluate the second-stage risk classifier, and write the weights the app loads.
+
+    python train_risk_model.py
+    python train_risk_model.py --data labelled.jsonl --out app/data/risk_model.npz
+
+The data is JSON lines with "text" and "label" (1 = risk, 0 = not). The model is evaluated with
+stratified k-fold cross-validation first; the threshold is the highest one whose out-of-fold recall
+reaches --min-recall, since a missed message costs far more than an extra flag. The final model is
+then trained on all of the data.
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.services.crisis_detection import get_crisis_detector
+from app.services.risk_model import DEFAULT_DIMS, DEFAULT_MODEL_PATH, SEED_DATA_PATH, HashedLinearModel
+
+
+def _load(path: Path) -> tuple[list[str], np.ndarray]:
+    texts, labels = [], []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                texts.append(row["text"])
+                labels.append(int(row["label"]))
+    return texts, np.asarray(labels)
+
+
+def _folds(labels: np.ndarray, k: int, seed: int) -> np.ndarray:
+    # Each class is shuffled and dealt round-robin, so every fold keeps the class balance.
+    rng = np.random.default_rng(seed)
+    fold = np.empty(len(labels), dtype=int)
+    for label in (0, 1):
+        members = rng.permutation(np.flatnonzero(labels == label))
+        fold[members] = np.arange(len(members)) % k
+    return fold
+
+
+def _auc(scores: np.ndarray, labels: np.ndarray) -> float:
+    # Probability that a random positive outscores a random negative (ties count half).
+    pos, neg = scores[labels == 1], scores[labels == 0]
+    return float(((pos[:, None] > neg).sum() + 0.5 * (pos[:, None] == neg).sum()) / (len(pos) * len(neg)))
+
+
+def _metrics(flagged: np.ndarray, labels: np.ndarray) -> tuple[float, float, float]:
+    tp = int((flagged & (labels == 1)).sum())
+    precision = tp / max(1, int(flagged.sum()))
+    recall = tp / max(1, int((labels == 1).sum()))
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return precision, recall, f1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Train the Trupy AI risk classifier.")
+    parser.add_argument("--data", type=Path, default=SEED_DATA_PATH)
+    parser.add_argument("--out", type=Path, default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--dims", type=int, default=DEFAULT_DIMS)
+    parser.add_argument("--epochs", type=int, default=300)
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--min-recall", type=float, default=0.9)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    texts, labels = _load(args.data)
+    print(f"{len(texts)} messages, {int(labels.sum())} labelled risk")
+
+    scores = np.empty(len(texts))
+    fold = _folds(labels, args.folds, args.seed)
+    for k in range(args.folds):
+        train, test = np.flatnonzero(fold != k), np.flatnonzero(fold == k)
+        model = HashedLinearModel.train([texts[i] for i in train], labels[train], dims=args.dims, epochs=args.epochs)
+        scores[test] = model.score([texts[i] for i in test])
+
+    candidates = [t for t in np.unique(scores) if (scores[labels == 1] >= t).mean() >= args.min_recall]
+    threshold = float(max(candidates))
+    precision, recall, f1 = _metrics(scores >= threshold, labels)
+    print(
+        f"{args.folds}-fold: AUC={_auc(scores, labels):.3f} threshold={threshold:.3f} "
+        f"precision={precision:.3f} recall={recall:.3f} F1={f1:.3f}"
+    )
+    detector = get_crisis_detector()
+    keyword_hits = np.array([detector.contains(text) for text in texts])
+    missed = (labels == 1) & ~keyword_hits
+    print(
+        f"keywords alone catch {int((keyword_hits & (labels == 1)).sum())}/{int(labels.sum())} risk messages; "
+        f"the classifier catches {int((scores[missed] >= threshold).sum())}/{int(missed.sum())} of the rest"
+    )
+
+    started = time.perf_counter()
+    model = HashedLinearModel.train(texts, labels, dims=args.dims, epochs=args.epochs, threshold=threshold)
+    model.save(args.out)
+    print(f"Trained on all {len(texts)} messages in {time.perf_counter() - started:.1f}s; wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,8 @@ const BASE = import.meta.env.VITE_API_URL ?? '/api/v1'
 
 async function request(path, options = {}) {
   const res = await fetch(`${BASE}${path}`, {
-    headers: { 'Content-Type': 'application/json' },
     ...options,
+    headers: { 'Content-Type': 'application/json', ...options.headers },
   })
   if (!res.ok) {
     const err = await res.json().catch(() => ({}))
@@ -19,9 +19,10 @@ export function startSession(anonymous = true, userProfile = null) {
   })
 }
 
-export function sendMessage(sessionId, message) {
+export function sendMessage(sessionId, message, idempotencyKey = null) {
   return request('/chat/message', {
     method: 'POST',
+    headers: idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : {},
     body: JSON.stringify({ session_id: sessionId, message }),
   })
 }
@@ -29,3 +30,86 @@ export function sendMessage(sessionId, message) {
 export function endSession(sessionId) {
   return request(`/sessions/${sessionId}/end`, { method: 'POST' })
 }
+
+function socketUrl(sessionId) {
+  const base = new URL(BASE, window.location.href)
+  base.protocol = base.protocol === 'https:' ? 'wss:' : 'ws:'
+  return `${base.href.replace(/\/$/, '')}/chat/ws/${sessionId}`
+}
+
+// A send that the socket can no longer deliver. `messageId` is the frame id, which the server
+// also accepts as an Idempotency-Key, so the message can be resent over HTTP without a double reply.
+export class SocketClosedError extends Error {
+  constructor(reason, messageId) {
+    super(reason)
+    this.messageId = messageId
+  }
+}
+
+// One socket per session: the server keeps the conversation in memory between messages.
+// A dropped connection is reopened with backoff and the unanswered message is resent with the
+// same id, so the server replays its reply instead of answering twice.
+export function openChatSocket(sessionId) {
+  let ws = null
+  let pending = null
+  let closed = false
+  let gaveUp = false
+  let attempts = 0
+  let nextId = 0
+
+  function connect() {
+    return new Promise((resolve, reject) => {
+      ws = new WebSocket(socketUrl(sessionId))
+      ws.onopen = () => {
+        attempts = 0
+      }
+      ws.onmessage = (event) => {
+        const frame = JSON.parse(event.data)
+        if (frame.type === 'ready') {
+          resolve()
+          if (pending) ws.send(JSON.stringify(pending.frame))
+        } else if (frame.type === 'ping') {
+          ws.send(JSON.stringify({ type: 'pong' }))
+        } else if (pending && frame.type === 'delta') {
+          pending.onDelta?.(frame.content)
+        } else if (pending && (frame.type === 'done' || frame.type === 'crisis')) {
+          pending.resolve(frame)
+          pending = null
+        } else if (pending && frame.type === 'error') {
+          pending.reject(new Error(frame.reply))
+          pending = null
+        }
+      }
+      ws.onclose = (event) => {
+        reject(new Error(event.reason || 'Connection closed'))
+        // 4404: the session is gone, so there is nothing to reconnect to.
+        if (closed || event.code === 4404 || attempts >= 5) {
+          gaveUp = true
+          pending?.reject(new SocketClosedError(event.reason || 'Connection closed', pending.frame.id))
+          pending = null
+          return
+        }
+        const delay = Math.min(1000 * 2 ** attempts++, 15000)
+        setTimeout(() => connect().catch(() => {}), delay)
+      }
+    })
+  }
+
+  const ready = connect()
+
+  return {
+    ready,
+    send(message, onDelta) {
+      const frame = { type: 'message', message, id: `${Date.now()}-${nextId++}` }
+      if (closed || gaveUp) return Promise.reject(new SocketClosedError('Connection closed', frame.id))
+      return new Promise((resolve, reject) => {
+        pending = { frame, resolve, reject, onDelta }
+        if (ws.readyState === WebSocket.OPEN) ws.send(JSON.stringify(frame))
+      })
+    },
+    close() {
+      closed = true
+      ws?.close()
+    },
+  }
+}
@@ -12,6 +12,16 @@ export const useChatStore = defineStore('chat', () => {
   const isConcluded = ref(false)
   const sessionStarted = ref(false)
   const connectionError = ref(null)
+  let socket = null
+
+  function openSocket() {
+    if (typeof WebSocket === 'undefined') return
+    socket = api.openChatSocket(sessionId.value)
+    // Fall back to plain HTTP messages if the socket cannot be opened.
+    socket.ready.catch(() => {
+      socket = null
+    })
+  }
 
   async function startSession(anonymous = true, userProfile = null) {
     isLoading.value = true
@@ -21,6 +31,7 @@ export const useChatStore = defineStore('chat', () => {
       sessionId.value = data.session_id
       sessionStarted.value = true
       messages.value.push(mkMsg(data.greeting, 'bot'))
+      openSocket()
     } catch {
       connectionError.value = 'Could not connect to the server. Please refresh the page.'
     } finally {
@@ -33,10 +44,34 @@ export const useChatStore = defineStore('chat', () => {
     messages.value.push(mkMsg(text, 'user'))
     isLoading.value = true
     try {
-      const data = await api.sendMessage(sessionId.value, text)
-      messages.value.push(mkMsg(data.reply, 'bot'))
+      let data
+      let reply = null
+      if (socket) {
+        try {
+          // Stream the reply into its bubble as it arrives.
+          data = await socket.send(text, (delta) => {
+            if (!reply) {
+              messages.value.push(mkMsg('', 'bot'))
+              reply = messages.value[messages.value.length - 1]
+            }
+            reply.text += delta
+          })
+        } catch (err) {
+          if (!(err instanceof api.SocketClosedError)) throw err
+          // The socket stopped reconnecting: continue over HTTP, with the same id so an answer the
+          // server already gave is replayed rather than generated twice.
+          socket = null
+          data = await api.sendMessage(sessionId.value, text, err.messageId)
+        }
+      } else {
+        data = await api.sendMessage(sessionId.value, text)
+      }
+      if (reply) reply.text = data.reply
+      else messages.value.push(mkMsg(data.reply, 'bot'))
       if (data.is_final) {
         isConcluded.value = true
+        socket?.close()
+        socket = null
       }
     } catch {
       messages.value.push(mkMsg('Sorry, something went wrong. Please try again.', 'bot'))
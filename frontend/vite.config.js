@@ -18,6 +18,7 @@ export default defineConfig({
       '/api/v1': {
         target: 'http://backend:8000',
         changeOrigin: true,
+        ws: true,
       },
     },
   },